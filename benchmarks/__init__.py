@@ -0,0 +1 @@
+# Benchmark suite
\ No newline at end of file
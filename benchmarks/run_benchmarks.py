@@ -0,0 +1,275 @@
+import sys
+import os
+import argparse
+import json
+import logging
+import platform
+import statistics
+import tempfile
+import time
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import matplotlib
+from function_painter import __version__
+from function_painter.lexer import Lexer, TextReader
+from function_painter.parser import Parser
+from function_painter.interpreter import Interpreter
+from function_painter.drawer import Drawer
+from benchmarks.workloads import WORKLOAD_SIZES, nested_expression, sweep_script, write_workloads
+
+
+# 结果文件格式变化时递增
+RESULT_FORMAT_VERSION = 1
+# 默认的基线文件
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# 比基线慢超过该比例时视为性能回退
+DEFAULT_THRESHOLD = 0.2
+
+# 基准测试：(名称, 阶段, 说明, 准备函数)；准备函数接收工作负载的文件路径和规模，返回被计时的无参函数
+Benchmark = Tuple[str, str, str, Callable[[Dict[str, str], Dict[str, int]], Callable[[], object]]]
+
+
+def _read_all(paths, sizes):
+    def run():
+        reader = TextReader(paths['large'])
+        try:
+            return reader.read_all()
+        finally:
+            reader.close()
+    return run
+
+
+def _tokenize(paths, sizes):
+    def run():
+        lexer = Lexer(paths['large'])
+        lexer.close()
+        return lexer
+    return run
+
+
+def _parse(name):
+    def prepare(paths, sizes):
+        # 只计时语法分析，token数组在计时之外生成一次；Parser只读取token数组，同一个词法分析器可以重复使用
+        lexer = Lexer(paths[name])
+        lexer.close()
+        return lambda: Parser(lexer).parse_program()
+    return prepare
+
+
+def _evaluate_scalar(paths, sizes):
+    interpreter = Interpreter(headless=True)
+    interpreter.interpret("param t from 0 to 1 step 0.1")
+    expression = Parser(Lexer(nested_expression(sizes['nesting_depth']), is_string=True)).parse_expression()
+    
+    def run():
+        for value in range(1000):
+            interpreter.variables['t'] = value * 0.001
+            interpreter.evaluate_expression(expression)
+    return run
+
+
+def _evaluate_draw(vectorized):
+    def prepare(paths, sizes):
+        interpreter = Interpreter(headless=True, vectorized=vectorized, cse=False)
+        if vectorized:
+            statements = interpreter.load_file(paths['sweep'])
+        else:
+            # 逐点计算太慢，使用较少的取样点
+            lexer = Lexer(sweep_script(sizes['scalar_points']), is_string=True)
+            statements = interpreter.optimize_statements(Parser(lexer).parse_program())
+        interpreter.execute_statement(statements[0])
+        draw = statements[1]
+        return lambda: interpreter.evaluate_draw_statement(draw)
+    return prepare
+
+
+def _draw_function(paths, sizes):
+    t_values = np.linspace(0, 1000, sizes['sweep_points'])
+    points = list(zip(t_values.tolist(), np.sin(t_values).tolist()))
+    
+    def run():
+        drawer = Drawer(headless=True)
+        drawer.draw_function(points)
+        return drawer
+    return run
+
+
+def _many_curves(paths, sizes):
+    t_values = np.linspace(0, 10, sizes['curve_points'])
+    curves = [np.sin(t_values + index * 0.05) * (index % 9 + 1) for index in range(sizes['curve_count'])]
+    
+    def run():
+        drawer = Drawer(headless=True)
+        for y_values in curves:
+            drawer.draw_curve(t_values, y_values)
+        return drawer
+    return run
+
+
+def _save_figure(file_format):
+    def prepare(paths, sizes):
+        drawer = _many_curves(paths, sizes)()
+        output = os.path.join(os.path.dirname(paths['large']), f'figure.{file_format}')
+        return lambda: drawer.save_figure(output)
+    return prepare
+
+
+def _end_to_end(paths, sizes):
+    def run():
+        interpreter = Interpreter(headless=True)
+        interpreter.interpret_file(paths['many_curves'])
+        interpreter.drawer.save_figure(os.path.join(os.path.dirname(paths['many_curves']), 'end_to_end.png'))
+    return run
+
+
+BENCHMARKS: List[Benchmark] = [
+    ('reader.read_all', 'reader', 'TextReader读取 {script_bytes} 字节的脚本', _read_all),
+    ('lexer.tokenize', 'lexer', 'Lexer对 {script_bytes} 字节的脚本做词法分析', _tokenize),
+    ('parser.large_script', 'parser', 'Parser分析 {script_bytes} 字节的脚本', _parse('large')),
+    ('parser.nested', 'parser', 'Parser分析 {nested_statements} 条嵌套深度为 {nesting_depth} 的语句', _parse('nested')),
+    ('evaluate.scalar_nested', 'evaluator', 'evaluate_expression计算嵌套深度为 {nesting_depth} 的表达式1000次',
+     _evaluate_scalar),
+    ('evaluate.vector_sweep', 'evaluator', '向量化计算一条 {sweep_points} 点的曲线', _evaluate_draw(True)),
+    ('evaluate.scalar_sweep', 'evaluator', '逐点计算一条 {scalar_points} 点的曲线', _evaluate_draw(False)),
+    ('drawer.draw_function', 'drawer', 'Drawer.draw_function绘制 {sweep_points} 个点（含抽稀）', _draw_function),
+    ('drawer.many_curves', 'drawer', '在一幅图中绘制 {curve_count} 条 {curve_points} 点的曲线', _many_curves),
+    ('save.png', 'save', '把 {curve_count} 条曲线的图像保存为PNG', _save_figure('png')),
+    ('save.svg', 'save', '把 {curve_count} 条曲线的图像保存为SVG', _save_figure('svg')),
+    ('pipeline.many_curves', 'pipeline', '解释执行 {curve_count} 条曲线的脚本并保存PNG', _end_to_end)
+]
+
+
+def environment() -> Dict[str, str]:
+    """记录运行环境，比较结果时只有环境相近才有意义"""
+    return {
+        'function_painter': __version__,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': str(os.cpu_count())
+    }
+
+
+def run_benchmarks(mode: str, repeat: int, selected: Optional[List[str]] = None) -> Dict:
+    """运行所有（或名称包含selected中任一字符串的）基准测试，返回结果"""
+    sizes = WORKLOAD_SIZES[mode]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='function_painter_bench_') as directory:
+        paths = write_workloads(directory, sizes)
+        for name, stage, description, prepare in BENCHMARKS:
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            description = description.format(**sizes)
+            function = prepare(paths, sizes)
+            # 预热一次，排除首次导入和编译缓存的影响
+            function()
+            times = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                function()
+                times.append(time.perf_counter() - started)
+            results[name] = {
+                'stage': stage,
+                'description': description,
+                'times': times,
+                'min': min(times),
+                'median': statistics.median(times)
+            }
+            print(f"{name:<24} 最短 {min(times) * 1000:10.2f}ms  中位数 {statistics.median(times) * 1000:10.2f}ms  {description}")
+    return {
+        'format': RESULT_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'mode': mode,
+        'sizes': sizes,
+        'environment': environment(),
+        'results': results
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """与基线比较每项的最短时间，返回比基线慢超过threshold的项目名称"""
+    if baseline.get('mode') != current['mode']:
+        print(f"警告: 基线的规模为 {baseline.get('mode')}，本次为 {current['mode']}，比较结果没有意义")
+    if baseline.get('environment') != current['environment']:
+        print("警告: 基线的运行环境与本次不同，比较结果仅供参考")
+    
+    regressions = []
+    print(f"\n{'项目':<24} {'基线':>12} {'本次':>12} {'比值':>8}")
+    for name, result in current['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None:
+            print(f"{name:<24} {'-':>12} {result['min'] * 1000:10.2f}ms {'新增':>8}")
+            continue
+        ratio = result['min'] / reference['min'] if reference['min'] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            verdict = '回退'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            verdict = '提升'
+        else:
+            verdict = ''
+        print(f"{name:<24} {reference['min'] * 1000:10.2f}ms {result['min'] * 1000:10.2f}ms {ratio:7.2f}x {verdict}")
+    return regressions
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="python benchmarks/run_benchmarks.py",
+        description="Function Painter 各阶段（读取、词法分析、语法分析、计算、绘图、保存）的性能基准测试"
+    )
+    parser.add_argument("--quick", action="store_true",
+                        help="使用较小的工作负载，几秒内完成，适合快速检查")
+    parser.add_argument("-r", "--repeat", type=int, default=5, metavar="N",
+                        help="每项重复计时的次数，不含一次预热（默认: %(default)s）")
+    parser.add_argument("-k", "--filter", action="append", metavar="名称",
+                        help="只运行名称包含该字符串的项目，可以给出多次")
+    parser.add_argument("-o", "--output", metavar="文件",
+                        help="把结果写入JSON文件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, metavar="文件",
+                        help="与之比较的基线结果文件，不存在时跳过比较（默认: %(default)s）")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="把本次结果保存为新的基线")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, metavar="比例",
+                        help="最短时间比基线慢超过该比例时视为回退（默认: %(default)s）")
+    return parser
+
+
+def main():
+    """运行基准测试，与基线比较；有项目回退时退出码为1"""
+    arg_parser = build_argument_parser()
+    args = arg_parser.parse_args()
+    if args.repeat <= 0:
+        arg_parser.error("--repeat必须大于0")
+    # 没有中文字体时matplotlib每次绘图和保存都会输出字体警告，淹没测试结果
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+    warnings.filterwarnings('ignore', message='Tight layout not applied')
+    
+    current = run_benchmarks('quick' if args.quick else 'full', args.repeat, args.filter)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(current, file, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(current, file, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(current, json.load(file), args.threshold)
+    
+    if regressions:
+        print(f"\n{len(regressions)} 项比基线慢超过 {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
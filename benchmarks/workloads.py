@@ -0,0 +1,105 @@
+from typing import Dict
+import os
+
+
+# 每种工作负载的规模，quick为快速模式下的规模
+WORKLOAD_SIZES: Dict[str, Dict[str, int]] = {
+    'full': {
+        'script_bytes': 4 << 20,
+        'nesting_depth': 150,
+        'nested_statements': 200,
+        'sweep_points': 1_000_000,
+        'scalar_points': 100_000,
+        'curve_count': 200,
+        'curve_points': 2_000
+    },
+    'quick': {
+        'script_bytes': 512 << 10,
+        'nesting_depth': 60,
+        'nested_statements': 50,
+        'sweep_points': 100_000,
+        'scalar_points': 10_000,
+        'curve_count': 40,
+        'curve_points': 2_000
+    }
+}
+
+# 大脚本中循环使用的语句模板，覆盖各种token和表达式结构
+_SCRIPT_TEMPLATES = (
+    "a{i} = sin({i} * 0.01) + cos(t) * {i} / 3\n",
+    "const c{i} = {i}.5 ** 2 - sqrt(abs(-{i}))\n",
+    "draw exp(-t * 0.{d}) * sin(t * {i}) with red\n",
+    "draw t * cos(t), t * sin(t + {i})\n",
+    "# 注释 {i}\n",
+    "param t from 0 to {d}.5 step 0.01\n"
+)
+
+
+def large_script(target_bytes: int) -> str:
+    """生成大约target_bytes字节的脚本，语句只用于词法和语法分析，不执行"""
+    parts = ["param t from 0 to 10 step 0.01\n"]
+    size = len(parts[0])
+    index = 0
+    while size < target_bytes:
+        line = _SCRIPT_TEMPLATES[index % len(_SCRIPT_TEMPLATES)].format(i=index, d=index % 10 + 1)
+        parts.append(line)
+        size += len(line.encode('utf-8'))
+        index += 1
+    return ''.join(parts)
+
+
+def nested_expression(depth: int) -> str:
+    """生成嵌套深度为depth的表达式，交替使用函数调用、括号和各种运算符"""
+    expression = 't'
+    for level in range(depth):
+        kind = level % 4
+        if kind == 0:
+            expression = f"sin({expression})"
+        elif kind == 1:
+            expression = f"({expression} + {level % 7 + 1})"
+        elif kind == 2:
+            expression = f"cos({expression} * 0.5)"
+        else:
+            expression = f"({expression} - t / {level % 5 + 2})"
+    return expression
+
+
+def nested_script(depth: int, statements: int) -> str:
+    """由statements条深度嵌套的赋值语句组成的脚本"""
+    expression = nested_expression(depth)
+    lines = ["param t from 0 to 1 step 0.1\n"]
+    lines.extend(f"v{index} = {expression}\n" for index in range(statements))
+    return ''.join(lines)
+
+
+def sweep_script(points: int) -> str:
+    """在points个取样点上绘制一条较复杂的曲线"""
+    step = 1e-3
+    return (f"param t from 0 to {step * (points - 1)!r} step {step!r}\n"
+            "draw sin(t) * exp(-t / 500) + cos(3 * t) / (1 + t * t)\n")
+
+
+def many_curves_script(curve_count: int, curve_points: int) -> str:
+    """绘制curve_count条曲线，每条curve_points个点"""
+    step = 10.0 / (curve_points - 1)
+    lines = [f"param t from 0 to 10 step {step!r}\n"]
+    lines.extend(f"draw sin(t + {index} * 0.05) * {index % 9 + 1}\n" for index in range(curve_count))
+    return ''.join(lines)
+
+
+def write_workloads(directory: str, sizes: Dict[str, int]) -> Dict[str, str]:
+    """把所有脚本写入directory，返回 名称 -> 文件路径"""
+    os.makedirs(directory, exist_ok=True)
+    sources = {
+        'large': large_script(sizes['script_bytes']),
+        'nested': nested_script(sizes['nesting_depth'], sizes['nested_statements']),
+        'sweep': sweep_script(sizes['sweep_points']),
+        'many_curves': many_curves_script(sizes['curve_count'], sizes['curve_points'])
+    }
+    paths = {}
+    for name, source in sources.items():
+        path = os.path.join(directory, f'{name}.txt')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(source)
+        paths[name] = path
+    return paths
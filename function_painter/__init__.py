@@ -1,23 +1,37 @@
 # Function Painter Interpreter in Python
-from .interpreter import Interpreter
-from .lexer import Token, TokenTypeEnum, TokenBuilder, Lexer, TextReader
-from .parser import Parser
-from .exception import (
-    FunctionPainterException,
-    LexerError,
-    ParserError,
-    InterpreterError,
-    SemanticError,
-    RuntimeError
-)
-from .drawer import Drawer
+import importlib
 
 __version__ = '1.0.0'
 __all__ = [
     'Interpreter',
     'Token', 'TokenTypeEnum', 'TokenBuilder', 'Lexer', 'TextReader',
-    'Parser',
+    'Parser', 'FunctionSpec', 'register_function',
     'FunctionPainterException', 'LexerError', 'ParserError',
-    'InterpreterError', 'SemanticError', 'RuntimeError',
+    'InterpreterError', 'SemanticError', 'RuntimeError', 'ResourceLimitError',
     'Drawer'
-]
\ No newline at end of file
+]
+
+# 导出的名字及其所在的子模块，第一次访问时才导入（PEP 562），
+# import function_painter本身不会导入numpy和matplotlib
+_EXPORTS = {
+    'Interpreter': '.interpreter',
+    'Token': '.lexer', 'TokenTypeEnum': '.lexer', 'TokenBuilder': '.lexer', 'Lexer': '.lexer', 'TextReader': '.lexer',
+    'Parser': '.parser', 'FunctionSpec': '.parser', 'register_function': '.parser',
+    'FunctionPainterException': '.exception', 'LexerError': '.exception', 'ParserError': '.exception',
+    'InterpreterError': '.exception', 'SemanticError': '.exception', 'RuntimeError': '.exception',
+    'ResourceLimitError': '.exception',
+    'Drawer': '.drawer'
+}
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
\ No newline at end of file
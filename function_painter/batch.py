@@ -0,0 +1,142 @@
+from typing import Any, Callable, Dict, List, Optional
+import glob
+import os
+import time
+from .interpreter import Interpreter
+from .tracing import get_logger
+
+
+logger = get_logger('interpreter')
+
+# 给出目录时批量处理的源文件
+DEFAULT_SOURCE_PATTERN = '*.txt'
+
+# 批量处理时输出图像的默认格式
+DEFAULT_BATCH_FORMAT = 'png'
+
+
+def is_batch(paths: List[str]) -> bool:
+    """命令行给出的源文件是否需要按批量模式处理：多个路径、目录或通配符"""
+    return len(paths) > 1 or any(os.path.isdir(path) or glob.has_magic(path) for path in paths)
+
+
+def expand_sources(paths: List[str], pattern: str = DEFAULT_SOURCE_PATTERN) -> List[str]:
+    """把命令行给出的文件、目录和通配符展开为源文件列表
+    
+    目录展开为其中（不含子目录）匹配pattern的文件，通配符支持**递归匹配，
+    结果按给出的顺序排列，每个目录和通配符内部按文件名排序，重复的文件只保留第一次出现。
+    """
+    sources: List[str] = []
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(glob.escape(path), pattern)))
+        elif glob.has_magic(path):
+            matches = sorted(glob.glob(path, recursive=True))
+        else:
+            # 不存在的文件也保留，执行时作为失败报告
+            matches = [path]
+        for match in matches:
+            if os.path.isdir(match):
+                continue
+            key = os.path.abspath(match)
+            if key not in seen:
+                seen.add(key)
+                sources.append(match)
+    return sources
+
+
+def output_paths(sources: List[str], output_dir: Optional[str], file_format: str) -> List[str]:
+    """每个源文件对应的输出图像路径
+    
+    没有给出output_dir时图像写在源文件旁边；写入同一目录的源文件同名时依次加上_2、_3……后缀。
+    """
+    outputs = []
+    used = set()
+    for source in sources:
+        directory = output_dir if output_dir is not None else os.path.dirname(source)
+        stem = os.path.splitext(os.path.basename(source))[0]
+        path = os.path.join(directory, f'{stem}.{file_format}')
+        suffix = 1
+        while os.path.abspath(path) in used:
+            suffix += 1
+            path = os.path.join(directory, f'{stem}_{suffix}.{file_format}')
+        used.add(os.path.abspath(path))
+        outputs.append(path)
+    return outputs
+
+
+class BatchResult:
+    """批量处理中一个脚本的结果"""
+    def __init__(self, source: str, output: str):
+        self.source = source
+        self.output = output
+        self.error: Optional[str] = None
+        self.seconds = 0.0
+    
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+class BatchRunner:
+    """在同一个进程中依次执行多个脚本，每个脚本输出一幅图像
+    
+    每个脚本使用全新的Interpreter，变量、参数、函数等状态互不影响；
+    已经导入的NumPy和matplotlib、编译好的正则表达式、Token匹配映射表以及语法分析和曲线缓存在脚本之间共用，
+    图像由DrawerPool回收，恢复为空白图像后交给下一个脚本，省去每个脚本重新启动Python和创建Figure的开销。
+    一个脚本出错不影响其余脚本。
+    """
+    def __init__(self, interpreter_options: Optional[Dict[str, Any]] = None, output_dir: Optional[str] = None,
+                 file_format: str = DEFAULT_BATCH_FORMAT, report: Optional[Callable[[str], None]] = None):
+        from .drawer import DrawerPool
+        self.interpreter_options = dict(interpreter_options or {})
+        # 批量处理从不打开窗口，show语句被忽略
+        self.interpreter_options['headless'] = True
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.report = report or logger.info
+        self.pool = DrawerPool(headless=True, decimation=self.interpreter_options.get('decimation', 'minmax'))
+    
+    def run(self, sources: List[str]) -> List[BatchResult]:
+        """依次执行所有脚本，返回每个脚本的结果"""
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+        results = []
+        try:
+            for index, (source, output) in enumerate(zip(sources, output_paths(sources, self.output_dir,
+                                                                                self.file_format)), 1):
+                result = self.run_file(source, output)
+                status = f"-> {result.output}" if result.success else f"失败: {result.error}"
+                self.report(f"[{index}/{len(sources)}] {source} {status}（{result.seconds * 1000:.0f}ms）")
+                results.append(result)
+        finally:
+            self.pool.close()
+        logger.debug("批量处理共创建 %s 个绘图器，复用 %s 次", self.pool.created, self.pool.reused)
+        return results
+    
+    def run_file(self, source: str, output: str) -> BatchResult:
+        """在新的解释器中执行一个脚本并保存图像"""
+        result = BatchResult(source, output)
+        started = time.perf_counter()
+        drawer = self.pool.acquire()
+        try:
+            interpreter = Interpreter(drawer=drawer, **self.interpreter_options)
+            interpreter.interpret_file(source)
+            drawer.save_figure(output, self.file_format)
+        except Exception as e:
+            result.error = str(e)
+        finally:
+            self.pool.release(drawer)
+            result.seconds = time.perf_counter() - started
+        return result
+
+
+def summarize(results: List[BatchResult], seconds: float) -> str:
+    """批量处理的汇总：成功和失败的数量，以及每个失败的脚本和原因"""
+    failures = [result for result in results if not result.success]
+    lines = [f"批量处理完成: 共 {len(results)} 个脚本，成功 {len(results) - len(failures)} 个，"
+             f"失败 {len(failures)} 个，用时 {seconds:.2f}s"]
+    for result in failures:
+        lines.append(f"  {result.source}: {result.error}")
+    return '\n'.join(lines)
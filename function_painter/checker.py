@@ -0,0 +1,96 @@
+from typing import Dict, Iterable, List, Optional, Set
+from .exception.exception import SemanticError
+from .parser import FunctionInliner, UserFunction
+from .parser.expression import Expression, FunctionExpression, VariableExpression
+from .tracing import get_logger
+
+
+logger = get_logger('interpreter')
+
+
+class ProgramChecker:
+    """不执行程序的静态检查
+    
+    按程序顺序跟踪已经定义的参数、变量、常量和函数，报告执行时一定会出错的语句：
+    绘图前没有定义参数范围、表达式引用了未定义的变量或未知的数学函数、参数范围无效、
+    函数之间循环引用、调用自定义函数的参数个数不符等。与执行时一致，表达式中对自定义函数的引用和调用
+    展开为函数体后再检查，函数体在被引用时按当时已经定义的名字检查。
+    """
+    def __init__(self, constants: Iterable[str] = ('pi', 'e'), variables: Iterable[str] = (),
+                 functions: Optional[Dict[str, UserFunction]] = None, params: Iterable[str] = ()):
+        self.names: Set[str] = set(constants) | set(variables) | set(params)
+        self.functions: Dict[str, UserFunction] = dict(functions or {})
+        self.has_params = bool(set(params))
+        self.errors: List[SemanticError] = []
+    
+    def check(self, statements: List[Dict]) -> List[SemanticError]:
+        """检查语句列表，返回发现的所有错误，没有错误时返回空列表"""
+        for index, statement in enumerate(statements, 1):
+            self.check_statement(statement, f"第 {index} 条语句（{statement.get('type')}）")
+        logger.debug("静态检查完成，共 %s 条语句，%s 个错误", len(statements), len(self.errors))
+        return self.errors
+    
+    def check_statement(self, statement: Dict, location: str):
+        """检查单个语句，并记录它定义的名字"""
+        statement_type = statement.get('type')
+        if statement_type == 'param':
+            self._check_param(statement, location)
+            self.names.add(statement['name'])
+            self.has_params = True
+        elif statement_type in ('assign', 'const'):
+            self._check_expression(statement['expression'], location)
+            self.names.add(statement['name'])
+        elif statement_type == 'function':
+            # 函数体在引用时才计算，定义时不检查
+            self.functions[statement['name']] = UserFunction(statement['name'], statement.get('params', ()),
+                                                             statement['expression'])
+        elif statement_type == 'draw':
+            if not self.has_params:
+                self._error(location, "没有定义参数范围，请先使用param语句")
+            if 'x_expression' in statement:
+                if str(statement['x_expression']) == "x_coord" and str(statement['y_expression']) == "y_coord":
+                    # 圆的参数方程由解释器特殊处理
+                    return
+                self._check_expression(statement['x_expression'], location)
+                self._check_expression(statement['y_expression'], location)
+            else:
+                self._check_expression(statement['expression'], location)
+        elif statement_type not in ('show', 'clear', 'save'):
+            self._error(location, f"未知的语句类型: {statement_type}")
+    
+    def _check_param(self, statement: Dict, location: str):
+        """检查参数范围，与执行param语句时的检查一致"""
+        start, end, step = statement['min'], statement['max'], statement['step']
+        if step is None and statement.get('adaptive') is not None:
+            return
+        if not all(isinstance(value, (int, float)) for value in (start, end, step)):
+            self._error(location, "参数范围必须是数值")
+        elif step <= 0:
+            self._error(location, f"步长必须大于0: {step}")
+        elif start > end:
+            self._error(location, f"参数范围无效: {start} to {end} with step {step}")
+    
+    def _check_expression(self, expression: Expression, location: str):
+        """展开对自定义函数的引用和调用后，检查表达式中的变量和函数调用"""
+        try:
+            expression = FunctionInliner(self.functions).inline(expression)
+        except ValueError as e:
+            # 循环引用或参数个数不符
+            self._error(location, str(e))
+            return
+        for problem in sorted(self._unknown_names(expression)):
+            self._error(location, problem)
+    
+    def _unknown_names(self, expression: Expression) -> Set[str]:
+        """表达式中未定义的变量和未知的数学函数，返回错误信息的集合"""
+        if isinstance(expression, VariableExpression):
+            return set() if expression.name in self.names else {f"变量 '{expression.name}' 未定义"}
+        problems: Set[str] = set()
+        if isinstance(expression, FunctionExpression) and expression.spec is None:
+            problems.add(f"未知函数名: {expression.name}")
+        for child in expression.children():
+            problems |= self._unknown_names(child)
+        return problems
+    
+    def _error(self, location: str, message: str):
+        self.errors.append(SemanticError(f"{location}: {message}"))
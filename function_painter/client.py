@@ -0,0 +1,103 @@
+from typing import Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from function_painter.exception.exception import FunctionPainterException
+from function_painter.server import DEFAULT_HOST, DEFAULT_PORT
+
+
+# 渲染服务的默认地址
+DEFAULT_URL = f'http://{DEFAULT_HOST}:{DEFAULT_PORT}'
+
+
+class RenderError(FunctionPainterException):
+    """渲染服务返回的错误，status为HTTP状态码，无法连接服务时为None"""
+    def __init__(self, message: str, status: Optional[int] = None):
+        self.status = status
+        super().__init__(f"渲染失败: {message}" if status is None else f"渲染失败（{status}）: {message}")
+
+
+def render(script: str, url: str = DEFAULT_URL, file_format: str = 'png', timeout: Optional[float] = None,
+           max_points: Optional[int] = None) -> bytes:
+    """把脚本交给渲染服务，返回图像内容
+    
+    timeout和max_points只能在服务的上限之内收紧；脚本错误、超时等由RenderError报告。
+    """
+    query = {'format': file_format}
+    if timeout is not None:
+        query['timeout'] = timeout
+    if max_points is not None:
+        query['max_points'] = max_points
+    request = Request(f"{url.rstrip('/')}/render?{urlencode(query)}", data=script.encode('utf-8'),
+                      headers={'Content-Type': 'text/plain; charset=utf-8'}, method='POST')
+    # 给服务端的时限之外留出传输图像的余量
+    socket_timeout = None if timeout is None else timeout + 10
+    try:
+        with urlopen(request, timeout=socket_timeout) as response:
+            return response.read()
+    except HTTPError as e:
+        raise RenderError(e.read().decode('utf-8', errors='replace'), e.code) from e
+    except URLError as e:
+        raise RenderError(f"无法连接渲染服务 {url}: {e.reason}") from e
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="python -m function_painter.client",
+        description="把脚本提交给本机渲染服务并保存返回的图像，用于本地测试"
+    )
+    parser.add_argument("file_path", help="源文件路径，- 表示从标准输入读取")
+    parser.add_argument("-o", "--output", metavar="文件",
+                        help="图像的保存路径，默认与源文件同名，格式由扩展名或--format决定")
+    parser.add_argument("--url", default=DEFAULT_URL,
+                        help="渲染服务的地址（默认: %(default)s）")
+    parser.add_argument("--format", choices=('png', 'svg', 'pdf'),
+                        help="图像格式，默认由-o的扩展名决定，否则为png")
+    parser.add_argument("--timeout", type=float, metavar="秒",
+                        help="请求的时限，不能超过服务的上限")
+    parser.add_argument("--max-points", type=int, metavar="点数",
+                        help="取样点数上限，不能超过服务的上限")
+    return parser
+
+
+def main():
+    """程序主入口"""
+    args = build_argument_parser().parse_args()
+    try:
+        if args.file_path == '-':
+            script = sys.stdin.read()
+            stem = 'output'
+        else:
+            with open(args.file_path, encoding='utf-8') as file:
+                script = file.read()
+            stem = os.path.splitext(args.file_path)[0]
+    except OSError as e:
+        print(f"错误: 无法读取源文件: {e}")
+        sys.exit(1)
+    
+    file_format = args.format
+    if file_format is None and args.output:
+        file_format = os.path.splitext(args.output)[1].lstrip('.').lower() or None
+    file_format = file_format or 'png'
+    output = args.output or f'{stem}.{file_format}'
+    
+    started = time.perf_counter()
+    try:
+        image = render(script, args.url, file_format, args.timeout, args.max_points)
+    except RenderError as e:
+        print(e)
+        sys.exit(1)
+    with open(output, 'wb') as file:
+        file.write(image)
+    print(f"图像已保存到 {output}（{len(image)} 字节，用时 {(time.perf_counter() - started) * 1000:.0f}ms）")
+
+
+if __name__ == "__main__":
+    main()
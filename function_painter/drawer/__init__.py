@@ -1,4 +1,10 @@
 # Drawer module
-from .drawer import Drawer
+# drawer.py在导入时选择matplotlib后端并导入pyplot，耗时较长，第一次访问Drawer、CurveStream或DrawerPool时才导入
+__all__ = ['Drawer', 'CurveStream', 'DrawerPool']
 
-__all__ = ['Drawer']
\ No newline at end of file
+
+def __getattr__(name: str):
+    if name in __all__:
+        from . import drawer
+        return getattr(drawer, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,134 @@
+from __future__ import annotations
+from typing import Tuple
+from ..lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+# 支持的抽稀方法
+DECIMATION_METHODS = ('minmax', 'lttb')
+# 每个像素列保留的点数
+POINTS_PER_BUCKET = 2
+
+
+def _bucket_starts(x_values: np.ndarray, bucket_count: int) -> np.ndarray:
+    """把曲线划分为连续的桶，返回每个桶的起始下标
+    
+    x单调递增的函数曲线按x的取值范围等分，每个桶对应一个像素列；
+    参数方程等x不单调的曲线按下标等分。
+    """
+    count = len(x_values)
+    if count > 1 and np.all(x_values[1:] >= x_values[:-1]) and x_values[-1] > x_values[0]:
+        scaled = (x_values - x_values[0]) * (bucket_count / (x_values[-1] - x_values[0]))
+        bucket_ids = np.minimum(scaled.astype(np.int64), bucket_count - 1)
+    else:
+        bucket_ids = np.arange(count, dtype=np.int64) * bucket_count // count
+    return np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+
+
+def _segment_extreme(values: np.ndarray, starts: np.ndarray, use_max: bool) -> np.ndarray:
+    """返回每个桶内最小值（或最大值）第一次出现的下标"""
+    reduce = np.maximum if use_max else np.minimum
+    extremes = reduce.reduceat(values, starts)
+    segment_ids = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(values)]))
+    hits = np.flatnonzero(values == extremes[segment_ids])
+    # 每个桶取第一个命中的位置
+    _, first = np.unique(segment_ids[hits], return_index=True)
+    return hits[first]
+
+
+def minmax_indices(x_values: np.ndarray, y_values: np.ndarray, bucket_count: int) -> np.ndarray:
+    """每个桶保留y的最小值点和最大值点，以及曲线的首尾两点，所有峰值都被精确保留"""
+    starts = _bucket_starts(x_values, bucket_count)
+    indices = np.concatenate((
+        _segment_extreme(y_values, starts, use_max=False),
+        _segment_extreme(y_values, starts, use_max=True),
+        [0, len(y_values) - 1]
+    ))
+    return np.unique(indices)
+
+
+def lttb_indices(x_values: np.ndarray, y_values: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets抽稀，保留threshold个点
+    
+    每个桶选出与前一个选中点、下一个桶的平均点构成的三角形面积最大的点，
+    能较好地保持曲线形状。LTTB本身不保证保留极值，因此额外保留全局最大值和最小值点。
+    """
+    count = len(x_values)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    
+    # 首尾两点单独保留，中间的点均分为threshold-2个桶
+    edges = 1 + (np.arange(threshold - 1) * (count - 2)) // (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < threshold - 1:
+            next_low, next_high = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_low, next_high = count - 1, count
+        average_x = x_values[next_low:next_high].mean()
+        average_y = y_values[next_low:next_high].mean()
+        # 三角形面积的两倍
+        area = np.abs((x_values[previous] - average_x) * (y_values[low:high] - y_values[previous])
+                      - (x_values[previous] - x_values[low:high]) * (average_y - y_values[previous]))
+        previous = low + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    
+    return np.unique(np.concatenate((selected, [np.argmin(y_values), np.argmax(y_values)])))
+
+
+def compress_gaps(x_values: np.ndarray, y_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """把每一段连续的无效点合并为一个NaN点，matplotlib在NaN处断开曲线，有效点原样保留"""
+    valid_mask = np.isfinite(x_values) & np.isfinite(y_values)
+    if valid_mask.all():
+        return x_values, y_values
+    # 保留所有有效点，以及每段无效点中的第一个
+    keep = valid_mask | np.r_[True, valid_mask[:-1]]
+    x_values = np.where(valid_mask, x_values, np.nan)[keep]
+    y_values = np.where(valid_mask, y_values, np.nan)[keep]
+    return x_values, y_values
+
+
+def decimate(x_values: np.ndarray, y_values: np.ndarray, bucket_count: int,
+             method: str = 'minmax') -> Tuple[np.ndarray, np.ndarray]:
+    """把曲线抽稀为大约每个桶POINTS_PER_BUCKET个点，点数本来就不多时只合并连续的无效点
+    
+    曲线含有无效点（NaN或±inf）时，只在有效点上按整条曲线划分的桶抽稀，再在相邻两个保留点之间
+    有无效点的地方插入一个NaN，保证抽稀不会把间断两侧的点连起来。NaN不会多于保留的有效点数加一，
+    结果的点数只与桶数有关，不随间断的个数增长；曲线以无效点开始或结束时，结果也以NaN开始或结束，
+    逐块抽稀后拼接时块之间的间断同样得以保留。
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"未知的抽稀方法: {method}，支持的方法: {', '.join(DECIMATION_METHODS)}")
+    bucket_count = max(int(bucket_count), 1)
+    if len(x_values) <= bucket_count * POINTS_PER_BUCKET:
+        return compress_gaps(x_values, y_values)
+    valid_mask = np.isfinite(x_values) & np.isfinite(y_values)
+    all_valid = valid_mask.all()
+    if all_valid:
+        x_valid, y_valid = x_values, y_values
+    else:
+        valid_indices = np.flatnonzero(valid_mask)
+        if len(valid_indices) == 0:
+            return np.full(1, np.nan), np.full(1, np.nan)
+        x_valid, y_valid = x_values[valid_indices], y_values[valid_indices]
+    
+    if len(x_valid) <= bucket_count * POINTS_PER_BUCKET:
+        kept = np.arange(len(x_valid))
+    elif method == 'lttb':
+        kept = lttb_indices(x_valid, y_valid, bucket_count * POINTS_PER_BUCKET)
+    else:
+        kept = minmax_indices(x_valid, y_valid, bucket_count)
+    x_kept, y_kept = x_valid[kept], y_valid[kept]
+    if all_valid:
+        return x_kept, y_kept
+    
+    # 截至每个保留点的无效点个数，相邻保留点之间（以及首尾之外）个数变化的地方就是间断
+    invalid_counts = np.cumsum(~valid_mask)
+    counts = np.r_[0, invalid_counts[valid_indices[kept]], invalid_counts[-1]]
+    gaps = np.flatnonzero(np.diff(counts) > 0)
+    return np.insert(x_kept, gaps, np.nan), np.insert(y_kept, gaps, np.nan)
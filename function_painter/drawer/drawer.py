@@ -1,16 +1,122 @@
+import io
+import logging
+import math
+import os
+import sys
+import time
 import matplotlib
-# 设置matplotlib使用TkAgg后端，确保能显示图像窗口
-matplotlib.use('TkAgg')
+
+
+def has_display() -> bool:
+    """判断当前环境能否打开图像窗口"""
+    if sys.platform.startswith('win') or sys.platform == 'darwin':
+        return True
+    return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def _select_backend():
+    """有图形界面时使用TkAgg后端显示窗口，否则退回到只能输出文件的Agg后端"""
+    if has_display():
+        try:
+            import tkinter  # noqa: F401
+            matplotlib.use('TkAgg')
+            return
+        except ImportError:
+            pass
+    matplotlib.use('Agg')
+
+
+_select_backend()
+
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 from typing import List, Tuple, Optional
 import numpy as np
-import sys
+from ..tracing import get_logger
+from .decimation import compress_gaps, decimate, DECIMATION_METHODS
+
+
+logger = get_logger('drawer')
+
+# save语句和--output支持的输出格式，由matplotlib的Agg、SVG、PDF后端负责生成
+SUPPORTED_FORMATS = ('png', 'jpg', 'jpeg', 'svg', 'pdf')
+
+# 不能打开窗口的matplotlib后端
+NON_INTERACTIVE_BACKENDS = ('agg', 'cairo', 'pdf', 'pgf', 'ps', 'svg', 'template')
+
+
+class CurveStream:
+    """逐块接收一条曲线的数据，结束时作为一条曲线绘制
+    
+    每块只保留有限的点，不会把整个取样网格同时留在内存中。
+    给出expected_points且绘图器开启了抽稀时，每块按它在整条曲线中所占的比例单独抽稀，
+    保留的点数只与像素宽度有关；不抽稀时每块只合并连续的无效点，所有有效点都保留到finish，
+    内存占用随总点数增长。
+    """
+    def __init__(self, drawer: 'Drawer', color: Optional[str] = None, expected_points: Optional[int] = None):
+        self.drawer = drawer
+        self.color = color
+        self.expected_points = expected_points
+        self.x_chunks: List[np.ndarray] = []
+        self.y_chunks: List[np.ndarray] = []
+        self.total_points = 0
+        self.valid_points = 0
+    
+    def append(self, x_values: np.ndarray, y_values: np.ndarray):
+        """接收一块数据，每段连续的无效点合并为一个NaN点，曲线在此处断开"""
+        valid_mask = np.isfinite(x_values) & np.isfinite(y_values)
+        self.total_points += len(x_values)
+        self.valid_points += int(np.count_nonzero(valid_mask))
+        if self.drawer.decimation and self.expected_points:
+            bucket_count = math.ceil(self.drawer.pixel_columns() * len(valid_mask) / self.expected_points)
+            x_values, y_values = decimate(x_values, y_values, bucket_count, self.drawer.decimation)
+        else:
+            x_values, y_values = compress_gaps(x_values, y_values)
+        self.x_chunks.append(x_values)
+        self.y_chunks.append(y_values)
+    
+    def collect(self) -> Tuple[np.ndarray, np.ndarray]:
+        """拼接并返回已接收的所有块，不绘制"""
+        logger.debug("流式曲线结束，共 %s 块，总点数: %s，有效点: %s",
+                     len(self.x_chunks), self.total_points, self.valid_points)
+        if self.x_chunks:
+            x_values = np.concatenate(self.x_chunks)
+            y_values = np.concatenate(self.y_chunks)
+        else:
+            x_values = y_values = np.empty(0)
+        self.x_chunks = []
+        self.y_chunks = []
+        return x_values, y_values
+    
+    def finish(self) -> Optional[Line2D]:
+        """拼接所有块并绘制曲线"""
+        x_values, y_values = self.collect()
+        return self.drawer.plot_curve(x_values, y_values, self.color, self.valid_points)
 
 
 class Drawer:
-    """绘图模块"""
-    def __init__(self):
-        self.fig, self.ax = plt.subplots(figsize=(10, 6))
+    """绘图模块
+    
+    headless为True时不创建任何窗口，图像只能通过save_figure写入文件；
+    为None时根据当前环境是否有图形界面自动选择。
+    decimation指定交给matplotlib之前的抽稀方法（'minmax'或'lttb'），为None时绘制所有点。
+    """
+    def __init__(self, headless: Optional[bool] = None, decimation: Optional[str] = 'minmax'):
+        if decimation is not None and decimation not in DECIMATION_METHODS:
+            raise ValueError(f"未知的抽稀方法: {decimation}，支持的方法: {', '.join(DECIMATION_METHODS)}")
+        self.decimation = decimation
+        # 每条曲线抽稀前后的点数
+        self.decimation_stats: List[Tuple[int, int]] = []
+        if headless is None:
+            headless = not has_display() or matplotlib.get_backend().lower() in NON_INTERACTIVE_BACKENDS
+        self.headless = headless
+        if headless:
+            # 直接创建Figure对象，不经过pyplot的窗口管理
+            self.fig = Figure(figsize=(10, 6))
+            self.ax = self.fig.subplots()
+        else:
+            self.fig, self.ax = plt.subplots(figsize=(10, 6))
         self.setup_plot()
         self.plot_count = 0
         self.color_map = {
@@ -24,7 +130,9 @@ class Drawer:
             'magenta': 'm'
         }
         # 确保图像窗口在前台显示
-        self.fig.canvas.manager.window.attributes('-topmost', True)
+        window = getattr(getattr(self.fig.canvas, 'manager', None), 'window', None)
+        if window is not None and hasattr(window, 'attributes'):
+            window.attributes('-topmost', True)
     
     def setup_plot(self):
         """设置绘图环境"""
@@ -39,80 +147,227 @@ class Drawer:
     
     def draw_function(self, points: List[Tuple[float, float]], color: Optional[str] = None):
         """绘制函数曲线"""
-        print(f"调试: draw_function被调用，收到 {len(points)} 个点")
+        logger.debug("draw_function被调用，收到 %s 个点", len(points))
         if not points:
-            print("警告: 没有有效的数据点可供绘制")
+            logger.warning("没有有效的数据点可供绘制")
             return
         
         # 显示前几个点作为示例
-        print(f"调试: 前5个点示例: {points[:5]}")
+        logger.debug("前5个点示例: %s", points[:5])
         
         # 分离x和y坐标
-        x_values = [x for x, y in points]
-        y_values = [y for x, y in points]
+        data = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.draw_curve(data[:, 0], data[:, 1], color)
+    
+    def draw_curve(self, x_values: np.ndarray, y_values: np.ndarray, color: Optional[str] = None) -> Optional[Line2D]:
+        """绘制以数组形式给出的函数曲线，返回曲线对应的Line2D，没有有效点时返回None
         
-        # 打印数据范围
-        print(f"调试: x值范围: {min(x_values)} 到 {max(x_values)}")
-        print(f"调试: y值范围: {min(y_values)} 到 {max(y_values)}")
+        NaN和±inf等无效点不会被跳过后把两侧连起来，曲线在这些点处断开。
+        """
+        logger.debug("draw_curve被调用，收到 %s 个点", len(x_values))
         
-        # 验证数据有效性
-        x_values = np.array(x_values)
-        y_values = np.array(y_values)
+        valid_count = int(np.count_nonzero(np.isfinite(x_values) & np.isfinite(y_values)))
+        logger.debug("有效点数量: %s", valid_count)
         
-        # 过滤无效数据
-        valid_mask = np.isfinite(x_values) & np.isfinite(y_values)
-        x_values = x_values[valid_mask]
-        y_values = y_values[valid_mask]
+        return self.plot_curve(x_values, y_values, color, valid_count)
+    
+    def plot_curve(self, x_values: np.ndarray, y_values: np.ndarray, color: Optional[str],
+                   original_points: int) -> Optional[Line2D]:
+        """抽稀并绘制曲线，original_points为抽稀之前的有效点数
         
-        print(f"调试: 过滤后有效点数量: {len(x_values)}")
+        曲线可以含有无效点，每段连续的无效点在绘制时成为一个间断。
+        """
+        if original_points == 0 or len(x_values) == 0:
+            logger.warning("所有数据点都无效")
+            return None
         
-        if len(x_values) == 0:
-            print("警告: 所有数据点都无效")
-            return
+        # 打印数据范围
+        if logger.isEnabledFor(logging.DEBUG):
+            valid_mask = np.isfinite(x_values) & np.isfinite(y_values)
+            logger.debug("x值范围: %s 到 %s", x_values[valid_mask].min(), x_values[valid_mask].max())
+            logger.debug("y值范围: %s 到 %s", y_values[valid_mask].min(), y_values[valid_mask].max())
+        
+        if self.decimation:
+            x_values, y_values = decimate(x_values, y_values, self.pixel_columns(), self.decimation)
+        else:
+            x_values, y_values = compress_gaps(x_values, y_values)
+        self.decimation_stats.append((original_points, len(x_values)))
+        if len(x_values) < original_points:
+            logger.info("曲线 %s 抽稀(%s): %s 点 -> %s 点，保留 %.2f%%", self.plot_count + 1, self.decimation,
+                        original_points, len(x_values), 100.0 * len(x_values) / original_points)
         
         # 处理颜色
         plot_color = self._get_color(color)
-        print(f"调试: 使用颜色: {plot_color}")
+        logger.debug("使用颜色: %s", plot_color)
         
         # 绘制曲线
-        print(f"调试: 准备调用matplotlib绘制曲线")
-        self.ax.plot(x_values, y_values, color=plot_color, linewidth=2, label=f'曲线 {self.plot_count + 1}')
+        logger.debug("准备调用matplotlib绘制曲线")
+        line, = self.ax.plot(x_values, y_values, color=plot_color, linewidth=2, label=f'曲线 {self.plot_count + 1}')
         self.plot_count += 1
-        print(f"调试: 绘制完成，当前已绘制 {self.plot_count} 条曲线")
+        logger.debug("绘制完成，当前已绘制 %s 条曲线", self.plot_count)
         
         # 更新图例
         self.ax.legend(loc='best')
-        print(f"调试: 图例已更新")
+        logger.debug("图例已更新")
+        return line
     
-    def _get_color(self, color_name: Optional[str]) -> str:
-        """获取有效的颜色值"""
+    def remove_curve(self, line: Line2D):
+        """从图像中移除一条曲线"""
+        line.remove()
+        self.plot_count -= 1
+    
+    def update_curves(self, curves: List[Tuple[Line2D, Optional[str]]]):
+        """按给出的顺序重新编号已有的曲线，未指定颜色的曲线按新的序号重新分配颜色，并刷新图例和坐标范围
+        
+        curves为 (曲线, 语句中指定的颜色) 的列表，用于原地更新图像而不重新绘制未改变的曲线。
+        """
+        for index, (line, color) in enumerate(curves):
+            line.set_label(f'曲线 {index + 1}')
+            if not (color and color.lower() in self.color_map):
+                line.set_color(self._get_color(None, index))
+        self.plot_count = len(curves)
+        legend = self.ax.get_legend()
+        if curves:
+            self.ax.legend(handles=[line for line, _ in curves], loc='best')
+        elif legend is not None:
+            legend.remove()
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.fig.canvas.draw_idle()
+    
+    def begin_stream(self, color: Optional[str] = None, expected_points: Optional[int] = None) -> CurveStream:
+        """开始逐块接收一条曲线，expected_points为预计的总点数"""
+        return CurveStream(self, color, expected_points)
+    
+    def pixel_columns(self) -> int:
+        """绘图区域的像素宽度，抽稀时每个像素列对应一个桶"""
+        return max(int(self.ax.get_window_extent().width), 1)
+    
+    def _get_color(self, color_name: Optional[str], index: Optional[int] = None) -> str:
+        """获取有效的颜色值，index为自动颜色循环中的序号，默认为下一条曲线的序号"""
         if color_name and color_name.lower() in self.color_map:
             return self.color_map[color_name.lower()]
         # 如果没有指定有效颜色，则使用自动颜色循环
         colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
-        return colors[self.plot_count % len(colors)]
+        return colors[(self.plot_count if index is None else index) % len(colors)]
     
     def show(self):
         """显示图像"""
-        print(f"调试: 准备显示图像，已绘制 {self.plot_count} 条曲线")
-        # 设置中文字体以避免中文显示警告
-        plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
-        plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
-        plt.tight_layout()
+        logger.debug("准备显示图像，已绘制 %s 条曲线", self.plot_count)
+        if self.headless:
+            logger.info("无图形界面模式，跳过显示，可以使用save语句或--output保存图像")
+            return
+        self._prepare_output()
         # 强制显示图像窗口并保持阻塞，直到用户关闭窗口
-        print(f"调试: 调用plt.show()显示图像")
+        logger.debug("调用plt.show()显示图像")
         plt.show(block=True)
     
+    def show_window(self):
+        """不阻塞地显示图像窗口，之后由wait处理窗口事件"""
+        if self.headless:
+            return
+        self._prepare_output()
+        plt.show(block=False)
+    
+    def wait(self, seconds: float) -> bool:
+        """等待seconds秒，期间处理窗口事件；窗口已经被关闭时返回False"""
+        if self.headless:
+            time.sleep(seconds)
+            return True
+        if not plt.fignum_exists(self.fig.number):
+            return False
+        self.fig.canvas.start_event_loop(seconds)
+        return plt.fignum_exists(self.fig.number)
+    
     def clear(self):
         """清空图像"""
         self.ax.clear()
         self.setup_plot()
         self.plot_count = 0
+        self.decimation_stats = []
+    
+    def reset(self):
+        """把图像恢复到刚创建时的状态，供DrawerPool回收
+        
+        与clear不同，坐标轴被重新创建，tight_layout调整过的边距也恢复为默认值，
+        之后画出的图像与新创建的绘图器完全相同。
+        """
+        # 直接移除旧坐标轴再创建新的，比ax.clear()逐项复位或重新创建Figure都快
+        self.fig.delaxes(self.ax)
+        self.fig.subplots_adjust(**{name: matplotlib.rcParams[f'figure.subplot.{name}']
+                                    for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')})
+        self.ax = self.fig.subplots()
+        self.setup_plot()
+        self.plot_count = 0
+        self.decimation_stats = []
+    
+    def _prepare_output(self):
+        """显示或保存之前的字体和布局设置"""
+        # 设置中文字体以避免中文显示警告
+        plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
+        plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+        self.fig.tight_layout()
+    
+    def save_figure(self, file_path: str, file_format: Optional[str] = None):
+        """保存图像到文件，格式由file_format或文件扩展名决定"""
+        if file_format is None:
+            file_format = os.path.splitext(file_path)[1].lstrip('.').lower() or 'png'
+        if file_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的图像格式: {file_format}，支持的格式: {', '.join(SUPPORTED_FORMATS)}")
+        self._prepare_output()
+        logger.debug("保存图像到 %s，格式: %s", file_path, file_format)
+        self.fig.savefig(file_path, format=file_format)
     
-    def save_figure(self, file_path: str):
-        """保存图像到文件"""
-        self.fig.savefig(file_path)
+    def render(self, file_format: str = 'png') -> bytes:
+        """把图像按file_format编码，返回文件内容而不写入磁盘"""
+        if file_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的图像格式: {file_format}，支持的格式: {', '.join(SUPPORTED_FORMATS)}")
+        self._prepare_output()
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format=file_format)
+        return buffer.getvalue()
     
     def close(self):
         """关闭绘图窗口"""
-        plt.close(self.fig)
\ No newline at end of file
+        plt.close(self.fig)
+
+class DrawerPool:
+    """可以回收的绘图器池
+    
+    创建Figure和坐标轴、选择字体都有不小的开销，批量处理大量脚本时，
+    一个脚本用完的绘图器清空后交给下一个脚本继续使用，而不是每次重新创建。
+    池中最多保留size个空闲的绘图器，多出的直接关闭。
+    """
+    def __init__(self, headless: Optional[bool] = True, decimation: Optional[str] = 'minmax', size: int = 1):
+        self.headless = headless
+        self.decimation = decimation
+        self.size = size
+        self.idle: List[Drawer] = []
+        self.created = 0
+        self.reused = 0
+    
+    def acquire(self) -> 'Drawer':
+        """取出一个空白的绘图器，池为空时创建新的"""
+        if self.idle:
+            drawer = self.idle.pop()
+            self.reused += 1
+        else:
+            drawer = Drawer(headless=self.headless, decimation=self.decimation)
+            self.created += 1
+        # 上一个使用者可能修改过抽稀方法
+        drawer.decimation = self.decimation
+        return drawer
+    
+    def release(self, drawer: 'Drawer'):
+        """归还绘图器，恢复为空白图像后留待下次使用"""
+        if len(self.idle) >= self.size:
+            drawer.close()
+            return
+        drawer.reset()
+        self.idle.append(drawer)
+    
+    def close(self):
+        """关闭池中所有空闲的绘图器"""
+        for drawer in self.idle:
+            drawer.close()
+        self.idle = []
\ No newline at end of file
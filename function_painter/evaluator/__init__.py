@@ -0,0 +1,10 @@
+# Evaluator module
+from .compiler import ExpressionCompiler, CompiledExpression
+from .cse import SubexpressionCache
+from .streaming import NpyCurveExporter, iter_param_chunks
+from .sharding import ShardedEvaluator
+from .result_cache import CurveCache
+from .domain import SampleErrors
+
+__all__ = ['ExpressionCompiler', 'CompiledExpression', 'SubexpressionCache', 'NpyCurveExporter', 'iter_param_chunks',
+           'ShardedEvaluator', 'CurveCache', 'SampleErrors']
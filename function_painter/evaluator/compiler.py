@@ -0,0 +1,134 @@
+from typing import Callable, Dict, List, Tuple
+import math
+from ..parser.expression import (
+    Expression,
+    ConstantExpression,
+    VariableExpression,
+    AddExpression,
+    SubtractExpression,
+    MultiplyExpression,
+    DivideExpression,
+    PowerExpression,
+    NegateExpression,
+    FunctionExpression
+)
+from ..parser.expression.expression_types import (function_fingerprints, masked_divide, masked_power, vector_divide,
+                                                  vector_power)
+from ..parser.expression.functions import FunctionSpec
+from ..lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+# 编译后的函数：输入变量上下文，返回标量或数组
+CompiledExpression = Callable[[Dict[str, object]], object]
+
+# 二元运算在生成代码中对应的Python运算符
+_BINARY_OPERATORS = {
+    AddExpression: '+',
+    SubtractExpression: '-',
+    MultiplyExpression: '*'
+}
+
+
+class ExpressionCompiler:
+    """表达式编译器，把表达式树转换为一个生成的Python函数
+    
+    生成的函数在开头一次性取出所有变量，随后只执行算术运算和预先绑定的数学函数，
+    避免逐节点的虚函数调用和字符串比较。编译结果按表达式文本、用到的函数的实现摘要和计算模式缓存。
+    """
+    def __init__(self):
+        self.cache: Dict[Tuple[str, Tuple, bool, bool], CompiledExpression] = {}
+    
+    def compile(self, expression: Expression, vectorized: bool = False, masked: bool = False) -> CompiledExpression:
+        """编译表达式，vectorized为True时生成基于NumPy的数组计算函数
+        
+        masked为True时标量函数在定义域之外得到NaN、溢出得到inf，不抛出异常，用于逐点取样；
+        向量化计算总是如此。
+        """
+        masked = masked and not vectorized
+        # 同名函数被替换后，同样的表达式文本对应不同的实现
+        key = (str(expression), function_fingerprints(expression), vectorized, masked)
+        compiled = self.cache.get(key)
+        if compiled is None:
+            compiled = self._build(expression, vectorized, masked)
+            self.cache[key] = compiled
+        return compiled
+    
+    def clear(self):
+        """清空编译缓存"""
+        self.cache.clear()
+    
+    def _build(self, expression: Expression, vectorized: bool, masked: bool) -> CompiledExpression:
+        """生成源码并编译为函数"""
+        variable_names: List[str] = []
+        functions: Dict[str, FunctionSpec] = {}
+        body = self._emit(expression, variable_names, functions, vectorized or masked)
+        
+        lines = ['def _compiled(_vars):']
+        if variable_names:
+            lines.append('    try:')
+            for index, name in enumerate(variable_names):
+                lines.append(f'        _v{index} = _vars[{name!r}]')
+            lines.append('    except KeyError as _error:')
+            lines.append('        raise ValueError(f"变量 \'{_error.args[0]}\' 未定义") from None')
+        lines.append(f'    return {body}')
+        source = '\n'.join(lines)
+        
+        namespace = self._namespace(vectorized, masked, functions)
+        exec(compile(source, f'<compiled {expression}>', 'exec'), namespace)
+        return namespace['_compiled']
+    
+    def _namespace(self, vectorized: bool, masked: bool, functions: Dict[str, FunctionSpec]) -> Dict[str, object]:
+        """生成代码执行时可见的函数，只绑定表达式中用到的函数"""
+        namespace = {}
+        for name, spec in functions.items():
+            if vectorized:
+                namespace[f'_f_{name}'] = spec.vector_kernel
+            else:
+                namespace[f'_f_{name}'] = spec.masked if masked else spec.scalar
+        if vectorized:
+            namespace['_div'] = vector_divide
+            namespace['_pow'] = vector_power
+        elif masked:
+            namespace['_div'] = masked_divide
+            namespace['_pow'] = masked_power
+        else:
+            namespace['_pow'] = math.pow
+        return namespace
+    
+    def _emit(self, expression: Expression, variable_names: List[str], functions: Dict[str, FunctionSpec],
+              masked: bool) -> str:
+        """递归生成表达式对应的Python源码，用到的函数记录在functions中；masked为True时除法调用_div，零除数不抛出异常"""
+        if isinstance(expression, ConstantExpression):
+            value = float(expression.value)
+            # inf和nan没有可直接求值的字面量
+            return repr(value) if math.isfinite(value) else f"float('{value}')"
+        
+        if isinstance(expression, VariableExpression):
+            if expression.name not in variable_names:
+                variable_names.append(expression.name)
+            return f'_v{variable_names.index(expression.name)}'
+        
+        if isinstance(expression, NegateExpression):
+            return f'(-{self._emit(expression.operand, variable_names, functions, masked)})'
+        
+        if isinstance(expression, FunctionExpression):
+            if expression.spec is None:
+                raise ValueError(f"未知函数名: {expression.name}")
+            functions[expression.name] = expression.spec
+            args = ', '.join(self._emit(arg, variable_names, functions, masked) for arg in expression.args)
+            return f'_f_{expression.name}({args})'
+        
+        left = self._emit(expression.left, variable_names, functions, masked)
+        right = self._emit(expression.right, variable_names, functions, masked)
+        
+        if type(expression) in _BINARY_OPERATORS:
+            return f'({left} {_BINARY_OPERATORS[type(expression)]} {right})'
+        if isinstance(expression, DivideExpression):
+            # 普通的标量模式下Python除法对零除数本身就会抛出ZeroDivisionError
+            return f'_div({left}, {right})' if masked else f'({left} / {right})'
+        if isinstance(expression, PowerExpression):
+            return f'_pow({left}, {right})'
+        
+        raise ValueError(f"无法编译的表达式类型: {type(expression).__name__}")
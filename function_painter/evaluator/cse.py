@@ -0,0 +1,166 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Set, Tuple
+from ..parser.expression import Expression
+from ..parser.expression.expression_base import VectorValue
+from ..parser.expression.hashcons import ExpressionPool
+from .compiler import ExpressionCompiler
+from ..lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+# 取样网格的标识：(参数名, 起点, 终点, 步长, 点数)
+GridKey = Tuple[Hashable, ...]
+
+# 缓存项占用内存的默认上限（字节）
+DEFAULT_CSE_BUDGET = 256 << 20
+
+
+class SubexpressionCache:
+    """跨draw语句的公共子表达式缓存
+    
+    执行前由plan把整个程序中所有draw语句的表达式合并为规范节点，统计每个节点被多少个表达式引用，
+    只有被不止一个表达式引用的子树才缓存计算结果，其余部分直接用编译后的函数计算。
+    每条draw语句计算完成后由release扣除它的引用，节点不再被后续语句引用时删除它在所有网格上的缓存项。
+    每个缓存项记录它依赖的非网格变量及其取值，命中时再核对一次取值；
+    变量、常量或参数被重新定义时相应的缓存项被删除。缓存项总大小超过max_bytes时删除最久未用的项。
+    """
+    def __init__(self, compiler: Optional[ExpressionCompiler] = None, max_bytes: int = DEFAULT_CSE_BUDGET):
+        self.compiler = compiler if compiler is not None else ExpressionCompiler()
+        self.max_bytes = max_bytes
+        self.pool = ExpressionPool()
+        # 规范节点的id -> 还没有计算的引用它的表达式个数，只记录被多个表达式引用的节点
+        self.remaining: Dict[int, int] = {}
+        # 子树中含有共享节点的规范节点的id，其余子树不经过缓存
+        self.shared_subtrees: Set[int] = set()
+        self.entries: OrderedDict[Tuple[GridKey, int], Tuple[VectorValue, Tuple[Tuple[str, float], ...]]] = \
+            OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def plan(self, draws: Sequence[Sequence[Expression]]):
+        """登记程序中所有draw语句的表达式（已展开自定义函数），每条语句一组，按程序顺序给出"""
+        self.reset()
+        uses: Dict[int, int] = {}
+        for expressions in draws:
+            for expression in expressions:
+                for node_id in self._subtree_ids(self.pool.intern(expression)):
+                    uses[node_id] = uses.get(node_id, 0) + 1
+        self.remaining = {node_id: count for node_id, count in uses.items() if count > 1}
+        
+        # 规范节点在池中按自底向上的顺序登记，子节点总是先于父节点
+        for node in self.pool.nodes.values():
+            if id(node) in self.remaining or any(id(child) in self.shared_subtrees for child in node.children()):
+                self.shared_subtrees.add(id(node))
+    
+    def evaluate(self, expression: Expression, variables: Dict[str, VectorValue], grid_key: GridKey,
+                 grid_variable: str) -> VectorValue:
+        """在指定网格上计算表达式，复用之前计算过的共享子树结果"""
+        if not self.shared_subtrees:
+            return self.compiler.compile(expression, vectorized=True)(variables)
+        canonical = self.pool.intern(expression)
+        return self._evaluate(canonical, variables, grid_key, grid_variable)
+    
+    def _evaluate(self, node: Expression, variables: Dict[str, VectorValue], grid_key: GridKey,
+                  grid_variable: str) -> VectorValue:
+        node_id = id(node)
+        if node_id not in self.shared_subtrees:
+            # 子树中没有共享的部分，编译后一次计算
+            return self.compiler.compile(node, vectorized=True)(variables)
+        
+        children = node.children()
+        if not children:
+            return node.evaluate_vector(variables)
+        if node_id not in self.remaining:
+            # 只有子树中的一部分是共享的
+            return node.apply_vector(*(self._evaluate(child, variables, grid_key, grid_variable) for child in children))
+
+        key = (grid_key, node_id)
+        cached = self.entries.get(key)
+        if cached is not None and all(variables.get(name) == value for name, value in cached[1]):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return cached[0]
+        
+        self.misses += 1
+        values = node.apply_vector(*(self._evaluate(child, variables, grid_key, grid_variable) for child in children))
+        if isinstance(values, np.ndarray):
+            # 缓存的数组会被多条曲线共享，禁止原地修改
+            values.setflags(write=False)
+        dependencies = tuple(
+            (name, variables.get(name)) for name in sorted(self.pool.variables_of(node) - {grid_variable}))
+        self._store(key, values, dependencies)
+        return values
+    
+    def _store(self, key: Tuple[GridKey, int], values: VectorValue, dependencies: Tuple[Tuple[str, float], ...]):
+        """保存缓存项，超过内存上限时删除最久未用的项"""
+        size = getattr(values, 'nbytes', 0)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._discard(key)
+        self.entries[key] = (values, dependencies)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            self._discard(next(iter(self.entries)))
+            self.evictions += 1
+    
+    def _discard(self, key: Tuple[GridKey, int]):
+        values, _ = self.entries.pop(key)
+        self.nbytes -= getattr(values, 'nbytes', 0)
+    
+    def release(self, expressions: Sequence[Expression]):
+        """一条draw语句计算完成，扣除它的表达式对共享节点的引用，删除不再被引用的节点的缓存项"""
+        if not self.remaining:
+            return
+        finished: List[int] = []
+        for expression in expressions:
+            for node_id in self._subtree_ids(self.pool.intern(expression)):
+                count = self.remaining.get(node_id)
+                if count is None:
+                    continue
+                if count > 1:
+                    self.remaining[node_id] = count - 1
+                else:
+                    del self.remaining[node_id]
+                    finished.append(node_id)
+        if finished:
+            finished_ids = set(finished)
+            for key in [key for key in self.entries if key[1] in finished_ids]:
+                self._discard(key)
+    
+    def invalidate(self, name: str):
+        """名字为name的变量、常量或参数被修改时，删除所有依赖它的缓存项"""
+        stale = [key for key, (_, dependencies) in self.entries.items()
+                 if key[0][0] == name or any(dependency == name for dependency, _ in dependencies)]
+        for key in stale:
+            self._discard(key)
+    
+    def clear(self):
+        """清空所有缓存项，保留plan登记的共享节点"""
+        self.entries.clear()
+        self.nbytes = 0
+    
+    def reset(self):
+        """清空缓存项、规范节点和plan的登记"""
+        self.clear()
+        self.remaining.clear()
+        self.shared_subtrees.clear()
+        self.pool.clear()
+    
+    def _subtree_ids(self, canonical: Expression) -> Set[int]:
+        """规范节点子树中所有不同节点的id"""
+        seen: Set[int] = set()
+        stack = [canonical]
+        while stack:
+            node = stack.pop()
+            if id(node) not in seen:
+                seen.add(id(node))
+                stack.extend(node.children())
+        return seen
+    
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+from ..lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+class SampleErrors:
+    """一条曲线取样结果中无效点的统计
+    
+    取样时定义域之外的点（对负数开方、零作除数等）得到NaN，结果溢出的点得到±inf，
+    都不会抛出异常；取样结束后一次性按掩码统计，x或y任一无效的点都记为无效，同时为NaN和inf时记为定义域之外。
+    """
+    def __init__(self, total: int = 0, undefined: int = 0, overflow: int = 0):
+        self.total = total
+        self.undefined = undefined
+        self.overflow = overflow
+    
+    @classmethod
+    def count(cls, x_values: np.ndarray, y_values: np.ndarray) -> SampleErrors:
+        """统计一条曲线的取样结果"""
+        return cls().add(x_values, y_values)
+    
+    def add(self, x_values: np.ndarray, y_values: np.ndarray) -> SampleErrors:
+        """累加一块取样结果，流式计算时逐块调用"""
+        undefined = np.isnan(x_values) | np.isnan(y_values)
+        infinite = np.isinf(x_values) | np.isinf(y_values)
+        self.total += len(x_values)
+        self.undefined += int(np.count_nonzero(undefined))
+        self.overflow += int(np.count_nonzero(infinite & ~undefined))
+        return self
+    
+    @property
+    def invalid(self) -> int:
+        return self.undefined + self.overflow
+    
+    @property
+    def valid(self) -> int:
+        return self.total - self.invalid
+    
+    def __repr__(self) -> str:
+        return f"SampleErrors(total={self.total}, undefined={self.undefined}, overflow={self.overflow})"
+    
+    def __str__(self) -> str:
+        return f"总点数: {self.total}，成功点: {self.valid}，定义域之外: {self.undefined}，溢出: {self.overflow}"
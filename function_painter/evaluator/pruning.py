@@ -0,0 +1,120 @@
+from __future__ import annotations
+from collections import deque
+from numbers import Real
+from typing import Dict, List, Optional, Sequence, Tuple
+from ..parser.expression import Expression
+from ..parser.expression.interval import Interval
+from .sampling import CurveFunction
+from ..lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+# 取样点数少于该值时不做剪枝，区间计算本身的开销已经和直接取样相当
+MIN_PRUNE_POINTS = 4096
+# 剪枝的最小粒度，不再细分的一段最少的点数
+MIN_SEGMENT_POINTS = 256
+# 一条曲线最多做的区间计算次数，超出后剩余的段全部保留
+MAX_INTERVAL_EVALUATIONS = 512
+
+# 一段参数范围的判断结果
+_UNDEFINED, _DEFINED, _UNKNOWN = range(3)
+
+
+class PrunedGrid:
+    """区间剪枝的结果：取样网格 start + i*step (0 <= i < count) 上需要计算的若干段下标范围
+    
+    ranges中的每段为 [起始下标, 结束下标)，按下标递增且互不相邻；不在其中的点可以证明没有定义，
+    取样时直接记为NaN，与逐点计算的结果一致。
+    """
+    def __init__(self, count: int, ranges: List[Tuple[int, int]], evaluations: int):
+        self.count = count
+        self.ranges = ranges
+        self.evaluations = evaluations
+        self.kept = sum(stop - start for start, stop in ranges)
+    
+    @property
+    def pruned(self) -> int:
+        """剪除的点数"""
+        return self.count - self.kept
+    
+    def mask(self, offset: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """网格下标 [offset, stop) 中需要计算的点的掩码"""
+        stop = self.count if stop is None else stop
+        keep = np.zeros(stop - offset, dtype=bool)
+        for start, end in self.ranges:
+            if end > offset and start < stop:
+                keep[max(start, offset) - offset:min(end, stop) - offset] = True
+        return keep
+    
+    def scatter(self, values: np.ndarray, keep: np.ndarray) -> np.ndarray:
+        """把只在保留的点上计算的结果展开为整段数组，剪除的点为NaN"""
+        full = np.full(len(keep), np.nan)
+        full[keep] = values
+        return full
+    
+    def sample(self, curve: CurveFunction, t_values: np.ndarray, offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """只在保留的点上调用曲线函数，t_values为网格下标从offset开始的一段
+        
+        普通函数的曲线函数直接返回参数数组作为x，这时x保持为完整的参数数组。
+        """
+        keep = self.mask(offset, offset + len(t_values))
+        if keep.all():
+            return curve(t_values)
+        t_kept = t_values[keep]
+        x_kept, y_kept = curve(t_kept)
+        x_values = t_values if x_kept is t_kept else self.scatter(x_kept, keep)
+        return x_values, self.scatter(y_kept, keep)
+
+
+def _classify(expressions: Sequence[Expression], variables: Dict[str, Interval]) -> int:
+    """判断一段参数范围：所有表达式处处没有定义、所有表达式处处有定义，或者无法确定
+    
+    参数方程只有x和y都没有定义时才能剪除，只有一个没有定义的点仍要计算另一个，结果才与逐点计算一致。
+    """
+    results = [expression.evaluate_interval(variables) for expression in expressions]
+    if all(result.is_empty for result in results):
+        return _UNDEFINED
+    if any(result.partial and not result.is_empty for result in results):
+        return _UNKNOWN
+    return _DEFINED
+
+
+def prune_grid(expressions: Sequence[Expression], param_name: str, start: float, step: float, count: int,
+               variables: Dict[str, float]) -> PrunedGrid:
+    """用区间计算找出取样网格上可以证明没有定义的部分
+    
+    从整个网格开始逐层二分：整段都没有定义的部分剪除，整段都有定义的部分保留，
+    无法确定的部分继续二分，直到不超过最小粒度。按层处理，区间计算次数用完时剩余的段全部保留。
+    每段的参数区间取它的首尾两个取样点，与取样使用相同的公式 start + i*step。
+    """
+    context = {name: Interval.point(value) for name, value in variables.items() if isinstance(value, Real)}
+    min_points = max(MIN_SEGMENT_POINTS, count // MAX_INTERVAL_EVALUATIONS)
+    kept: List[Tuple[int, int]] = []
+    queue = deque([(0, count)])
+    evaluations = 0
+    while queue:
+        first, stop = queue.popleft()
+        if evaluations >= MAX_INTERVAL_EVALUATIONS:
+            kept.append((first, stop))
+            continue
+        evaluations += 1
+        context[param_name] = Interval(*sorted((start + step * first, start + step * (stop - 1))))
+        status = _classify(expressions, context)
+        if status == _UNDEFINED:
+            continue
+        if status == _DEFINED or stop - first <= min_points:
+            kept.append((first, stop))
+            continue
+        middle = (first + stop) // 2
+        queue.append((first, middle))
+        queue.append((middle, stop))
+    
+    # 合并相邻的段
+    ranges: List[Tuple[int, int]] = []
+    for first, stop in sorted(kept):
+        if ranges and ranges[-1][1] == first:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((first, stop))
+    return PrunedGrid(count, ranges, evaluations)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import tempfile
+from ..parser.expression import function_fingerprints
+from ..parser.program_cache import cache_root
+from ..tracing import get_logger
+from ..lazy_import import lazy_import
+
+
+logger = get_logger('interpreter')
+np = lazy_import('numpy')
+
+# 缓存文件格式或取样算法变化时递增，旧的缓存项自然失效
+CACHE_FORMAT_VERSION = 2
+# 缓存目录的默认大小上限（字节）
+DEFAULT_CACHE_SIZE = 256 << 20
+
+
+def default_cache_dir() -> str:
+    """曲线结果的默认缓存目录"""
+    return os.path.join(cache_root(), 'curves')
+
+
+def curve_signature(expressions: Sequence, param_name: str, param_range: Tuple[float, float, float],
+                    sampling: Optional[Dict[str, Any]], variables: Dict[str, Any]) -> str:
+    """draw语句在一个参数上的计算结果的内容签名
+    
+    由表达式的规范形式（已解析函数引用、经过优化的表达式树的字符串形式）、用到的函数的实现摘要、
+    参数名、取样范围和自适应取样设置，以及表达式读取的变量取值共同决定。
+    """
+    payload = {
+        'format': CACHE_FORMAT_VERSION,
+        'expressions': [str(expression) for expression in expressions],
+        'functions': sorted(set().union(*(function_fingerprints(expression) for expression in expressions)),
+                            key=lambda item: (item[0], item[1] or '')),
+        'param': param_name,
+        # 浮点数用十六进制表示，保证签名区分所有不同的取值
+        'range': [float(value).hex() for value in param_range],
+        'sampling': sampling,
+        'variables': sorted((name, None if value is None else float(value).hex()) for name, value in variables.items())
+    }
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CurveCache:
+    """按内容签名保存曲线取样结果的磁盘缓存
+    
+    每条曲线一个 <签名>.npy 文件，内容为一维float64数组 [参数最终值, x..., y...]，
+    命中时通过 np.load(mmap_mode='r') 映射读取，x和y是映射上的视图，不做任何计算。
+    目录总大小超过max_bytes时按最近使用时间（文件修改时间）删除最久未用的项。
+    """
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def _path(self, signature: str) -> str:
+        return os.path.join(self.directory, f'{signature}.npy')
+    
+    def load(self, signature: str) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+        """读取缓存项，返回 (x, y, 参数最终值)，未命中时返回None"""
+        path = self._path(signature)
+        try:
+            data = np.load(path, mmap_mode='r')
+            # 更新修改时间，作为LRU的最近使用时间
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if data.ndim != 1 or len(data) % 2 != 1:
+            logger.warning("缓存文件已损坏，忽略: %s", path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        count = (len(data) - 1) // 2
+        return data[1:count + 1], data[count + 1:], float(data[0])
+    
+    def store(self, signature: str, x_values: np.ndarray, y_values: np.ndarray, param_value: float):
+        """保存一条曲线，先写入临时文件再改名，其他进程不会读到写了一半的文件"""
+        data = np.concatenate(([param_value], x_values, y_values)).astype(np.float64, copy=False)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.save(file, data)
+            os.replace(temp_path, self._path(signature))
+        except OSError as e:
+            logger.warning("写入曲线缓存失败: %s", e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._evict()
+    
+    def _evict(self):
+        """删除最久未用的缓存项，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                if entry.name.endswith('.npy'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+            logger.debug("曲线缓存超过上限，删除 %s", path)
+    
+    def clear(self):
+        """删除所有缓存项"""
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                if entry.name.endswith('.npy'):
+                    os.remove(entry.path)
+    
+    def stats(self) -> str:
+        """命中统计的文字描述"""
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return f"命中 {self.hits} 次，未命中 {self.misses} 次（命中率 {rate:.1f}%），淘汰 {self.evictions} 项"
@@ -0,0 +1,123 @@
+from __future__ import annotations
+from typing import Callable, Tuple
+import math
+from ..lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+# 曲线函数：输入参数数组，返回对应的 (x, y) 数组
+CurveFunction = Callable[['np.ndarray'], Tuple['np.ndarray', 'np.ndarray']]
+
+# 自适应取样的默认设置
+DEFAULT_TOLERANCE = 1e-3
+DEFAULT_MAX_DEPTH = 12
+DEFAULT_MAX_POINTS = 10000
+# 没有给出步长时初始网格的区间数
+DEFAULT_INITIAL_SEGMENTS = 64
+
+
+def _robust_scale(values: np.ndarray) -> float:
+    """取有限值的2%~98%分位数范围作为误差的归一化尺度，避免渐近线附近的极大值压低容差"""
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 1.0
+    low, high = np.percentile(finite, [2, 98])
+    scale = float(high - low)
+    return scale if scale > 0 else 1.0
+
+
+def _uniform_grid_size(start: float, end: float, initial_step: float) -> int:
+    """步长为initial_step的均匀网格加上终点的点数"""
+    count = int(math.floor((end - start) / initial_step + 1e-9)) + 1
+    if start + initial_step * (count - 1) < end:
+        count += 1
+    return count
+
+
+def initial_grid_size(start: float, end: float, initial_step: float, max_points: int = DEFAULT_MAX_POINTS) -> int:
+    """自适应取样初始网格的点数，超过max_points的网格被放粗为max_points个点"""
+    return min(_uniform_grid_size(start, end, initial_step), max_points)
+
+
+def adaptive_point_limit(start: float, end: float, initial_step: float, max_depth: int = DEFAULT_MAX_DEPTH,
+                         max_points: int = DEFAULT_MAX_POINTS) -> int:
+    """adaptive_sample最多产生的点数，包括初始网格，用于在取样之前扣除点数预算
+    
+    每轮细分最多使区间数翻倍，因此除了max_points之外还受初始网格和max_depth的限制。
+    """
+    initial = initial_grid_size(start, end, initial_step, max_points)
+    return min((initial - 1) * 2 ** max_depth + 1, max_points)
+
+
+def adaptive_sample(curve: CurveFunction, start: float, end: float, initial_step: float,
+                    tol: float = DEFAULT_TOLERANCE, max_depth: int = DEFAULT_MAX_DEPTH,
+                    max_points: int = DEFAULT_MAX_POINTS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按曲率自适应地取样，返回 (t, x, y) 三个按t递增排列的数组
+    
+    先在步长为initial_step的均匀网格上取样，然后反复检查每个待定区间的中点：
+    中点与两端点线性插值的偏差（按曲线的取值范围归一化）超过tol的区间被一分为二，
+    两个子区间在下一轮继续检查；偏差在容差以内的区间不再细分。
+    一端有定义、另一端无定义的区间总是被细分，以便逼近定义域边界和渐近线。
+    细分最多进行max_depth轮，总点数不超过max_points，超出预算时优先细分偏差最大的区间。
+    初始网格本身超过max_points时改为在 [start, end] 上等距取max_points个点。
+    """
+    if max_points < 2:
+        raise ValueError(f"自适应取样的点数上限至少为2: {max_points}")
+    if _uniform_grid_size(start, end, initial_step) > max_points:
+        # 初始网格超出点数预算，在分配数组之前把网格放粗
+        t = np.linspace(start, end, max_points)
+    else:
+        count = int(math.floor((end - start) / initial_step + 1e-9)) + 1
+        t = start + initial_step * np.arange(count, dtype=np.float64)
+        if t[-1] < end:
+            # 保证终点也被取样
+            t = np.append(t, end)
+    x, y = curve(t)
+    x_scale = _robust_scale(x)
+    y_scale = _robust_scale(y)
+    
+    # active[i]表示区间 [t[i], t[i+1]] 还需要检查
+    active = np.ones(len(t) - 1, dtype=bool)
+    
+    for _ in range(max_depth):
+        remaining = max_points - len(t)
+        candidates = np.flatnonzero(active)
+        if remaining <= 0 or len(candidates) == 0:
+            break
+        
+        t_mid = (t[candidates] + t[candidates + 1]) / 2
+        x_mid, y_mid = curve(t_mid)
+        
+        error = np.maximum(
+            np.abs(x_mid - (x[candidates] + x[candidates + 1]) / 2) / x_scale,
+            np.abs(y_mid - (y[candidates] + y[candidates + 1]) / 2) / y_scale
+        )
+        # 有定义与无定义的交界处视为误差无穷大，三点都无定义的区间不再细分
+        defined = np.isfinite(x_mid) & np.isfinite(y_mid)
+        left_defined = np.isfinite(x[candidates]) & np.isfinite(y[candidates])
+        right_defined = np.isfinite(x[candidates + 1]) & np.isfinite(y[candidates + 1])
+        boundary = (defined != left_defined) | (defined != right_defined)
+        error = np.where(boundary, np.inf, np.where(defined, error, 0.0))
+        
+        refine = error > tol
+        if len(np.flatnonzero(refine)) > remaining:
+            # 点数预算不足时只细分偏差最大的区间
+            worst = np.argsort(-error, kind='stable')[:remaining]
+            refine = np.zeros_like(refine)
+            refine[worst] = True
+        
+        split = candidates[refine]
+        if len(split) == 0:
+            break
+        
+        # 被细分的区间产生两个待检查的子区间，其余区间不再检查
+        split_mask = np.zeros(len(t) - 1, dtype=bool)
+        split_mask[split] = True
+        active = np.repeat(split_mask, np.where(split_mask, 2, 1))
+        
+        t = np.insert(t, split + 1, t_mid[refine])
+        x = np.insert(x, split + 1, x_mid[refine])
+        y = np.insert(y, split + 1, y_mid[refine])
+    
+    return t, x, y
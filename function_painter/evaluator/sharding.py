@@ -0,0 +1,119 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+import os
+import sys
+from .compiler import ExpressionCompiler
+from ..lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+np = lazy_import('numpy')
+shared_memory = lazy_import('multiprocessing.shared_memory')
+
+
+# 默认每个分片的点数
+DEFAULT_SHARD_SIZE = 1 << 18
+# 分片边界对齐到该值的整数倍，NumPy的SIMD循环在每个分片中处理的位置与整体计算时一致，
+# 只有最后一个分片有不足一组的尾部，保证结果与单进程计算逐位相同
+SHARD_ALIGNMENT = 1024
+
+
+def shard_bounds(count: int, shard_size: int) -> List[range]:
+    """把 [0, count) 划分为连续的分片，除最后一片外长度都是SHARD_ALIGNMENT的整数倍"""
+    shard_size = max(shard_size // SHARD_ALIGNMENT, 1) * SHARD_ALIGNMENT
+    return [range(offset, min(offset + shard_size, count)) for offset in range(0, count, shard_size)]
+
+
+# 工作进程的全局状态，由进程池的initializer在每个进程中设置一次
+_worker_state: Dict[str, Any] = {}
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """连接到主进程创建的共享内存，共享内存的释放只由主进程负责"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(expressions: Sequence, variables: Dict[str, float], constants: Dict[str, float],
+                 param_name: str, start: float, step: float, memory_name: str, capacity: int):
+    """工作进程初始化：接收表达式并编译，连接输出缓冲区"""
+    compiler = ExpressionCompiler()
+    memory = _attach_shared_memory(memory_name)
+    _worker_state.update(
+        functions=[compiler.compile(expression, vectorized=True) for expression in expressions],
+        variables=variables,
+        constants=constants,
+        param_name=param_name,
+        start=start,
+        step=step,
+        memory=memory,
+        output=np.ndarray((len(expressions), capacity), dtype=np.float64, buffer=memory.buf)
+    )
+
+
+def _evaluate_shard(base: int, offset: int, stop: int):
+    """计算网格下标 [offset, stop) 的一个分片，结果写入共享缓冲区中从base开始的位置"""
+    state = _worker_state
+    # 与单进程计算使用相同的网格公式
+    t_values = state['start'] + state['step'] * np.arange(offset, stop, dtype=np.float64)
+    context = {**state['variables'], state['param_name']: t_values, **state['constants']}
+    with np.errstate(all='ignore'):
+        for row, function in enumerate(state['functions']):
+            values = np.asarray(function(context), dtype=np.float64)
+            state['output'][row, offset - base:stop - base] = np.broadcast_to(values, t_values.shape)
+
+
+class ShardedEvaluator:
+    """在多个进程中分片计算参数网格 start + i*step 上的表达式
+    
+    表达式和变量只在进程启动时传给每个工作进程一次，之后每个分片只传递下标范围；
+    工作进程把结果直接写入共享内存中的float64缓冲区，不经过pickle。
+    缓冲区一次最多容纳capacity个点，更长的网格按块依次调用evaluate。
+    """
+    def __init__(self, expressions: Sequence, variables: Dict[str, float], constants: Dict[str, float],
+                 param_name: str, start: float, step: float, capacity: int,
+                 workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE):
+        # 在主进程中先编译一次，表达式有错时直接报告，而不是让工作进程初始化失败
+        compiler = ExpressionCompiler()
+        for expression in expressions:
+            compiler.compile(expression, vectorized=True)
+        self.expressions = list(expressions)
+        self.variables = variables
+        self.constants = constants
+        self.param_name = param_name
+        self.start = start
+        self.step = step
+        self.capacity = max(capacity, 1)
+        self.shard_size = shard_size
+        shard_count = len(shard_bounds(self.capacity, shard_size))
+        self.workers = max(min(workers or os.cpu_count() or 1, shard_count), 1)
+        self.memory: Optional[shared_memory.SharedMemory] = None
+        self.output: Optional[np.ndarray] = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+    
+    def __enter__(self) -> 'ShardedEvaluator':
+        rows = len(self.expressions)
+        self.memory = shared_memory.SharedMemory(create=True, size=rows * self.capacity * np.dtype(np.float64).itemsize)
+        self.output = np.ndarray((rows, self.capacity), dtype=np.float64, buffer=self.memory.buf)
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            initargs=(self.expressions, self.variables, self.constants, self.param_name,
+                      self.start, self.step, self.memory.name, self.capacity))
+        return self
+    
+    def evaluate(self, offset: int, stop: int) -> np.ndarray:
+        """计算网格下标 [offset, stop) 上的所有表达式，返回形状为 (表达式个数, stop-offset) 的数组"""
+        futures = [self.pool.submit(_evaluate_shard, offset, offset + shard.start, offset + shard.stop)
+                   for shard in shard_bounds(stop - offset, self.shard_size)]
+        for future in futures:
+            future.result()
+        return self.output[:, :stop - offset].copy()
+    
+    def __exit__(self, *exc_info):
+        self.pool.shutdown(cancel_futures=True)
+        self.output = None
+        self.memory.close()
+        self.memory.unlink()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+from typing import Iterator, Optional, Tuple
+import math
+import os
+from .sampling import CurveFunction
+from .pruning import PrunedGrid
+from ..lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+# 流式计算默认的内存预算（字节）
+DEFAULT_MEMORY_BUDGET = 64 << 20
+# 每个取样点在计算过程中大约同时存在的float64数组个数：参数、x、y以及表达式的中间结果
+ARRAYS_PER_SAMPLE = 8
+# float64的字节数，不必为此导入NumPy
+FLOAT64_SIZE = 8
+# 块大小对齐到该值的整数倍，最小也取这么多点
+CHUNK_ALIGNMENT = 1024
+
+
+def grid_size(start: float, end: float, step: float) -> int:
+    """参数网格 start + i*step 的点数，端点在浮点误差范围内时仍被包含"""
+    return max(int(math.floor((end - start) / step + 1e-9)) + 1, 0)
+
+
+def chunk_size_for_budget(memory_budget: int = DEFAULT_MEMORY_BUDGET) -> int:
+    """根据内存预算计算每块的点数"""
+    size = memory_budget // (ARRAYS_PER_SAMPLE * FLOAT64_SIZE)
+    return max(size // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT, CHUNK_ALIGNMENT)
+
+
+def iter_param_chunks(start: float, end: float, step: float, chunk_size: int) -> Iterator[np.ndarray]:
+    """按块生成参数网格，每块最多chunk_size个点
+    
+    与一次性生成的网格使用相同的公式 start + i*step，拼接起来与之逐位相同。
+    """
+    count = grid_size(start, end, step)
+    for offset in range(0, count, chunk_size):
+        stop = min(offset + chunk_size, count)
+        yield start + step * np.arange(offset, stop, dtype=np.float64)
+
+
+def stream_curve(curve: CurveFunction, start: float, end: float, step: float, chunk_size: int,
+                 pruned: Optional[PrunedGrid] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """逐块计算曲线，生成每块的 (x, y) 数组，定义域之外的点为NaN
+    
+    给出pruned时每块只计算区间剪枝后保留的点，其余的点直接记为NaN。
+    """
+    offset = 0
+    for t_values in iter_param_chunks(start, end, step, chunk_size):
+        yield curve(t_values) if pruned is None else pruned.sample(curve, t_values, offset)
+        offset += len(t_values)
+
+
+class NpyCurveWriter:
+    """把一条曲线逐块写入 (n, 2) 的.npy文件，数据通过内存映射落盘"""
+    def __init__(self, file_path: str, count: int):
+        self.file_path = file_path
+        from numpy.lib.format import open_memmap
+        self.data = open_memmap(file_path, mode='w+', dtype=np.float64, shape=(count, 2))
+        self.offset = 0
+    
+    def append(self, x_values: np.ndarray, y_values: np.ndarray):
+        """写入一块数据"""
+        stop = self.offset + len(x_values)
+        self.data[self.offset:stop, 0] = x_values
+        self.data[self.offset:stop, 1] = y_values
+        self.offset = stop
+    
+    def finish(self):
+        """把数据刷新到磁盘并释放映射"""
+        if self.data is not None:
+            self.data.flush()
+            self.data = None
+
+
+class NpyCurveExporter:
+    """把draw语句的取样结果导出为目录下依次编号的.npy文件
+    
+    每条曲线一个文件，按取样网格保存全部点，定义域之外的点保留为NaN，
+    文件可以用 np.load(path, mmap_mode='r') 按需读取。
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.curve_count = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def begin(self, count: int, name: Optional[str] = None) -> NpyCurveWriter:
+        """开始导出一条共count个点的曲线"""
+        self.curve_count += 1
+        file_name = name or f'curve_{self.curve_count:04d}.npy'
+        return NpyCurveWriter(os.path.join(self.directory, file_name), count)
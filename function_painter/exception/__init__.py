@@ -5,7 +5,8 @@ from .exception import (
     ParserError,
     InterpreterError,
     SemanticError,
-    RuntimeError
+    RuntimeError,
+    ResourceLimitError
 )
 
 __all__ = [
@@ -14,5 +15,6 @@ __all__ = [
     'ParserError',
     'InterpreterError',
     'SemanticError',
-    'RuntimeError'
+    'RuntimeError',
+    'ResourceLimitError'
 ]
\ No newline at end of file
@@ -43,4 +43,10 @@ class SemanticError(InterpreterError):
 class RuntimeError(InterpreterError):
     """运行时错误"""
     def __init__(self, message: str, line: Optional[int] = None, column: Optional[int] = None):
-        super().__init__(f"运行时错误: {message}", line, column)
\ No newline at end of file
+        super().__init__(f"运行时错误: {message}", line, column)
+
+
+class ResourceLimitError(RuntimeError):
+    """超出资源限制，如取样点数超过预算"""
+    def __init__(self, message: str, line: Optional[int] = None, column: Optional[int] = None):
+        super().__init__(f"超出资源限制: {message}", line, column)
\ No newline at end of file
@@ -1,20 +1,111 @@
+from __future__ import annotations
 from .lexer import Lexer
-from .parser import Parser
-from .exception.exception import InterpreterError, SemanticError, RuntimeError
-from .drawer import Drawer
+from .parser import Parser, ExpressionOptimizer, ProgramCache, FunctionInliner, UserFunction
+from .exception.exception import InterpreterError, SemanticError, RuntimeError, ResourceLimitError
+from .drawer.decimation import DECIMATION_METHODS
+from .evaluator.compiler import ExpressionCompiler
+from .evaluator.cse import SubexpressionCache
+from .evaluator import sampling
+from .evaluator.streaming import (
+    DEFAULT_MEMORY_BUDGET,
+    NpyCurveExporter,
+    chunk_size_for_budget,
+    grid_size,
+    stream_curve
+)
+from .evaluator.sharding import DEFAULT_SHARD_SIZE, ShardedEvaluator
+from .evaluator.result_cache import DEFAULT_CACHE_SIZE, CurveCache, curve_signature
+from .evaluator.domain import SampleErrors
+from .evaluator.pruning import MIN_PRUNE_POINTS, PrunedGrid, prune_grid
+from .parser.expression import FUNCTIONS, free_variables
+from .checker import ProgramChecker
+from .profiler import Profiler
+from .lazy_import import lazy_import
+from .tracing import get_logger, TRACE
+from contextlib import nullcontext
 import math
-from typing import Dict, List, Optional, Tuple, Union, Any
+import os
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union, Any
+
+if TYPE_CHECKING:
+    from matplotlib.lines import Line2D
+    from .drawer import Drawer
+
+
+logger = get_logger('interpreter')
+np = lazy_import('numpy')
+
+# draw语句在一个参数上的计算结果：(x数组, y数组, 流式计算时抽稀前的有效点数, 无效点统计)
+EvaluatedCurve = Tuple['np.ndarray', 'np.ndarray', Optional[int], SampleErrors]
+
+# 没有开启性能分析时代替Profiler.stage的空上下文
+_NOT_PROFILED = nullcontext()
 
 
 class Interpreter:
     """解释器类，负责执行Function Painter语言的程序"""
     
-    def __init__(self):
+    def __init__(self, vectorized: bool = True, optimize: bool = True, cse: bool = True, prune: bool = True,
+                 headless: Optional[bool] = None, streaming: bool = False,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET, export_dir: Optional[str] = None,
+                 decimation: Optional[str] = 'minmax', workers: Optional[int] = 1, executor: str = 'thread',
+                 shards: Optional[int] = 1, shard_size: int = DEFAULT_SHARD_SIZE,
+                 cache_dir: Optional[str] = None, cache_size: int = DEFAULT_CACHE_SIZE,
+                 program_cache_dir: Optional[str] = None, profiler: Optional[Profiler] = None,
+                 drawer: Optional[Drawer] = None, point_budget: Optional[int] = None, allow_save: bool = True):
+        # vectorized为True时每条曲线用NumPy一次性计算，否则逐点计算
+        self.vectorized = vectorized
+        # optimize为True时在执行前对表达式做常量折叠和代数化简
+        self.optimize = optimize
+        # cse为True时，向量化绘制在同一取样网格上复用相同子表达式的计算结果
+        self.cse = cse
+        # prune为True时，取样点数较多的曲线先用区间计算找出可以证明没有定义的参数范围，这些点不再逐点计算
+        self.prune = prune
+        # streaming为True时所有曲线都按块计算并逐块交给绘图器，不保存在plot_points中；
+        # 取样点数超过内存预算允许的块大小时也会自动按块计算
+        self.streaming = streaming or export_dir is not None
+        self.chunk_size = chunk_size_for_budget(memory_budget)
+        # 给出export_dir时每条曲线的取样结果导出为.npy文件
+        self.exporter = NpyCurveExporter(export_dir) if export_dir is not None else None
+        # workers不为1时按依赖图并发计算互不依赖的draw语句，None或0表示使用全部CPU核心；
+        # executor为'thread'或'process'
+        self.workers = workers
+        self.executor = executor
+        # shards不为1时，点数超过shard_size的取样网格分片后交给多个进程计算，None或0表示使用全部CPU核心
+        self.shards = shards
+        self.shard_size = shard_size
+        # 给出cache_dir时，曲线的取样结果按内容签名保存在该目录中，再次执行时直接读取
+        self.curve_cache = CurveCache(cache_dir, cache_size) if cache_dir is not None else None
+        # 给出program_cache_dir时，源文件的语法分析结果保存在该目录中，源文件未变化时跳过词法和语法分析
+        self.program_cache = ProgramCache(program_cache_dir) if program_cache_dir is not None else None
+        # 给出profiler时记录各阶段和每条语句的耗时与内存；逐条语句计时需要按程序顺序执行，因此不再并发
+        self.profiler = profiler
+        if profiler is not None:
+            self.workers = 1
+        # 给出point_budget时，所有draw语句的取样点数之和超过该值就在取样之前报错
+        self.point_budget = point_budget
+        self.points_used = 0
+        # allow_save为False时save语句报错，执行不受信任的脚本时避免写入任意文件
+        self.allow_save = allow_save
         self.variables: Dict[str, float] = {}
-        self.functions: Dict[str, Dict] = {}
+        self.functions: Dict[str, UserFunction] = {}
+        # 展开了自定义函数的表达式，按原表达式对象缓存，函数定义改变时清空
+        self._inlined: Dict[int, Tuple[Any, Any]] = {}
         self.param_ranges: Dict[str, Tuple[float, float, float]] = {}
-        self.drawer = Drawer()
-        self.plot_points: List[List[Tuple[float, float]]] = []
+        # 使用自适应取样的参数及其设置
+        self.param_sampling: Dict[str, Dict[str, float]] = {}
+        # headless为None时根据是否有图形界面自动选择，decimation为交给matplotlib之前的抽稀方法；
+        # 绘图器在第一次绘制、显示或保存时才创建，只做分析或者不绘图的程序不会导入matplotlib；
+        # 也可以传入已经创建好的drawer（如从DrawerPool取出的），此时headless和decimation不起作用
+        if decimation is not None and decimation not in DECIMATION_METHODS:
+            raise ValueError(f"未知的抽稀方法: {decimation}，支持的方法: {', '.join(DECIMATION_METHODS)}")
+        self.headless = headless
+        self._decimation = decimation
+        self._drawer: Optional[Drawer] = drawer
+        # 绘图表达式编译后的函数缓存，重复绘制同一表达式时直接复用
+        self.compiler = ExpressionCompiler()
+        self.subexpression_cache = SubexpressionCache(self.compiler)
+        self.plot_points: List[Tuple[np.ndarray, np.ndarray]] = []
         self.plot_colors: List[Optional[str]] = []
         # 预定义常量
         self.constants = {
@@ -22,17 +113,35 @@ class Interpreter:
             'e': math.e
         }
     
+    @property
+    def drawer(self) -> Drawer:
+        """绘图器，第一次访问时才导入matplotlib并创建图像"""
+        if self._drawer is None:
+            logger.debug("创建绘图器")
+            # 导入matplotlib往往是整个程序中最慢的一步，计入drawer阶段
+            with self._stage('drawer'):
+                from .drawer import Drawer
+                self._drawer = Drawer(headless=self.headless, decimation=self._decimation)
+        return self._drawer
+    
+    @property
+    def decimation(self) -> Optional[str]:
+        """交给matplotlib之前的抽稀方法"""
+        return self._drawer.decimation if self._drawer is not None else self._decimation
+    
+    @decimation.setter
+    def decimation(self, method: Optional[str]):
+        self._decimation = method
+        if self._drawer is not None:
+            self._drawer.decimation = method
+    
     def interpret_file(self, file_path: str):
         """解释并执行文件中的Function Painter代码"""
-        print(f"调试: 开始读取文件 {file_path}")
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                code = file.read()
-            print(f"调试: 文件内容读取完成，长度: {len(code)} 字符")
-            print(f"调试: 文件内容前100字符: {code[:100]}")
-            print(f"调试: 开始解释执行")
-            self.interpret(code)
-            print(f"调试: 文件解释执行完成")
+            statements = self.load_file(file_path)
+            logger.debug("开始解释执行")
+            self.interpret_statements(statements, optimized=True)
+            logger.debug("文件解释执行完成")
         except FileNotFoundError:
             raise InterpreterError(f"文件未找到: {file_path}")
         except InterpreterError:
@@ -40,58 +149,199 @@ class Interpreter:
         except Exception as e:
             raise InterpreterError(f"解释过程中出错: {str(e)}")
     
+    def load_file(self, file_path: str) -> List[Dict]:
+        """读取源文件并完成词法分析、语法分析和优化，返回可以直接执行的语句列表"""
+        logger.debug("开始读取文件 %s", file_path)
+        # 源文件没有变化时直接使用缓存的语法分析和优化结果
+        program_key = None
+        if self.program_cache is not None:
+            # 优化结果还取决于是否开启优化、执行前已有的常量以及常量折叠用到的函数实现
+            variant = repr((self.optimize, sorted(self.constants.items()), FUNCTIONS.fingerprint()))
+            program_key = self.program_cache.key_for_file(file_path, variant)
+            with self._stage('program_cache'):
+                statements = self.program_cache.load(program_key)
+            if statements is not None:
+                logger.debug("使用缓存的语法分析结果")
+                return statements
+        
+        # 直接由词法分析器读取文件，大文件会通过mmap映射而不是整体读入
+        with self._stage('lexer'):
+            lexer = Lexer(file_path)
+        logger.debug("文件大小: %s 字节", os.path.getsize(file_path))
+        try:
+            with self._stage('parser'):
+                statements = Parser(lexer).parse_program()
+        finally:
+            lexer.close()
+        statements = self.optimize_statements(statements)
+        if program_key is not None:
+            with self._stage('program_cache'):
+                self.program_cache.store(program_key, statements)
+        return statements
+    
+    def check_file(self, file_path: str) -> List[SemanticError]:
+        """只做词法分析、语法分析和静态检查，不执行程序，返回发现的所有语义错误
+        
+        语法错误与interpret_file一样以InterpreterError抛出。
+        """
+        logger.debug("开始检查文件 %s", file_path)
+        try:
+            lexer = Lexer(file_path)
+            try:
+                statements = Parser(lexer).parse_program()
+            finally:
+                lexer.close()
+        except FileNotFoundError:
+            raise InterpreterError(f"文件未找到: {file_path}")
+        except Exception as e:
+            raise InterpreterError(f"解释过程中出错: {str(e)}")
+        return ProgramChecker(self.constants, self.variables, self.functions, self.param_ranges).check(statements)
+    
     def interpret(self, code: str):
         """解释并执行Function Painter代码"""
         # 词法分析 - 直接传递代码内容，设置is_string=True
-        lexer = Lexer(code, is_string=True)
+        with self._stage('lexer'):
+            lexer = Lexer(code, is_string=True)
+        self.interpret_lexer(lexer)
+    
+    def interpret_lexer(self, lexer: Lexer):
+        """从已经创建好的词法分析器开始解释执行"""
         # 语法分析
-        parser = Parser(lexer)
-        statements = parser.parse_program()
+        with self._stage('parser'):
+            statements = Parser(lexer).parse_program()
+        self.interpret_statements(statements)
+    
+    def interpret_statements(self, statements: List[Dict], optimized: bool = False):
+        """优化并执行语法分析得到的语句列表，optimized为True表示语句已经经过optimize_statements"""
+        if not optimized:
+            statements = self.optimize_statements(statements)
         # 执行语句
         self.execute_statements(statements)
+        if self.curve_cache is not None:
+            logger.info("曲线缓存: %s", self.curve_cache.stats())
+    
+    def optimize_statements(self, statements: List[Dict]) -> List[Dict]:
+        """开启了优化时对语句中的表达式做常量折叠和代数化简"""
+        if not self.optimize:
+            return statements
+        optimizer = ExpressionOptimizer(self.constants)
+        with self._stage('optimize'):
+            statements = optimizer.optimize_program(statements)
+        logger.debug("表达式优化完成，共消除 %s 个节点", optimizer.eliminated_nodes)
+        return statements
     
     def execute_statements(self, statements: List[Dict]):
         """执行语句列表"""
+        if self.workers != 1 and self.exporter is None:
+            from .scheduler import StatementScheduler
+            StatementScheduler(self, self.workers, self.executor).run(statements)
+            return
+        self.plan_subexpressions(statements)
+        if self.profiler is not None:
+            for statement in statements:
+                with self.profiler.statement(statement):
+                    self.execute_statement(statement)
+            return
         for statement in statements:
             self.execute_statement(statement)
     
+    def plan_subexpressions(self, statements: List[Dict]):
+        """执行之前登记所有draw语句的表达式，公共子表达式缓存只保存被多个表达式共用的子树"""
+        if not self.cse or not self.vectorized:
+            return
+        # 按程序顺序跟踪函数定义，每条draw语句按执行到它时的函数展开
+        functions = dict(self.functions)
+        draws = []
+        for statement in statements:
+            statement_type = statement.get('type')
+            if statement_type == 'function':
+                functions[statement['name']] = UserFunction(statement['name'], statement.get('params', ()),
+                                                            statement['expression'])
+            elif statement_type == 'draw':
+                expressions = [statement[key] for key in ('expression', 'x_expression', 'y_expression')
+                               if key in statement]
+                try:
+                    draws.append([FunctionInliner(functions).inline(expression) for expression in expressions])
+                except ValueError:
+                    # 展开出错的语句在执行时报告错误
+                    continue
+        self.subexpression_cache.plan(draws)
+    
+    def _stage(self, name: str):
+        """开启了性能分析时对一个阶段计时的上下文，否则为空上下文"""
+        return self.profiler.stage(name) if self.profiler is not None else _NOT_PROFILED
+    
+    def _count_samples(self, errors: SampleErrors, description: str = "生成完成") -> SampleErrors:
+        """输出一条曲线的取样统计，并把取样点数和有效点数记入性能分析"""
+        logger.debug("%s，%s", description, errors)
+        if self.profiler is not None:
+            self.profiler.count_samples(errors.total, errors.valid)
+        return errors
+    
     def execute_statement(self, statement: Dict):
         """执行单个语句"""
         statement_type = statement['type']
-        print(f"调试: 执行语句类型: {statement_type}")
+        logger.debug("执行语句类型: %s", statement_type)
         
         if statement_type == 'param':
             self.execute_param_statement(statement)
-            print(f"调试: 参数定义完成: {statement['name']} from {statement['min']} to {statement['max']} step {statement['step']}")
+            logger.debug("参数定义完成: %s from %s to %s step %s", statement['name'], statement['min'], statement['max'], statement['step'])
         elif statement_type == 'assign':
             self.execute_assign_statement(statement)
-            print(f"调试: 变量赋值完成: {statement['name']}")
+            logger.debug("变量赋值完成: %s", statement['name'])
         elif statement_type == 'function':
             self.execute_function_statement(statement)
-            print(f"调试: 函数定义完成: {statement['name']}")
+            logger.debug("函数定义完成: %s", statement['name'])
         elif statement_type == 'draw':
-            print(f"调试: 准备绘制函数")
+            logger.debug("准备绘制函数")
             self.execute_draw_statement(statement)
-            print(f"调试: 函数绘制完成")
+            logger.debug("函数绘制完成")
         elif statement_type == 'show':
-            print(f"调试: 准备显示图像")
+            logger.debug("准备显示图像")
             self.execute_show_statement(statement)
-            print(f"调试: 图像显示完成")
+            logger.debug("图像显示完成")
         elif statement_type == 'clear':
             self.execute_clear_statement(statement)
-            print(f"调试: 图像已清空")
+            logger.debug("图像已清空")
+        elif statement_type == 'save':
+            self.execute_save_statement(statement)
+            logger.debug("图像已保存: %s", statement['path'])
         elif statement_type == 'const':
             self.execute_const_statement(statement)
-            print(f"调试: 常量定义完成: {statement['name']}")
+            logger.debug("常量定义完成: %s", statement['name'])
         else:
             raise InterpreterError(f"未知的语句类型: {statement_type}")
     
+    def snapshot_state(self) -> Dict[str, Any]:
+        """复制执行draw语句所需的解释器状态，交给并发计算的工作者"""
+        return {
+            'variables': dict(self.variables),
+            'functions': dict(self.functions),
+            'param_ranges': dict(self.param_ranges),
+            'param_sampling': dict(self.param_sampling),
+            'constants': dict(self.constants)
+        }
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """用snapshot_state得到的快照替换解释器状态"""
+        self.variables = dict(state['variables'])
+        self.functions = dict(state['functions'])
+        self._inlined.clear()
+        self.param_ranges = dict(state['param_ranges'])
+        self.param_sampling = dict(state['param_sampling'])
+        self.constants = dict(state['constants'])
+        self.subexpression_cache.reset()
+    
     def execute_param_statement(self, statement: Dict):
         """执行param语句，定义参数范围"""
         param_name = statement['name']
         start = self.evaluate_expression(statement['min']) if isinstance(statement['min'], dict) else statement['min']
         end = self.evaluate_expression(statement['max']) if isinstance(statement['max'], dict) else statement['max']
         step = self.evaluate_expression(statement['step']) if isinstance(statement['step'], dict) else statement['step']
+        adaptive = statement.get('adaptive')
+        if step is None and adaptive is not None and isinstance(start, (int, float)) and isinstance(end, (int, float)):
+            # 自适应取样未指定步长时，初始网格把范围等分
+            step = (end - start) / sampling.DEFAULT_INITIAL_SEGMENTS
         
         # 验证参数有效性
         if not isinstance(start, (int, float)) or not isinstance(end, (int, float)) or not isinstance(step, (int, float)):
@@ -103,7 +353,12 @@ class Interpreter:
             raise SemanticError(f"参数范围无效: {start} to {end} with step {step}")
         
         # 存储参数范围
+        self.subexpression_cache.invalidate(param_name)
         self.param_ranges[param_name] = (float(start), float(end), float(step))
+        if adaptive is not None:
+            self.param_sampling[param_name] = self._adaptive_settings(adaptive)
+        else:
+            self.param_sampling.pop(param_name, None)
         # 将参数变量添加到variables字典中，初始值设为起始值
         self.variables[param_name] = float(start)
     
@@ -116,6 +371,7 @@ class Interpreter:
         value = self.evaluate_expression(expression)
         
         # 存储变量值
+        self.subexpression_cache.invalidate(var_name)
         self.variables[var_name] = float(value)
     
     def execute_const_statement(self, statement: Dict):
@@ -127,139 +383,465 @@ class Interpreter:
         value = self.evaluate_expression(expression)
         
         # 存储常量值
+        self.subexpression_cache.invalidate(const_name)
         self.constants[const_name] = float(value)
     
     def execute_function_statement(self, statement: Dict):
-        """执行函数定义语句，将表达式保存为函数"""
+        """执行函数定义语句，将表达式保存为函数，在使用它的表达式计算之前展开"""
         func_name = statement['name']
         expression = statement['expression']
         
         # 保存函数定义
-        self.functions[func_name] = expression
+        self.functions[func_name] = UserFunction(func_name, statement.get('params', ()), expression)
+        self._inlined.clear()
     
     def execute_draw_statement(self, statement: Dict):
         """执行draw语句，绘制函数图像，支持普通函数和参数方程"""
-        color = statement.get('color')
+        with self._stage('evaluate'):
+            curves = self.evaluate_draw_statement(statement)
+        self.render_draw_statement(statement, curves)
+    
+    def evaluate_draw_statement(self, statement: Dict) -> List[EvaluatedCurve]:
+        """计算draw语句在每个参数上的取样结果，不修改图像
         
+        每条曲线为 (x数组, y数组, 有效点数, 无效点统计)：有效点数为None时数组包含全部取样点，
+        定义域之外和溢出的点为NaN或±inf，绘图时曲线在这些点处断开；否则数组是流式计算时已经按块抽稀的结果，
+        有效点数为抽稀前的点数。取样过程不因无效点抛出异常，表达式本身的错误（如未定义的变量）仍然报错。
+        """
         # 判断是否为参数方程格式
         is_parametric = 'x_expression' in statement and 'y_expression' in statement
         
         if is_parametric:
             x_expression = statement['x_expression']
             y_expression = statement['y_expression']
-            print(f"调试: 执行draw语句(参数方程)，x表达式: {x_expression}, y表达式: {y_expression}")
+            logger.debug("执行draw语句(参数方程)，x表达式: %s, y表达式: %s", x_expression, y_expression)
         else:
             expression = statement['expression']
-            print(f"调试: 执行draw语句(普通函数)，表达式: {expression}")
+            logger.debug("执行draw语句(普通函数)，表达式: %s", expression)
         
         # 检查是否有参数定义
         if not self.param_ranges:
             raise SemanticError("没有定义参数范围，请先使用param语句")
         
         # 对于每个参数，生成数据点
+        curves: List[EvaluatedCurve] = []
         for param_name, (start, end, step) in self.param_ranges.items():
-            print(f"调试: 为参数 {param_name} 生成数据点，范围: {start} 到 {end}，步长: {step}")
-            points = []
-            t = start
-            point_count = 0
-            success_count = 0
-            error_count = 0
-            max_points = 10000  # 防止无限循环
+            logger.debug("为参数 %s 生成数据点，范围: %s 到 %s，步长: %s", param_name, start, end, step)
+            if self.point_budget is not None:
+                self._reserve_points(param_name, start, end, step)
+            is_streaming = param_name not in self.param_sampling and (
+                self.streaming or grid_size(start, end, step) > self.chunk_size)
             
-            # 生成数据点
-            while ((step > 0 and t <= end) or (step < 0 and t >= end)) and point_count < max_points:
+            # 流式计算的曲线只保留抽稀后的结果，不进入缓存
+            signature = None
+            if self.curve_cache is not None and not is_streaming:
+                signature = self.curve_signature(statement, param_name)
+                cached = self.curve_cache.load(signature)
+                if cached is not None:
+                    x_values, y_values, self.variables[param_name] = cached
+                    logger.debug("曲线缓存命中: %s", signature)
+                    errors = SampleErrors.count(x_values, y_values)
+                    if self.profiler is not None:
+                        self.profiler.count_cache_hit(errors.total, errors.invalid)
+                    curves.append((x_values, y_values, None, errors))
+                    continue
+            
+            if param_name in self.param_sampling:
+                if is_parametric:
+                    curve = self._curve_function(param_name, x_expression=x_expression, y_expression=y_expression)
+                else:
+                    curve = self._curve_function(param_name, expression=expression)
+                x_values, y_values, errors = self._sample_adaptive(curve, start, end, step,
+                                                                   self.param_sampling[param_name])
+            elif is_streaming:
+                if is_parametric:
+                    curve = self._curve_function(param_name, x_expression=x_expression, y_expression=y_expression)
+                else:
+                    curve = self._curve_function(param_name, expression=expression)
+                count = grid_size(start, end, step)
+                expressions = [x_expression, y_expression] if is_parametric else [expression]
+                pruned = None
+                if self._use_sharding(count) and not (is_parametric and str(x_expression) == "x_coord"
+                                                      and str(y_expression) == "y_coord"):
+                    chunks = self._stream_sharded(param_name, start, step, count, expressions)
+                else:
+                    if not (is_parametric and str(x_expression) == "x_coord" and str(y_expression) == "y_coord"):
+                        pruned = self._prune_grid(param_name, start, step, count, expressions)
+                    chunks = stream_curve(curve, start, end, step, self.chunk_size, pruned)
+                curves.append(self._sample_streaming(chunks, count))
+                # 最后几块可能全部被剪除，圆的参数方程也不经过表达式计算，参数仍停留在最后一个取样值
+                self.variables[param_name] = start + step * (count - 1)
+                continue
+            elif self.vectorized:
+                if is_parametric:
+                    x_values, y_values, errors = self._sample_parametric_vector(param_name, start, end, step,
+                                                                                x_expression, y_expression)
+                else:
+                    x_values, y_values, errors = self._sample_function_vector(param_name, start, end, step, expression)
+            else:
+                if is_parametric:
+                    x_values, y_values, errors = self._sample_parametric_scalar(param_name, start, end, step,
+                                                                                x_expression, y_expression)
+                else:
+                    x_values, y_values, errors = self._sample_function_scalar(param_name, start, end, step, expression)
+            if signature is not None:
+                self.curve_cache.store(signature, x_values, y_values, self.variables.get(param_name, start))
+            curves.append((x_values, y_values, None, errors))
+        # 后续语句不再引用的共享子表达式不必继续缓存
+        self.subexpression_cache.release([self._inline_functions(statement[key])
+                                          for key in ('expression', 'x_expression', 'y_expression')
+                                          if key in statement])
+        return curves
+    
+    def _reserve_points(self, param_name: str, start: float, end: float, step: float):
+        """在取样之前从预算中扣除这条曲线最多需要的取样点数，超出预算时报错"""
+        settings = self.param_sampling.get(param_name)
+        if settings is not None:
+            # 自适应取样的点数不超过初始网格和细分轮数允许的上限，与取样时的限制一致
+            count = sampling.adaptive_point_limit(start, end, step, settings['max_depth'], settings['max_points'])
+        else:
+            count = grid_size(start, end, step)
+        self.points_used += count
+        if self.points_used > self.point_budget:
+            raise ResourceLimitError(f"取样点数 {self.points_used} 超过上限 {self.point_budget}")
+    
+    def curve_signature(self, statement: Dict, param_name: str) -> str:
+        """draw语句在参数param_name上的计算结果的内容签名，只要签名相同，取样结果就相同"""
+        expressions = [self._inline_functions(statement[key])
+                       for key in ('expression', 'x_expression', 'y_expression') if key in statement]
+        names = set().union(*(free_variables(expression) for expression in expressions)) - {param_name}
+        context = {**self.variables, **self.constants}
+        return curve_signature(expressions, param_name, self.param_ranges[param_name],
+                               self.param_sampling.get(param_name), {name: context.get(name) for name in names})
+    
+    def render_draw_statement(self, statement: Dict, curves: List[EvaluatedCurve]) -> List[Line2D]:
+        """把evaluate_draw_statement的结果交给绘图器，返回画出的曲线"""
+        color = statement.get('color')
+        # 绘图器在第一次绘制时创建，创建本身单独计时，不与下面的绘制重复计入
+        drawer = self.drawer
+        lines = []
+        with self._stage('drawer'):
+            for x_values, y_values, valid_points, errors in curves:
+                if errors.invalid:
+                    logger.info("曲线 %s 有 %s 个点超出定义域、%s 个点溢出（共 %s 个取样点），在这些点处断开",
+                                drawer.plot_count + 1, errors.undefined, errors.overflow, errors.total)
+                if valid_points is not None:
+                    # 流式计算的曲线已经抽稀，不保存在plot_points中
+                    line = drawer.plot_curve(x_values, y_values, color, valid_points)
+                else:
+                    # 存储绘图点
+                    self.plot_points.append((x_values, y_values))
+                    self.plot_colors.append(color)
+                    
+                    # 使用绘图器绘制
+                    logger.debug("调用drawer绘制 %s 个点", len(x_values))
+                    line = drawer.draw_curve(x_values, y_values, color)
+                if line is not None:
+                    lines.append(line)
+        return lines
+    
+    def _param_grid(self, start: float, end: float, step: float) -> np.ndarray:
+        """生成参数的取样网格，按 start + i*step 计算以避免累加误差"""
+        return start + step * np.arange(grid_size(start, end, step), dtype=np.float64)
+    
+    def _sample_streaming(self, chunks: Iterator[Tuple[np.ndarray, np.ndarray]], count: int) -> EvaluatedCurve:
+        """逐块接收曲线，每块直接交给绘图器的抽稀流和导出器，内存占用与总点数无关"""
+        logger.debug("流式计算 %s 个点，每块 %s 个点", count, self.chunk_size)
+        stream = self.drawer.begin_stream(expected_points=count)
+        sinks = [stream]
+        if self.exporter is not None:
+            sinks.append(self.exporter.begin(count))
+        
+        chunk_count = 0
+        errors = SampleErrors()
+        for x_values, y_values in chunks:
+            chunk_count += 1
+            errors.add(x_values, y_values)
+            for sink in sinks:
+                sink.append(x_values, y_values)
+        for sink in sinks[1:]:
+            sink.finish()
+        self._count_samples(errors, f"流式计算完成，共 {chunk_count} 块")
+        x_values, y_values = stream.collect()
+        return x_values, y_values, stream.valid_points, errors
+    
+    def _use_sharding(self, count: int) -> bool:
+        """取样点数足够多且开启了分片时，把网格分给多个进程计算"""
+        return self.shards != 1 and count > self.shard_size
+    
+    def _sharded_evaluator(self, param_name: str, start: float, step: float, capacity: int,
+                           expressions: List) -> ShardedEvaluator:
+        """创建分片计算器，表达式和当前变量在工作进程启动时传入"""
+        try:
+            return ShardedEvaluator([self._inline_functions(expression) for expression in expressions],
+                                    dict(self.variables), dict(self.constants), param_name, start, step,
+                                    capacity, self.shards, self.shard_size)
+        except Exception as e:
+            raise RuntimeError(f"表达式计算错误: {str(e)}") from e
+    
+    def _stream_sharded(self, param_name: str, start: float, step: float, count: int,
+                        expressions: List) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """按块生成曲线，每块再分片交给多个进程计算，整条曲线共用一个进程池"""
+        capacity = min(self.chunk_size, count)
+        logger.debug("%s 个点按块分片计算，每块 %s 个点，每片 %s 个点", count, capacity, self.shard_size)
+        with self._sharded_evaluator(param_name, start, step, capacity, expressions) as evaluator:
+            for offset in range(0, count, self.chunk_size):
+                stop = min(offset + self.chunk_size, count)
+                values = evaluator.evaluate(offset, stop)
+                if len(expressions) == 1:
+                    yield start + step * np.arange(offset, stop, dtype=np.float64), values[0]
+                else:
+                    yield values[0], values[1]
+        # 与逐点计算保持一致，绘制结束后参数停留在最后一个取样值
+        self.variables[param_name] = start + step * (count - 1)
+    
+    def _evaluate_grid(self, param_name: str, start: float, end: float, step: float, t_values: np.ndarray,
+                       expressions: List) -> List[np.ndarray]:
+        """在完整的取样网格上计算若干表达式，网格足够大且开启了分片时交给多个进程计算"""
+        if self._use_sharding(len(t_values)):
+            logger.debug("%s 个点分片计算，每片 %s 个点", len(t_values), self.shard_size)
+            with self._sharded_evaluator(param_name, start, step, len(t_values), expressions) as evaluator:
+                values = evaluator.evaluate(0, len(t_values))
+            # 与逐点计算保持一致，绘制结束后参数停留在最后一个取样值
+            self.variables[param_name] = float(t_values[-1])
+            return list(values)
+        
+        grid_key = (param_name, start, end, step, len(t_values))
+        pruned = self._prune_grid(param_name, start, step, len(t_values), expressions)
+        if pruned is None:
+            return [self.evaluate_expression_vector(expression, param_name, t_values, grid_key)
+                    for expression in expressions]
+        
+        # 只在保留的点上计算，保留的范围不同时网格也不同
+        keep = pruned.mask()
+        t_kept = t_values[keep]
+        grid_key += (tuple(pruned.ranges),)
+        values = [pruned.scatter(self.evaluate_expression_vector(expression, param_name, t_kept, grid_key), keep)
+                  for expression in expressions]
+        self.variables[param_name] = float(t_values[-1])
+        return values
+    
+    def _prune_grid(self, param_name: str, start: float, step: float, count: int,
+                    expressions: List) -> Optional[PrunedGrid]:
+        """用区间计算找出取样网格上可以证明没有定义的部分，关闭了剪枝或者没有可以剪除的点时返回None
+        
+        区间计算只用于跳过计算，遇到无法处理的表达式时不剪枝，错误留给取样时报告。
+        """
+        if not self.prune or count < MIN_PRUNE_POINTS or param_name in self.constants:
+            return None
+        try:
+            pruned = prune_grid([self._inline_functions(expression) for expression in expressions],
+                                param_name, start, step, count, {**self.variables, **self.constants})
+        except Exception as e:
+            logger.debug("区间剪枝失败，逐点计算: %s", e)
+            return None
+        logger.debug("区间剪枝: %s 个点中剪除 %s 个，区间计算 %s 次", count, pruned.pruned, pruned.evaluations)
+        return pruned if pruned.pruned else None
+    
+    def _sample_function_vector(self, param_name: str, start: float, end: float, step: float,
+                                expression) -> Tuple[np.ndarray, np.ndarray, SampleErrors]:
+        """向量化计算普通函数的所有数据点"""
+        t_values = self._param_grid(start, end, step)
+        y_values, = self._evaluate_grid(param_name, start, end, step, t_values, [expression])
+        return t_values, y_values, self._count_samples(SampleErrors.count(t_values, y_values))
+    
+    def _sample_parametric_vector(self, param_name: str, start: float, end: float, step: float,
+                                  x_expression, y_expression) -> Tuple[np.ndarray, np.ndarray, SampleErrors]:
+        """向量化计算参数方程的所有数据点"""
+        t_values = self._param_grid(start, end, step)
+        if str(x_expression) == "x_coord" and str(y_expression) == "y_coord":
+            # 特殊处理圆的参数方程
+            x_values = np.cos(t_values)
+            y_values = np.sin(t_values)
+            # 与逐点计算保持一致，绘制结束后参数停留在最后一个取样值
+            if len(t_values) > 0:
+                self.variables[param_name] = start + step * (len(t_values) - 1)
+        else:
+            x_values, y_values = self._evaluate_grid(param_name, start, end, step, t_values, [x_expression, y_expression])
+        return x_values, y_values, self._count_samples(SampleErrors.count(x_values, y_values))
+    
+    def _adaptive_settings(self, options: Dict) -> Dict[str, float]:
+        """补全自适应取样的默认设置并检查取值"""
+        tol = options.get('tol')
+        max_depth = options.get('max_depth')
+        max_points = options.get('max_points')
+        settings = {
+            'tol': sampling.DEFAULT_TOLERANCE if tol is None else float(tol),
+            'max_depth': sampling.DEFAULT_MAX_DEPTH if max_depth is None else int(max_depth),
+            'max_points': sampling.DEFAULT_MAX_POINTS if max_points is None else int(max_points)
+        }
+        if settings['tol'] <= 0:
+            raise SemanticError(f"自适应取样的容差必须大于0: {settings['tol']}")
+        if settings['max_depth'] < 0 or settings['max_points'] < 2:
+            raise SemanticError("自适应取样的最大深度不能为负，点数上限至少为2")
+        return settings
+    
+    def _curve_function(self, param_name: str, expression=None, x_expression=None, y_expression=None):
+        """构造输入参数数组、返回 (x, y) 数组的曲线函数"""
+        if expression is not None:
+            return lambda t_values: (t_values, self.evaluate_expression_vector(expression, param_name, t_values))
+        if str(x_expression) == "x_coord" and str(y_expression) == "y_coord":
+            # 特殊处理圆的参数方程
+            return lambda t_values: (np.cos(t_values), np.sin(t_values))
+        return lambda t_values: (self.evaluate_expression_vector(x_expression, param_name, t_values),
+                                 self.evaluate_expression_vector(y_expression, param_name, t_values))
+    
+    def _sample_adaptive(self, curve, start: float, end: float, step: float,
+                         settings: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray, SampleErrors]:
+        """按曲率自适应取样"""
+        t_values, x_values, y_values = sampling.adaptive_sample(
+            curve, start, end, step,
+            tol=settings['tol'], max_depth=settings['max_depth'], max_points=settings['max_points'])
+        initial_count = sampling.initial_grid_size(start, end, step, settings['max_points'])
+        errors = self._count_samples(SampleErrors.count(x_values, y_values),
+                                     f"自适应取样完成（初始网格 {initial_count} 点）")
+        return x_values, y_values, errors
+    
+    def _sample_function_scalar(self, param_name: str, start: float, end: float, step: float,
+                                expression) -> Tuple[np.ndarray, np.ndarray, SampleErrors]:
+        """逐点计算普通函数的数据点，定义域之外的点为NaN"""
+        t_values = self._param_grid(start, end, step)
+        compiled, context = self._prepare_scalar(expression)
+        pruned = self._prune_grid(param_name, start, step, len(t_values), [expression])
+        keep = pruned.mask() if pruned is not None else None
+        y_list = []
+        try:
+            for t in (t_values if keep is None else t_values[keep]).tolist():
                 # 设置当前参数值
                 self.variables[param_name] = t
-                
-                try:
-                    if is_parametric:
-                        # 参数方程格式：分别计算x和y值
-                        # 直接计算cos(t)和sin(t)，而不是使用变量引用
-                        # 这是一个临时解决方案，后续可以改进为更通用的表达式重新计算
-                        if str(x_expression) == "x_coord" and str(y_expression) == "y_coord":
-                            # 特殊处理圆的参数方程
-                            x_val = math.cos(t)
-                            y_val = math.sin(t)
-                        else:
-                            # 通用情况
-                            x_val = self.evaluate_expression(x_expression)
-                            y_val = self.evaluate_expression(y_expression)
-                        
-                        # 检查是否为有效数值
-                        if (isinstance(x_val, (int, float)) and isinstance(y_val, (int, float)) and 
-                            math.isfinite(x_val) and math.isfinite(y_val)):
-                            points.append((x_val, y_val))
-                            success_count += 1
-                            # 打印一些点用于调试
-                            if success_count <= 5:
-                                print(f"调试: 成功计算点 #{success_count}: ({x_val}, {y_val})")
-                    else:
-                        # 普通函数格式：计算y值
-                        y_val = self.evaluate_expression(expression)
-                        # 检查是否为有效数值
-                        if isinstance(y_val, (int, float)) and math.isfinite(y_val):
-                            points.append((t, y_val))
-                            success_count += 1
-                except Exception as e:
-                    # 如果计算出错，跳过这个点
-                    error_count += 1
-                    print(f"调试: 计算出错，t={t}, 错误: {str(e)}")
-                
-                t += step
-                point_count += 1
-            
-            print(f"调试: 生成完成，总点数: {point_count}，成功点: {success_count}，错误点: {error_count}")
-            
-            if point_count >= max_points:
-                print(f"警告: 已达到最大点数限制 ({max_points})，可能存在无限循环")
-            
-            # 存储绘图点
-            self.plot_points.append(points)
-            self.plot_colors.append(color)
-            
-            # 使用绘图器绘制
-            print(f"调试: 调用drawer绘制 {len(points)} 个点")
-            self.drawer.draw_function(points, color)
+                if param_name not in self.constants:
+                    context[param_name] = t
+                y_list.append(compiled(context))
+        except Exception as e:
+            raise RuntimeError(f"表达式计算错误: {str(e)}") from e
+        y_values = np.array(y_list, dtype=np.float64)
+        if keep is not None:
+            y_values = pruned.scatter(y_values, keep)
+            self.variables[param_name] = float(t_values[-1])
+        return t_values, y_values, self._count_samples(SampleErrors.count(t_values, y_values))
+    
+    def _sample_parametric_scalar(self, param_name: str, start: float, end: float, step: float,
+                                  x_expression, y_expression) -> Tuple[np.ndarray, np.ndarray, SampleErrors]:
+        """逐点计算参数方程的数据点，定义域之外的点为NaN"""
+        x_list = []
+        y_list = []
+        t_values = self._param_grid(start, end, step)
+        x_compiled, context = self._prepare_scalar(x_expression)
+        y_compiled, _ = self._prepare_scalar(y_expression)
+        circle = str(x_expression) == "x_coord" and str(y_expression) == "y_coord"
+        pruned = None if circle else self._prune_grid(param_name, start, step, len(t_values),
+                                                      [x_expression, y_expression])
+        keep = pruned.mask() if pruned is not None else None
+        try:
+            for t in (t_values if keep is None else t_values[keep]).tolist():
+                self.variables[param_name] = t
+                if param_name not in self.constants:
+                    context[param_name] = t
+                if circle:
+                    # 特殊处理圆的参数方程
+                    x_list.append(math.cos(t))
+                    y_list.append(math.sin(t))
+                else:
+                    x_list.append(x_compiled(context))
+                    y_list.append(y_compiled(context))
+        except Exception as e:
+            raise RuntimeError(f"表达式计算错误: {str(e)}") from e
+        x_values = np.array(x_list, dtype=np.float64)
+        y_values = np.array(y_list, dtype=np.float64)
+        if keep is not None:
+            x_values = pruned.scatter(x_values, keep)
+            y_values = pruned.scatter(y_values, keep)
+            self.variables[param_name] = float(t_values[-1])
+        return x_values, y_values, self._count_samples(SampleErrors.count(x_values, y_values))
+    
+    def _inline_functions(self, expression):
+        """把表达式中对自定义函数的引用和调用展开为函数体，每个表达式只展开一次，计算时不再查找函数"""
+        if not self.functions:
+            return expression
+        cached = self._inlined.get(id(expression))
+        if cached is not None and cached[0] is expression:
+            return cached[1]
+        inlined = FunctionInliner(self.functions).inline(expression)
+        # 同时保存原表达式，保证缓存期间id不会被其他对象复用
+        self._inlined[id(expression)] = (expression, inlined)
+        return inlined
+    
+    def _prepare_scalar(self, expression) -> Tuple[Any, Dict[str, float]]:
+        """为逐点计算准备编译后的函数和只构建一次的变量上下文，定义域之外的点得到NaN而不是抛出异常"""
+        try:
+            compiled = self.compiler.compile(self._inline_functions(expression), masked=True)
+        except Exception as e:
+            raise RuntimeError(f"表达式计算错误: {str(e)}") from e
+        context = {**self.variables, **self.constants}
+        return compiled, context
     
     def execute_show_statement(self, statement: Dict):
         """执行show语句，显示绘制的图像"""
-        self.drawer.show()
+        drawer = self.drawer
+        with self._stage('drawer'):
+            drawer.show()
     
     def execute_clear_statement(self, statement: Dict):
         """执行clear语句，清空图像"""
-        self.drawer.clear()
+        if self._drawer is not None:
+            with self._stage('drawer'):
+                self._drawer.clear()
+        self.subexpression_cache.clear()
         self.plot_points = []
         self.plot_colors = []
     
+    def execute_save_statement(self, statement: Dict):
+        """执行save语句，把当前图像写入文件"""
+        if not self.allow_save:
+            raise SemanticError("当前环境不允许使用save语句")
+        drawer = self.drawer
+        try:
+            with self._stage('save'):
+                drawer.save_figure(statement['path'])
+        except ValueError as e:
+            raise SemanticError(str(e)) from e
+    
     def evaluate_expression(self, expression) -> Union[int, float]:
         """计算表达式的值，使用表达式对象的evaluate方法"""
         # 合并所有变量和常量到一个上下文字典中
         context = {**self.variables, **self.constants}
         
         try:
-            # 添加调试信息
-            print(f"调试: evaluate_expression被调用，表达式类型: {type(expression)}, 内容: {expression}")
-            print(f"调试: 当前variables: {self.variables}")
-            print(f"调试: 当前functions: {list(self.functions.keys())}")
-            
-            # 对于函数引用的特殊处理
-            # 检查expression是否是VariableExpression类型，并且其name在functions字典中
-            from .parser.expression import VariableExpression
-            if isinstance(expression, VariableExpression):
-                print(f"调试: 表达式是VariableExpression，名称: {expression.name}")
-                if expression.name in self.functions:
-                    print(f"调试: 发现函数引用 {expression.name}，开始递归计算")
-                    # 如果是对自定义函数的引用，则递归计算该函数的值
-                    func_expr = self.functions[expression.name]
-                    return self.evaluate_expression(func_expr)
-                else:
-                    print(f"调试: 变量 {expression.name} 不在functions字典中")
+            # 添加调试信息，变量表可能很大，只在开启TRACE时输出
+            if logger.isEnabledFor(TRACE):
+                logger.log(TRACE, "evaluate_expression被调用，表达式类型: %s, 内容: %s", type(expression), expression)
+                logger.log(TRACE, "当前variables: %s", self.variables)
+                logger.log(TRACE, "当前functions: %s", list(self.functions.keys()))
             
-            # 调用表达式对象的evaluate方法
-            return expression.evaluate(context)
+            # 先展开对自定义函数的引用和调用，再调用表达式对象的evaluate方法
+            return self._inline_functions(expression).evaluate(context)
         except Exception as e:
             # 重新抛出异常，提供更多上下文信息
             raise RuntimeError(f"表达式计算错误: {str(e)}") from e
+    
+    def evaluate_expression_vector(self, expression, param_name: str, param_values: np.ndarray,
+                                   grid_key: Optional[Tuple] = None) -> np.ndarray:
+        """以参数数组为输入向量化计算表达式，定义域之外的点为NaN
+        给出grid_key且开启了公共子表达式缓存时，复用同一网格上已经计算过的子树结果
+        """
+        context = {**self.variables, param_name: param_values, **self.constants}
+        
+        try:
+            # 对自定义函数引用的处理与标量计算一致
+            expression = self._inline_functions(expression)
+            with np.errstate(all='ignore'):
+                if self.cse and grid_key is not None:
+                    values = self.subexpression_cache.evaluate(expression, context, grid_key, param_name)
+                else:
+                    values = self.compiler.compile(expression, vectorized=True)(context)
+        except Exception as e:
+            raise RuntimeError(f"表达式计算错误: {str(e)}") from e
+        # 不依赖参数的表达式得到的是标量，需要扩展为与参数等长的数组
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), param_values.shape)
+        # 与逐点计算保持一致，绘制结束后参数停留在最后一个取样值
+        if len(param_values) > 0:
+            self.variables[param_name] = float(param_values[-1])
+        return values
 
 
 def main():
@@ -0,0 +1,27 @@
+from typing import Any
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """第一次访问属性时才真正导入的模块代理
+    
+    导入之后真实模块的全部属性被复制到代理自身，之后的属性访问不再经过__getattr__，
+    与直接使用真实模块一样快。
+    """
+    def __getattr__(self, attribute: str) -> Any:
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """返回模块name，尚未导入时返回在第一次使用时才导入的代理
+    
+    用于numpy、matplotlib这类导入耗时的依赖，只做语法检查或者不绘图的程序不必为它们付出启动时间。
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
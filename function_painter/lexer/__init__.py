@@ -2,5 +2,6 @@
 from .token_manager import Token, TokenTypeEnum, TokenBuilder
 from .lexer import Lexer
 from .text_reader import TextReader
+from .tokenizer import TokenArray, tokenize
 
-__all__ = ['Token', 'TokenTypeEnum', 'TokenBuilder', 'Lexer', 'TextReader']
\ No newline at end of file
+__all__ = ['Token', 'TokenTypeEnum', 'TokenBuilder', 'Lexer', 'TextReader', 'TokenArray', 'tokenize']
\ No newline at end of file
@@ -1,30 +1,55 @@
 from typing import Optional, Union, IO
+import mmap
+import os
 
 
 class TextReader:
-    """简化的文本读取器，支持从文件或字符串读取"""
-    def __init__(self, source: Union[str, IO], is_string: bool = False):
-        self.buffer = []  # 使用一个字符缓冲区
+    """文本读取器，支持从文件或字符串读取
+    
+    内部只维护一个指向源文本的位置游标，读取和预览字符都是O(1)操作。
+    超过MMAP_THRESHOLD字节的文件通过mmap映射读取，不会把整个文件复制到内存中。
+    """
+    # 文件大小超过该值时默认使用mmap读取
+    MMAP_THRESHOLD = 1 << 20
+    
+    def __init__(self, source: Union[str, IO], is_string: bool = False, use_mmap: Optional[bool] = None):
+        self.text = ''  # 字符串模式下的源文本
+        self.position = 0  # 下一个待读取字符的位置（mmap模式下为字节偏移）
         self.line_number = 1
         self.column_number = 0
         self.file = None
+        self.mmap: Optional[mmap.mmap] = None
         
         if is_string:
-            # 从字符串读取，将整个字符串转换为字符列表
-            self.buffer = list(source)
+            self.text = source
+            return
+        
+        size = os.path.getsize(source)
+        if use_mmap is None:
+            use_mmap = size >= self.MMAP_THRESHOLD
+        
+        if use_mmap and size > 0:
+            # 映射整个文件，按需解码UTF-8字符
+            self.file = open(source, 'rb')
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
         else:
             # 从文件读取，一次性读取所有内容
-            self.file = open(source, 'r')
-            content = self.file.read()
-            self.buffer = list(content)
-            self.file.close()  # 立即关闭文件，避免资源泄漏
+            with open(source, 'r', encoding='utf-8') as file:
+                self.text = file.read()
     
     def eat_char(self) -> Optional[str]:
         """读取下一个字符并消耗它"""
-        if not self.buffer:
-            return None
+        if self.mmap is not None:
+            char, length = self._decode_at(self.position)
+            if char is None:
+                return None
+            self.position += length
+        else:
+            if self.position >= len(self.text):
+                return None
+            char = self.text[self.position]
+            self.position += 1
         
-        char = self.buffer.pop(0)
         self.column_number += 1
         
         # 处理换行
@@ -36,15 +61,73 @@ class TextReader:
     
     def peek_char(self) -> Optional[str]:
         """预览下一个字符，但不消耗它"""
-        if not self.buffer:
+        if self.mmap is not None:
+            return self._decode_at(self.position)[0]
+        if self.position >= len(self.text):
             return None
-        return self.buffer[0]
+        return self.text[self.position]
+    
+    def read_all(self) -> str:
+        """读取并消耗剩余的全部文本"""
+        if self.mmap is not None:
+            raw = self.mmap[self.position:].decode('utf-8')
+            # 与文本模式读取一致地统一换行符
+            text = raw.replace('\r\n', '\n').replace('\r', '\n')
+            self.position = len(self.mmap)
+        else:
+            text = self.text[self.position:]
+            self.position = len(self.text)
+        
+        # 位置移动到文本末尾
+        newline_count = text.count('\n')
+        if newline_count:
+            self.line_number += newline_count
+            self.column_number = len(text) - text.rfind('\n') - 1
+        else:
+            self.column_number += len(text)
+        return text
+    
+    def source_buffer(self) -> Union[str, mmap.mmap, bytes]:
+        """返回剩余的源文本而不移动游标，供正则表达式一次性扫描
+        
+        mmap模式下返回映射本身（UTF-8字节，换行符未统一），不解码也不复制，
+        调用方需要在close之前用完。
+        """
+        if self.mmap is not None:
+            return self.mmap if self.position == 0 else self.mmap[self.position:]
+        return self.text[self.position:] if self.position else self.text
     
     def get_char_position(self) -> tuple[int, int]:
         """获取当前字符位置"""
         return (self.line_number, self.column_number)
     
+    def _decode_at(self, offset: int) -> tuple[Optional[str], int]:
+        """解码mmap中offset处的一个UTF-8字符，返回字符和它占用的字节数
+        与文本模式读取一致，\\r\\n和单独的\\r都被视为\\n
+        """
+        if offset >= len(self.mmap):
+            return None, 0
+        lead = self.mmap[offset]
+        if lead == 0x0D:  # \r
+            if offset + 1 < len(self.mmap) and self.mmap[offset + 1] == 0x0A:
+                return '\n', 2
+            return '\n', 1
+        if lead < 0x80:
+            return chr(lead), 1
+        if lead < 0xE0:
+            length = 2
+        elif lead < 0xF0:
+            length = 3
+        else:
+            length = 4
+        return self.mmap[offset:offset + length].decode('utf-8'), length
+    
     def close(self):
         """关闭文件"""
-        # 由于我们在初始化时就已经读取了所有内容并关闭了文件，这里不需要做任何事情
-        pass
\ No newline at end of file
+        # 字符串模式在初始化时就已经读取了所有内容，只有mmap模式需要释放资源
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -1,6 +1,10 @@
 from enum import Enum
-from typing import Dict, Any, Optional, Callable, List
-import math
+import functools
+from typing import Dict, Any, Optional, Callable
+from ..tracing import get_logger, TRACE
+
+
+logger = get_logger('lexer')
 
 
 class TokenTypeEnum(Enum):
@@ -49,6 +53,9 @@ class TokenTypeEnum(Enum):
     DIV = "DIV"
     POWER = "POWER"
     
+    # 字符串字面量（文件名）
+    STRING = "STRING"
+    
     # 函数名
     FUNC = "FUNC"
     # 常数（数值字面量、命名常量）
@@ -112,7 +119,7 @@ class TokenBuilder:
 
 def generate_token_match_map() -> Dict[str, Token]:
     """生成Token匹配映射表"""
-    print("调试-TokenMap: 开始生成Token匹配映射表")
+    logger.debug("开始生成Token匹配映射表")
     token_map = {}
     
     # 保留字
@@ -137,17 +144,17 @@ def generate_token_match_map() -> Dict[str, Token]:
         'color': TokenTypeEnum.COLOR
     }
     
-    print(f"调试-TokenMap: 保留字列表: {reserved_words}")
+    logger.log(TRACE, "保留字列表: %s", reserved_words)
     
     for word, token_type in reserved_words.items():
         lower_word = word.lower()
-        print(f"调试-TokenMap: 添加关键字 '{lower_word}' 映射到 {token_type}")
+        logger.log(TRACE, "添加关键字 '%s' 映射到 %s", lower_word, token_type)
         token_map[lower_word] = TokenBuilder()\
             .set_token_type(token_type)\
             .set_lexeme(word)\
             .build()
     
-    print(f"调试-TokenMap: Token映射表生成完成，包含 {len(token_map)} 个关键字")
+    logger.debug("Token映射表生成完成，包含 %s 个关键字", len(token_map))
     
     # 分隔符和运算符
     special_tokens = {
@@ -162,7 +169,8 @@ def generate_token_match_map() -> Dict[str, Token]:
         '-': (TokenTypeEnum.MINUS, None),
         '*': (TokenTypeEnum.MUL, None),
         '/': (TokenTypeEnum.DIV, None),
-        '**': (TokenTypeEnum.POWER, None)
+        '**': (TokenTypeEnum.POWER, None),
+        '^': (TokenTypeEnum.POWER, None)
     }
     
     for symbol, (token_type, _) in special_tokens.items():
@@ -171,110 +179,31 @@ def generate_token_match_map() -> Dict[str, Token]:
             .set_lexeme(symbol)\
             .build()
     
-    # 函数
-    def sin_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("sin requires exactly 1 argument")
-        return math.sin(args[0])
-    
-    def cos_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("cos requires exactly 1 argument")
-        return math.cos(args[0])
-    
-    def tan_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("tan requires exactly 1 argument")
-        return math.tan(args[0])
-    
-    def ln_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("ln requires exactly 1 argument")
-        return math.log(args[0])
-    
-    def log_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("log requires exactly 1 argument")
-        return math.log(args[0])
-    
-    def log10_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("log10 requires exactly 1 argument")
-        return math.log10(args[0])
-    
-    def exp_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("exp requires exactly 1 argument")
-        return math.exp(args[0])
-    
-    def sqrt_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("sqrt requires exactly 1 argument")
-        return math.sqrt(args[0])
-    
-    def abs_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("abs requires exactly 1 argument")
-        return abs(args[0])
-    
-    def asin_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("asin requires exactly 1 argument")
-        return math.asin(args[0])
-    
-    def acos_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("acos requires exactly 1 argument")
-        return math.acos(args[0])
-    
-    def atan_func(args: List[float]) -> float:
-        if len(args) != 1:
-            raise ValueError("atan requires exactly 1 argument")
-        return math.atan(args[0])
-    
-    def max_func(args: List[float]) -> float:
-        if len(args) < 2:
-            raise ValueError("max requires at least 2 arguments")
-        return max(args)
-    
-    def min_func(args: List[float]) -> float:
-        if len(args) < 2:
-            raise ValueError("min requires at least 2 arguments")
-        return min(args)
-    
-    def aver_func(args: List[float]) -> float:
-        if not args:
-            raise ValueError("aver requires at least 1 argument")
-        return sum(args) / len(args)
-    
-    functions = {
-        'sin': sin_func,
-        'cos': cos_func,
-        'tan': tan_func,
-        'asin': asin_func,
-        'acos': acos_func,
-        'atan': atan_func,
-        'ln': ln_func,
-        'log': log_func,
-        'log10': log10_func,
-        'exp': exp_func,
-        'sqrt': sqrt_func,
-        'abs': abs_func,
-        'max': max_func,
-        'min': min_func,
-        'aver': aver_func
-    }
-    
-    for func_name, func in functions.items():
-        token_map[func_name.lower()] = TokenBuilder()\
+    # 函数名来自函数注册表；注册表属于表达式模块，在这里才导入，避免与语法分析器循环导入。
+    # 映射表生成之后注册的函数按变量名识别，语法分析器同样把它后面的括号解析为函数调用
+    from ..parser.expression.functions import FUNCTIONS
+    for func_name in FUNCTIONS:
+        if func_name in token_map:
+            continue
+        token_map[func_name] = TokenBuilder()\
             .set_token_type(TokenTypeEnum.FUNC)\
             .set_lexeme(func_name)\
-            .set_func(func)\
+            .set_func(FUNCTIONS.get(func_name).scalar)\
             .build()
     
     return token_map
 
 
+@functools.lru_cache(maxsize=None)
+def shared_token_match_map() -> Dict[str, Token]:
+    """进程内共享的Token匹配映射表，只生成一次
+    
+    tokenize只读取映射表，不会修改它，因此同一进程中的所有词法分析器可以共用一份，
+    批量处理大量脚本时不必为每个文件重新生成。
+    """
+    return generate_token_match_map()
+
+
 def generate_eof_token() -> Token:
     """生成EOF Token"""
     return Token(
@@ -0,0 +1,190 @@
+from array import array
+from typing import Dict, List, Optional, Union
+import mmap
+import re
+from .token_manager import Token, TokenTypeEnum, generate_eof_token, generate_err_token
+from ..tracing import get_logger, TRACE
+
+
+logger = get_logger('lexer')
+
+
+# 一次扫描整个源文本的主正则表达式，分支顺序与逐字符词法分析的判断顺序一致
+MASTER_PATTERN = re.compile(r'''
+    (?P<newline>\n)
+  | (?P<space>[^\S\n]+)
+  | (?P<comment>//[^\n]*)
+  | (?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?|\.)
+  | (?P<word>[^\W\d_]\w*)
+  | (?P<string>"[^"\n]*"|'[^'\n]*')
+  | (?P<power>\*\*)
+  | (?P<special>.)
+''', re.VERBOSE | re.DOTALL)
+
+# 直接扫描UTF-8字节（mmap映射或已读入的文件内容）的主正则表达式，ASCII字符的分支与MASTER_PATTERN一一对应，
+# \r\n和单独的\r视为换行，与文本模式读取一致。注释之外出现非ASCII字节（包括在字符串中）时匹配unicode分支，
+# 由扫描器把所在的行解码后改用MASTER_PATTERN扫描，因此Unicode字母、空白和列号的处理与文本模式相同
+BYTES_PATTERN = re.compile(rb'''
+    (?P<newline>\r\n|\r|\n)
+  | (?P<space>[ \t\x0b\x0c\x1c-\x1f]+)
+  | (?P<comment>//[^\r\n]*)
+  | (?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?|\.)
+  | (?P<word>[A-Za-z]\w*)
+  | (?P<string>"[^"\r\n\x80-\xff]*"|\'[^\'\r\n\x80-\xff]*\')
+  | (?P<unicode>"[^"\r\n]*"|\'[^\'\r\n]*\'|[\x80-\xff])
+  | (?P<power>\*\*)
+  | (?P<special>.)
+''', re.VERBOSE | re.DOTALL)
+
+NEWLINE_PATTERN = re.compile(rb'[\r\n]')
+
+
+class TokenArray:
+    """紧凑的token数组
+    
+    保留字、运算符等固定token在数组中共享同一个Token对象，
+    每个token的起始行号和列号（均从1开始）保存在两个整数数组中。
+    越过末尾的下标返回EOF token，方便语法分析器做任意长度的前瞻。
+    """
+    def __init__(self):
+        self.tokens: List[Token] = []
+        self.lines = array('I')
+        self.columns = array('I')
+        self.eof_token = generate_eof_token()
+    
+    def append(self, token: Token, line: int, column: int):
+        """追加一个token及其位置"""
+        self.tokens.append(token)
+        self.lines.append(line)
+        self.columns.append(column)
+    
+    def position(self, index: int) -> tuple[int, int]:
+        """返回第index个token的起始位置(行, 列)，越界时返回最后一个token的位置"""
+        if not self.tokens:
+            return (1, 1)
+        index = min(index, len(self.tokens) - 1)
+        return (self.lines[index], self.columns[index])
+    
+    def discard_line(self, line: int):
+        """删除末尾位于第line行的token"""
+        count = len(self.tokens)
+        while count > 0 and self.lines[count - 1] == line:
+            count -= 1
+        del self.tokens[count:]
+        del self.lines[count:]
+        del self.columns[count:]
+    
+    def __getitem__(self, index: int) -> Token:
+        if 0 <= index < len(self.tokens):
+            return self.tokens[index]
+        return self.eof_token
+    
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+
+def _build_token(kind: str, lexeme: str) -> Token:
+    """为不在映射表中的词素创建token"""
+    if kind == 'number':
+        try:
+            return Token(
+                token_type=TokenTypeEnum.CONSTID,
+                lexeme=lexeme,
+                value=float(lexeme)
+            )
+        except ValueError:
+            return generate_err_token(lexeme)
+    if kind == 'string':
+        # 去掉两侧的引号
+        return Token(
+            token_type=TokenTypeEnum.STRING,
+            lexeme=lexeme[1:-1],
+            value=0.0
+        )
+    if kind == 'word' and lexeme[0].isalpha():
+        # 保留字、函数名之外的单词视为变量
+        return Token(
+            token_type=TokenTypeEnum.VARIABLE,
+            lexeme=lexeme,
+            value=0.0
+        )
+    # 上标数字等字符能匹配\w却不是字母，与逐字符分析一样视为非法字符
+    return generate_err_token(lexeme)
+
+
+def tokenize(source: Union[str, bytes, mmap.mmap], token_match_map: Dict[str, Token]) -> TokenArray:
+    """用主正则表达式一次性扫描源文本，生成token数组
+    
+    source也可以是UTF-8编码的字节（bytes或mmap），此时直接在字节上扫描，不必先解码出整个源文本，
+    只有注释之外含非ASCII字符的行被单独解码，结果与先解码再扫描相同。
+    """
+    scanner = _Scanner(token_match_map)
+    if isinstance(source, str):
+        scanner.scan(MASTER_PATTERN, source, 0, len(source))
+        return scanner.tokens
+    
+    position = 0
+    size = len(source)
+    while True:
+        line_begin = scanner.scan(BYTES_PATTERN, source, position, size)
+        if line_begin is None:
+            return scanner.tokens
+        newline = NEWLINE_PATTERN.search(source, line_begin)
+        line_end = newline.start() if newline is not None else size
+        text = source[line_begin:line_end].decode('utf-8')
+        scanner.scan(MASTER_PATTERN, text, 0, len(text))
+        position = line_end
+
+
+class _Scanner:
+    """把主正则表达式的匹配结果转换为token，跨多次scan调用维护行号"""
+    def __init__(self, token_match_map: Dict[str, Token]):
+        self.tokens = TokenArray()
+        # 保留字、运算符直接使用映射表中的token，同一变量名或数字字面量也只创建一个Token对象
+        self.shared_tokens: Dict[str, Token] = dict(token_match_map)
+        self.line = 1
+        self.trace = logger.isEnabledFor(TRACE)
+    
+    def scan(self, pattern: re.Pattern, source: Union[str, bytes, mmap.mmap], start: int, end: int) -> Optional[int]:
+        """扫描source[start:end]，start位于行首或行尾的换行符处
+        
+        扫描完成时返回None；字节中遇到unicode分支时撤销当前行已经生成的token，
+        返回当前行的起始偏移，由调用方解码这一行后继续。
+        """
+        tokens = self.tokens
+        shared_tokens = self.shared_tokens
+        line = self.line
+        line_start = start
+        decode = not isinstance(source, str)
+        
+        for match in pattern.finditer(source, start, end):
+            kind = match.lastgroup
+            if kind == 'newline':
+                line += 1
+                line_start = match.end()
+                continue
+            if kind == 'space' or kind == 'comment':
+                continue
+            if kind == 'unicode':
+                tokens.discard_line(line)
+                self.line = line
+                return line_start
+            
+            lexeme = match.group()
+            if decode:
+                lexeme = lexeme.decode('ascii')
+            if kind == 'word':
+                # 不区分大小写
+                lexeme = lexeme.lower()
+            token = shared_tokens.get(lexeme)
+            if token is None:
+                token = _build_token(kind, lexeme)
+                shared_tokens[lexeme] = token
+            column = match.start() - line_start + 1
+            
+            tokens.append(token, line, column)
+            if self.trace:
+                logger.log(TRACE, "token %s, lexeme: '%s', 位置: (%s, %s)", token.token_type, token.lexeme, line, column)
+        
+        self.line = line
+        return None
@@ -1,24 +1,160 @@
 import sys
 import os
+import argparse
+import logging
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from function_painter.interpreter import Interpreter
 from function_painter.exception.exception import FunctionPainterException
+from function_painter.tracing import configure_logging, COMPONENTS
+from function_painter.evaluator.streaming import DEFAULT_MEMORY_BUDGET
+from function_painter.drawer.decimation import DECIMATION_METHODS
+from function_painter.scheduler import EXECUTORS
+from function_painter.evaluator.sharding import DEFAULT_SHARD_SIZE
+from function_painter.evaluator.result_cache import DEFAULT_CACHE_SIZE
+from function_painter.parser.program_cache import cache_root
+from function_painter.watch import DEFAULT_WATCH_INTERVAL, WatchSession
+from function_painter.profiler import Profiler
+from function_painter.batch import (
+    DEFAULT_BATCH_FORMAT,
+    DEFAULT_SOURCE_PATTERN,
+    BatchRunner,
+    expand_sources,
+    is_batch,
+    summarize
+)
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="python -m function_painter.main",
+        description="Function Painter 函数绘图语言解释器"
+    )
+    parser.add_argument("file_paths", nargs="+", metavar="源文件",
+                        help="源文件路径；给出多个文件、目录或通配符（如 'scripts/*.txt'）时进入批量模式，"
+                             "在同一个进程中依次执行每个脚本并各自输出一幅图像")
+    parser.add_argument("--check", action="store_true",
+                        help="只做词法分析、语法分析和静态检查，不执行程序，也不导入numpy和matplotlib")
+    parser.add_argument("--watch", action="store_true",
+                        help="执行后继续监视源文件，文件变化时只重新计算改变了的draw语句及受影响的曲线，原地更新图像")
+    parser.add_argument("--watch-interval", type=float, default=DEFAULT_WATCH_INTERVAL, metavar="秒",
+                        help="--watch检查源文件是否变化的间隔（默认: %(default)g）")
+    parser.add_argument("--output-dir", metavar="目录",
+                        help="批量模式下输出图像的目录，默认写在每个源文件旁边")
+    parser.add_argument("--format", default=DEFAULT_BATCH_FORMAT,
+                        help="批量模式下输出图像的格式：png、jpg、svg或pdf（默认: %(default)s）")
+    parser.add_argument("--pattern", default=DEFAULT_SOURCE_PATTERN,
+                        help="批量模式下给出目录时处理其中匹配该模式的文件（默认: %(default)s）")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="关闭执行前的表达式优化（常量折叠、代数化简）")
+    parser.add_argument("--no-cse", action="store_true",
+                        help="关闭draw语句之间的公共子表达式缓存")
+    parser.add_argument("--no-prune", action="store_true",
+                        help="关闭取样前的区间剪枝，不再跳过可以证明没有定义的参数范围")
+    parser.add_argument("-o", "--output", metavar="文件",
+                        help="执行完毕后把图像保存到文件（png/svg/pdf），不打开窗口")
+    parser.add_argument("--headless", action="store_true",
+                        help="不打开图像窗口，show语句被忽略，无图形界面时自动启用")
+    parser.add_argument("--stream", action="store_true",
+                        help="所有曲线都按块流式计算，开启抽稀时内存占用与取样点数无关；"
+                             "--decimate none时所有点仍要交给matplotlib，内存随点数增长")
+    parser.add_argument("--memory-budget", type=float, default=DEFAULT_MEMORY_BUDGET / (1 << 20), metavar="MB",
+                        help="流式计算每块占用的内存上限，单位MB，取样点数超过该预算时自动按块计算（默认: %(default)g）")
+    parser.add_argument("--export", metavar="目录",
+                        help="把每条曲线的取样结果按块写入目录下的.npy文件，隐含--stream")
+    parser.add_argument("--decimate", choices=DECIMATION_METHODS + ("none",), default="minmax",
+                        help="交给matplotlib之前把每条曲线抽稀到每个像素列约2个点：minmax保留每列的最大最小值，"
+                             "lttb保持曲线形状，none绘制所有点（默认: %(default)s）")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="并发计算互不依赖的draw语句的工作者数量，0表示使用全部CPU核心（默认: %(default)s，逐条执行）；"
+                             "并发时公共子表达式缓存只在每条语句内部生效")
+    parser.add_argument("--executor", choices=EXECUTORS, default="thread",
+                        help="并发计算使用线程池还是进程池（默认: %(default)s）")
+    parser.add_argument("--shards", type=int, default=1, metavar="N",
+                        help="用N个进程分片计算单条曲线的大取样网格，0表示使用全部CPU核心（默认: %(default)s，不分片）")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, metavar="点数",
+                        help="每个分片的点数，取样点数超过该值时才分片，向下对齐到1024的整数倍（默认: %(default)s）")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="不读取也不写入语法分析缓存和曲线结果缓存")
+    parser.add_argument("--cache-dir", default=cache_root(), metavar="目录",
+                        help="缓存根目录，语法分析结果和曲线结果分别保存在其下的programs和curves目录中（默认: %(default)s）")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_SIZE / (1 << 20), metavar="MB",
+                        help="曲线结果缓存目录的大小上限，超出时删除最久未用的项（默认: %(default)g）")
+    parser.add_argument("--profile", action="store_true",
+                        help="记录词法分析、语法分析、计算、绘图等各阶段以及每条语句的耗时和内存峰值，结束时输出报告；"
+                             "开启后按程序顺序逐条执行")
+    parser.add_argument("--profile-json", metavar="文件",
+                        help="把性能分析结果写入JSON文件，隐含--profile")
+    parser.add_argument("--no-profile-memory", action="store_true",
+                        help="性能分析时不用tracemalloc记录内存峰值，它会明显拖慢纯Python代码")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="输出各组件的调试信息")
+    parser.add_argument("--trace", nargs="?", const=",".join(COMPONENTS), metavar="组件",
+                        help=f"对逗号分隔的组件开启逐字符、逐点的TRACE级输出，可选: {', '.join(COMPONENTS)}，缺省为全部")
+    return parser
 
 
 def main():
     """程序主入口"""
     # 检查命令行参数
-    if len(sys.argv) != 2:
-        print("用法: python -m function_painter.main <源文件路径>")
-        sys.exit(1)
+    arg_parser = build_argument_parser()
+    args = arg_parser.parse_args()
+    file_path = args.file_paths[0]
+    batch = is_batch(args.file_paths)
     
-    file_path = sys.argv[1]
+    # 默认只输出警告，--verbose输出调试信息，--trace对指定组件输出最详细的信息
+    trace_components = [name.strip() for name in args.trace.split(",") if name.strip()] if args.trace else []
+    unknown = [name for name in trace_components if name not in COMPONENTS]
+    if unknown:
+        arg_parser.error(f"未知的组件: {', '.join(unknown)}")
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING, trace_components)
+    if args.memory_budget <= 0:
+        arg_parser.error("--memory-budget必须大于0")
+    if args.jobs < 0:
+        arg_parser.error("--jobs不能为负数")
+    if args.shards < 0:
+        arg_parser.error("--shards不能为负数")
+    if args.shard_size <= 0:
+        arg_parser.error("--shard-size必须大于0")
+    if args.watch_interval <= 0:
+        arg_parser.error("--watch-interval必须大于0")
+    if batch:
+        for enabled, option in ((args.output, "-o"), (args.watch, "--watch"),
+                                (args.profile or args.profile_json, "--profile")):
+            if enabled:
+                arg_parser.error(f"{option}只能用于单个源文件，批量模式请使用--output-dir指定输出目录")
     
+    profiler = Profiler(trace_memory=not args.no_profile_memory) if args.profile or args.profile_json else None
     try:
+        if batch:
+            run_batch(args, arg_parser)
+            return
+        if args.check:
+            # 只检查不执行，绘图器不会被创建
+            errors = Interpreter(optimize=False).check_file(file_path)
+            for error in errors:
+                print(error)
+            if errors:
+                sys.exit(1)
+            print(f"检查通过: {file_path}")
+            return
+        
         # 创建解释器并执行文件
-        interpreter = Interpreter()
+        interpreter = Interpreter(headless=True if args.output or args.headless else None, profiler=profiler,
+                                  **interpreter_options(args))
+        if args.watch:
+            WatchSession(interpreter, file_path, output=args.output, interval=args.watch_interval, report=print).run()
+            return
         interpreter.interpret_file(file_path)
+        if args.output:
+            drawer = interpreter.drawer
+            with profiler.stage('save') if profiler is not None else nullcontext():
+                drawer.save_figure(args.output)
+            print(f"图像已保存到 {args.output}")
     except FileNotFoundError:
         print(f"错误: 找不到文件 '{file_path}'")
         sys.exit(1)
@@ -31,6 +167,77 @@ def main():
     except Exception as e:
         print(f"未预期的错误: {e}")
         sys.exit(1)
+    finally:
+        # 程序出错时也输出已经记录的部分
+        if profiler is not None:
+            report_profile(profiler, args.profile_json)
+
+
+def interpreter_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """由命令行参数得到创建Interpreter的参数，单个文件和批量模式共用"""
+    return {
+        'optimize': not args.no_optimize,
+        'cse': not args.no_cse,
+        'prune': not args.no_prune,
+        'streaming': args.stream,
+        'memory_budget': int(args.memory_budget * (1 << 20)),
+        'export_dir': args.export,
+        'decimation': None if args.decimate == "none" else args.decimate,
+        'workers': args.jobs,
+        'executor': args.executor,
+        'shards': args.shards,
+        'shard_size': args.shard_size,
+        'cache_dir': None if args.no_cache else os.path.join(args.cache_dir, "curves"),
+        'cache_size': int(args.cache_size * (1 << 20)),
+        'program_cache_dir': None if args.no_cache else os.path.join(args.cache_dir, "programs")
+    }
+
+
+def run_batch(args: argparse.Namespace, arg_parser: argparse.ArgumentParser):
+    """批量模式：展开所有源文件，依次检查或执行，有脚本失败时退出码为1"""
+    sources = expand_sources(args.file_paths, args.pattern)
+    if not sources:
+        print(f"错误: 没有找到源文件: {' '.join(args.file_paths)}")
+        sys.exit(1)
+    
+    if args.check:
+        failed = 0
+        for source in sources:
+            try:
+                errors = Interpreter(optimize=False).check_file(source)
+            except FunctionPainterException as e:
+                errors = [e]
+            for error in errors:
+                print(f"{source}: {error}")
+            failed += bool(errors)
+        print(f"检查完成: 共 {len(sources)} 个脚本，{len(sources) - failed} 个通过，{failed} 个有错误")
+        if failed:
+            sys.exit(1)
+        return
+    
+    # 批量模式总是需要绘图，此时才导入matplotlib
+    from function_painter.drawer.drawer import SUPPORTED_FORMATS
+    file_format = args.format.lower()
+    if file_format not in SUPPORTED_FORMATS:
+        arg_parser.error(f"不支持的图像格式: {args.format}，支持的格式: {', '.join(SUPPORTED_FORMATS)}")
+    started = time.perf_counter()
+    results = BatchRunner(interpreter_options(args), args.output_dir, file_format, report=print).run(sources)
+    print(summarize(results, time.perf_counter() - started))
+    if not all(result.success for result in results):
+        sys.exit(1)
+
+
+def report_profile(profiler: Profiler, json_path: Optional[str] = None):
+    """输出性能分析报告，给出json_path时同时写入JSON文件"""
+    profiler.finish()
+    print()
+    print(profiler.report())
+    if json_path:
+        try:
+            profiler.write_json(json_path)
+            print(f"性能分析结果已写入 {json_path}")
+        except OSError as e:
+            print(f"错误: 无法写入性能分析结果: {e}")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,13 @@
 # Parser module
 from .parser import Parser
+from .optimizer import ExpressionOptimizer
+from .program_cache import ProgramCache
+from .inliner import FunctionInliner, UserFunction
 from .expression import *
 
-__all__ = ['Parser', 'Expression', 'BinaryExpression', 'UnaryExpression',
+__all__ = ['Parser', 'ExpressionOptimizer', 'ProgramCache', 'FunctionInliner', 'UserFunction',
+           'Expression', 'BinaryExpression', 'UnaryExpression',
            'ConstantExpression', 'VariableExpression', 'AddExpression',
            'SubtractExpression', 'MultiplyExpression', 'DivideExpression',
-           'PowerExpression', 'NegateExpression', 'FunctionExpression']
\ No newline at end of file
+           'PowerExpression', 'NegateExpression', 'FunctionExpression',
+           'FUNCTIONS', 'FunctionRegistry', 'FunctionSpec', 'register_function']
\ No newline at end of file
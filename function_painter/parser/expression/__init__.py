@@ -9,13 +9,20 @@ from .expression_types import (
     DivideExpression,
     PowerExpression,
     NegateExpression,
-    FunctionExpression
+    FunctionExpression,
+    free_variables,
+    function_calls,
+    function_fingerprints
 )
+from .functions import FUNCTIONS, FunctionRegistry, FunctionSpec, register_function
+from .hashcons import ExpressionPool
 
 __all__ = [
     'Expression', 'BinaryExpression', 'UnaryExpression',
     'ConstantExpression', 'VariableExpression',
     'AddExpression', 'SubtractExpression', 'MultiplyExpression',
     'DivideExpression', 'PowerExpression', 'NegateExpression',
-    'FunctionExpression'
+    'FunctionExpression', 'ExpressionPool', 'free_variables', 'function_calls',
+    'function_fingerprints',
+    'FUNCTIONS', 'FunctionRegistry', 'FunctionSpec', 'register_function'
 ]
\ No newline at end of file
@@ -1,5 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, Optional, Union
+from .interval import Interval
+from ...lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+# 向量化计算的取值类型：不依赖参数的子表达式保持标量，其余为数组
+VectorValue = Union[float, 'np.ndarray']
 
 
 class Expression(ABC):
@@ -9,10 +16,31 @@ class Expression(ABC):
         """计算表达式的值"""
         pass
     
+    @abstractmethod
+    def evaluate_vector(self, variables: dict[str, VectorValue]) -> VectorValue:
+        """以整个参数数组为输入进行向量化计算
+        定义域之外的点返回NaN而不是抛出异常，调用方负责用np.errstate屏蔽浮点警告
+        """
+        pass
+    
+    def evaluate_interval(self, variables: dict[str, Interval]) -> Interval:
+        """变量在给出的区间内取值时，表达式所有有定义的取值的范围（保守估计）
+        返回空区间表示在整个范围内都没有定义；不支持区间计算的表达式返回整个实数轴
+        """
+        return Interval.entire()
+    
     @abstractmethod
     def __str__(self) -> str:
         """返回表达式的字符串表示"""
         pass
+    
+    def children(self) -> tuple['Expression', ...]:
+        """返回直接子表达式"""
+        return ()
+    
+    def with_children(self, children: tuple['Expression', ...]) -> 'Expression':
+        """用新的子表达式构造同类型的表达式，叶子节点返回自身"""
+        return self
 
 
 class BinaryExpression(Expression):
@@ -21,9 +49,34 @@ class BinaryExpression(Expression):
         self.left = left
         self.right = right
     
+    def children(self) -> tuple[Expression, ...]:
+        return (self.left, self.right)
+    
+    def with_children(self, children: tuple[Expression, ...]) -> Expression:
+        return type(self)(children[0], children[1])
+    
+    def __reduce__(self):
+        # 按构造参数序列化，比默认的按__dict__序列化更紧凑，反序列化也更快
+        return (type(self), (self.left, self.right))
+    
     @abstractmethod
     def evaluate(self, variables: dict[str, float]) -> float:
         pass
+    
+    def evaluate_vector(self, variables: dict[str, VectorValue]) -> VectorValue:
+        return self.apply_vector(self.left.evaluate_vector(variables), self.right.evaluate_vector(variables))
+    
+    @abstractmethod
+    def apply_vector(self, left: VectorValue, right: VectorValue) -> VectorValue:
+        """对已经计算好的左右操作数数组执行运算"""
+        pass
+    
+    def evaluate_interval(self, variables: dict[str, Interval]) -> Interval:
+        return self.apply_interval(self.left.evaluate_interval(variables), self.right.evaluate_interval(variables))
+    
+    def apply_interval(self, left: Interval, right: Interval) -> Interval:
+        """对左右操作数的取值范围执行运算"""
+        return Interval.entire()
 
 
 class UnaryExpression(Expression):
@@ -31,6 +84,30 @@ class UnaryExpression(Expression):
     def __init__(self, operand: Expression):
         self.operand = operand
     
+    def children(self) -> tuple[Expression, ...]:
+        return (self.operand,)
+    
+    def __reduce__(self):
+        return (type(self), (self.operand,))
+    
+    def with_children(self, children: tuple[Expression, ...]) -> Expression:
+        return type(self)(children[0])
+    
     @abstractmethod
     def evaluate(self, variables: dict[str, float]) -> float:
-        pass
\ No newline at end of file
+        pass
+    
+    def evaluate_vector(self, variables: dict[str, VectorValue]) -> VectorValue:
+        return self.apply_vector(self.operand.evaluate_vector(variables))
+    
+    @abstractmethod
+    def apply_vector(self, value: VectorValue) -> VectorValue:
+        """对已经计算好的操作数数组执行运算"""
+        pass
+    
+    def evaluate_interval(self, variables: dict[str, Interval]) -> Interval:
+        return self.apply_interval(self.operand.evaluate_interval(variables))
+    
+    def apply_interval(self, value: Interval) -> Interval:
+        """对操作数的取值范围执行运算"""
+        return Interval.entire()
@@ -1,6 +1,26 @@
-from typing import Dict, Optional
+from typing import Optional, Sequence, Tuple, Union
 import math
-from .expression_base import Expression, BinaryExpression, UnaryExpression
+from .expression_base import Expression, BinaryExpression, UnaryExpression, VectorValue
+from .functions import FUNCTIONS, FunctionSpec
+from .interval import Interval, interval_power
+from ...lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+def vector_divide(left: VectorValue, right: VectorValue) -> VectorValue:
+    """向量化除法，除数为零的点与标量计算一致视为无效点"""
+    return np.where(right == 0, np.nan, np.divide(left, np.where(right == 0, 1.0, right)))
+
+
+def vector_power(base: VectorValue, exponent: VectorValue) -> VectorValue:
+    """向量化幂运算，2次、3次幂按连乘计算，比np.power快，溢出同样得到inf，与masked_power一致"""
+    if np.ndim(exponent) == 0:
+        if exponent == 2:
+            return base * base
+        if exponent == 3:
+            return base * base * base
+    return np.power(base, exponent)
 
 
 class ConstantExpression(Expression):
@@ -11,6 +31,15 @@ class ConstantExpression(Expression):
     def evaluate(self, variables: dict[str, float]) -> float:
         return self.value
     
+    def evaluate_vector(self, variables: dict[str, VectorValue]) -> VectorValue:
+        return self.value
+    
+    def evaluate_interval(self, variables: dict[str, Interval]) -> Interval:
+        return Interval.point(self.value)
+    
+    def __reduce__(self):
+        return (ConstantExpression, (self.value,))
+    
     def __str__(self) -> str:
         return str(self.value)
 
@@ -25,6 +54,15 @@ class VariableExpression(Expression):
             raise ValueError(f"变量 '{self.name}' 未定义")
         return variables[self.name]
     
+    def evaluate_vector(self, variables: dict[str, VectorValue]) -> VectorValue:
+        return self.evaluate(variables)
+    
+    def evaluate_interval(self, variables: dict[str, Interval]) -> Interval:
+        return self.evaluate(variables)
+    
+    def __reduce__(self):
+        return (VariableExpression, (self.name,))
+    
     def __str__(self) -> str:
         return self.name
 
@@ -34,6 +72,12 @@ class AddExpression(BinaryExpression):
     def evaluate(self, variables: dict[str, float]) -> float:
         return self.left.evaluate(variables) + self.right.evaluate(variables)
     
+    def apply_vector(self, left: VectorValue, right: VectorValue) -> VectorValue:
+        return left + right
+    
+    def apply_interval(self, left: Interval, right: Interval) -> Interval:
+        return left + right
+    
     def __str__(self) -> str:
         return f"({self.left} + {self.right})"
 
@@ -43,6 +87,12 @@ class SubtractExpression(BinaryExpression):
     def evaluate(self, variables: dict[str, float]) -> float:
         return self.left.evaluate(variables) - self.right.evaluate(variables)
     
+    def apply_vector(self, left: VectorValue, right: VectorValue) -> VectorValue:
+        return left - right
+    
+    def apply_interval(self, left: Interval, right: Interval) -> Interval:
+        return left - right
+    
     def __str__(self) -> str:
         return f"({self.left} - {self.right})"
 
@@ -52,6 +102,12 @@ class MultiplyExpression(BinaryExpression):
     def evaluate(self, variables: dict[str, float]) -> float:
         return self.left.evaluate(variables) * self.right.evaluate(variables)
     
+    def apply_vector(self, left: VectorValue, right: VectorValue) -> VectorValue:
+        return left * right
+    
+    def apply_interval(self, left: Interval, right: Interval) -> Interval:
+        return left * right
+    
     def __str__(self) -> str:
         return f"({self.left} * {self.right})"
 
@@ -64,6 +120,12 @@ class DivideExpression(BinaryExpression):
             raise ZeroDivisionError("除数不能为零")
         return self.left.evaluate(variables) / divisor
     
+    def apply_vector(self, left: VectorValue, right: VectorValue) -> VectorValue:
+        return vector_divide(left, right)
+    
+    def apply_interval(self, left: Interval, right: Interval) -> Interval:
+        return left / right
+    
     def __str__(self) -> str:
         return f"({self.left} / {self.right})"
 
@@ -73,6 +135,12 @@ class PowerExpression(BinaryExpression):
     def evaluate(self, variables: dict[str, float]) -> float:
         return math.pow(self.left.evaluate(variables), self.right.evaluate(variables))
     
+    def apply_vector(self, left: VectorValue, right: VectorValue) -> VectorValue:
+        return vector_power(left, right)
+    
+    def apply_interval(self, left: Interval, right: Interval) -> Interval:
+        return interval_power(left, right)
+    
     def __str__(self) -> str:
         return f"({self.left} ** {self.right})"
 
@@ -82,44 +150,117 @@ class NegateExpression(UnaryExpression):
     def evaluate(self, variables: dict[str, float]) -> float:
         return -self.operand.evaluate(variables)
     
+    def apply_vector(self, value: VectorValue) -> VectorValue:
+        return -value
+    
+    def apply_interval(self, value: Interval) -> Interval:
+        return -value
+    
     def __str__(self) -> str:
         return f"-({self.operand})"
 
 
+def masked_divide(left: float, right: float) -> float:
+    """标量除法，除数为零时得到NaN，与vector_divide一致"""
+    return left / right if right != 0 else math.nan
+
+
+def masked_power(base: float, exponent: float) -> float:
+    """标量幂运算，负数的非整数次幂得到NaN，零的负数次幂和溢出得到inf，与vector_power一致"""
+    if exponent == 2:
+        return base * base
+    if exponent == 3:
+        return base * base * base
+    if base < 0 and not float(exponent).is_integer():
+        return math.nan
+    if base == 0 and exponent < 0:
+        return math.inf
+    try:
+        return math.pow(base, exponent)
+    except OverflowError:
+        # 溢出很少出现，不值得事先判断；负数的奇数次幂溢出为-inf
+        return -math.inf if base < 0 and exponent % 2 == 1 else math.inf
+
+
 class FunctionExpression(Expression):
-    """函数表达式"""
-    def __init__(self, name: str, arg: Expression):
+    """函数调用表达式，构造时（即语法分析时）在函数注册表中解析一次函数名
+    
+    已注册的函数在构造时检查参数个数；未知的函数名保留到计算时再报错，由静态检查提前报告。
+    """
+    def __init__(self, name: str, args: Union[Expression, Sequence[Expression]]):
         self.name = name
-        self.arg = arg
+        # 兼容只传入一个参数表达式的写法
+        self.args: Tuple[Expression, ...] = (args,) if isinstance(args, Expression) else tuple(args)
+        self.spec: Optional[FunctionSpec] = FUNCTIONS.get(name)
+        if self.spec is not None:
+            self.spec.check_arity(len(self.args))
     
-    def evaluate(self, variables: dict[str, float]) -> float:
-        arg_value = self.arg.evaluate(variables)
-        
-        # 根据函数名调用对应的数学函数
-        if self.name == "sin":
-            return math.sin(arg_value)
-        elif self.name == "cos":
-            return math.cos(arg_value)
-        elif self.name == "tan":
-            return math.tan(arg_value)
-        elif self.name == "asin":
-            return math.asin(arg_value)
-        elif self.name == "acos":
-            return math.acos(arg_value)
-        elif self.name == "atan":
-            return math.atan(arg_value)
-        elif self.name == "sqrt":
-            return math.sqrt(arg_value)
-        elif self.name == "exp":
-            return math.exp(arg_value)
-        elif self.name == "log":
-            return math.log(arg_value)
-        elif self.name == "log10":
-            return math.log10(arg_value)
-        elif self.name == "abs":
-            return abs(arg_value)
-        else:
+    @property
+    def arg(self) -> Expression:
+        """第一个参数，单参数函数的参数"""
+        return self.args[0]
+    
+    def children(self) -> tuple[Expression, ...]:
+        return self.args
+    
+    def with_children(self, children: tuple[Expression, ...]) -> Expression:
+        return FunctionExpression(self.name, children)
+    
+    def __reduce__(self):
+        return (FunctionExpression, (self.name, self.args))
+    
+    def _resolved(self) -> FunctionSpec:
+        if self.spec is None:
             raise ValueError(f"未知函数名: {self.name}")
+        return self.spec
+    
+    def evaluate(self, variables: dict[str, float]) -> float:
+        spec = self._resolved()
+        return spec.scalar(*(arg.evaluate(variables) for arg in self.args))
+    
+    def evaluate_vector(self, variables: dict[str, VectorValue]) -> VectorValue:
+        return self.apply_vector(*(arg.evaluate_vector(variables) for arg in self.args))
+    
+    def apply_vector(self, *values: VectorValue) -> VectorValue:
+        """对参数数组调用函数的向量化内核，定义域之外的点置为NaN"""
+        return self._resolved().vector_kernel(*values)
+    
+    def evaluate_interval(self, variables: dict[str, Interval]) -> Interval:
+        return self.apply_interval(*(arg.evaluate_interval(variables) for arg in self.args))
+    
+    def apply_interval(self, *values: Interval) -> Interval:
+        """参数取值范围为values时函数的取值范围"""
+        return self._resolved().apply_interval(*values)
     
     def __str__(self) -> str:
-        return f"{self.name}({self.arg})"
\ No newline at end of file
+        return f"{self.name}({', '.join(str(arg) for arg in self.args)})"
+
+
+def function_calls(expression: Expression) -> set[str]:
+    """表达式中调用的函数名"""
+    names: set[str] = {expression.name} if isinstance(expression, FunctionExpression) else set()
+    for child in expression.children():
+        names |= function_calls(child)
+    return names
+
+
+def function_fingerprints(expression: Expression) -> tuple[tuple[str, Optional[str]], ...]:
+    """表达式中调用的函数及其实现摘要，按函数名排序，未知函数的摘要为None"""
+    found: set[tuple[str, Optional[str]]] = set()
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, FunctionExpression):
+            found.add((node.name, node.spec.fingerprint if node.spec is not None else None))
+        stack.extend(node.children())
+    return tuple(sorted(found, key=lambda item: (item[0], item[1] or '')))
+
+
+def free_variables(expression: Expression) -> set[str]:
+    """表达式中出现的变量名"""
+    if isinstance(expression, VariableExpression):
+        return {expression.name}
+    names: set[str] = set()
+    for child in expression.children():
+        names |= free_variables(child)
+    return names
\ No newline at end of file
@@ -0,0 +1,234 @@
+from __future__ import annotations
+from typing import Callable, Dict, Iterator, Optional, Union
+import functools
+import hashlib
+import math
+import types
+from .interval import EXP_LIMIT, INTERVAL_FUNCTIONS, Interval
+from ...lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+class FunctionSpec:
+    """一个可以在表达式中调用的数学函数
+    
+    scalar为标量实现，用于常量折叠和赋值等语句，定义域之外可以抛出ValueError；
+    masked为逐点取样使用的标量实现，定义域之外返回NaN、溢出返回inf而不抛出异常，默认与scalar相同；
+    vector为向量化内核，输入与参数个数相同的数组（或标量）返回数组，也可以是NumPy中的函数名，第一次使用时才导入NumPy；
+    domain为单参数函数合法输入的掩码函数，给出时vector在定义域之外的结果置为NaN；
+    interval为区间计算，用于取样前的剪枝，没有给出时返回整个实数轴，不做剪枝。
+    参数个数在min_args到max_args之间，max_args为None表示不限。
+    fingerprint是这些实现的内容摘要，编译缓存、曲线缓存和公共子表达式缓存用它区分同名函数的不同实现。
+    """
+    def __init__(self, name: str, scalar: Callable[..., float], vector: Union[str, Callable[..., object]],
+                 masked: Optional[Callable[..., float]] = None, interval: Optional[Callable[..., Interval]] = None,
+                 domain: Optional[Callable[[object], object]] = None, min_args: int = 1, max_args: Optional[int] = 1):
+        if min_args < 0 or (max_args is not None and max_args < min_args):
+            raise ValueError(f"函数 {name} 的参数个数范围无效: {min_args} 到 {max_args}")
+        if domain is not None and max_args != 1:
+            raise ValueError(f"函数 {name} 的定义域掩码只能用于单参数函数")
+        self.name = name
+        self.scalar = scalar
+        self.masked = masked if masked is not None else scalar
+        self.vector = vector
+        self.interval = interval
+        self.domain = domain
+        self.min_args = min_args
+        self.max_args = max_args
+    
+    @functools.cached_property
+    def vector_kernel(self) -> Callable[..., object]:
+        """向量化计算使用的内核，定义域之外的点为NaN"""
+        func = getattr(np, self.vector) if isinstance(self.vector, str) else self.vector
+        return _masked_kernel(func, self.domain) if self.domain is not None else func
+    
+    @functools.cached_property
+    def fingerprint(self) -> str:
+        """函数实现的内容摘要，同一份代码在不同进程中得到相同的结果，替换为不同的实现时随之改变"""
+        parts = [self.name, repr((self.min_args, self.max_args))]
+        parts.extend(_describe(part) for part in (self.scalar, self.masked, self.vector, self.interval, self.domain))
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:16]
+    
+    @property
+    def arity(self) -> str:
+        """参数个数的文字描述"""
+        if self.max_args is None:
+            return f"至少 {self.min_args}"
+        if self.max_args == self.min_args:
+            return str(self.min_args)
+        return f"{self.min_args} 到 {self.max_args}"
+    
+    def check_arity(self, count: int):
+        """参数个数不符合时抛出ValueError"""
+        if count < self.min_args or (self.max_args is not None and count > self.max_args):
+            needed = f"至少需要 {self.min_args}" if self.max_args is None else f"需要 {self.arity}"
+            raise ValueError(f"函数 {self.name} {needed} 个参数，实际为 {count} 个")
+    
+    def apply_interval(self, *values: Interval) -> Interval:
+        """参数的取值范围为values时函数的取值范围"""
+        if self.interval is None:
+            return Interval.entire()
+        return self.interval(*values)
+    
+    def __repr__(self) -> str:
+        return f"FunctionSpec({self.name!r}, 参数个数: {self.arity})"
+
+
+class FunctionRegistry:
+    """函数名到FunctionSpec的映射
+    
+    函数表达式在构造时（即语法分析时）按名字解析一次，之后的计算直接使用解析得到的FunctionSpec。
+    替换已经注册的函数不影响已经解析的表达式；各个缓存的键包含函数实现的摘要，不会把新旧实现的结果混用。
+    """
+    def __init__(self):
+        self._functions: Dict[str, FunctionSpec] = {}
+    
+    def register(self, spec: FunctionSpec, replace: bool = False) -> FunctionSpec:
+        """注册函数，词法分析不区分大小写，因此函数名必须是小写的标识符"""
+        if not spec.name.isidentifier() or spec.name != spec.name.lower():
+            raise ValueError(f"函数名必须是小写的标识符: {spec.name}")
+        if spec.name in self._functions and not replace:
+            raise ValueError(f"函数 {spec.name} 已经注册")
+        self._functions[spec.name] = spec
+        return spec
+    
+    def get(self, name: str) -> Optional[FunctionSpec]:
+        return self._functions.get(name)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._functions
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._functions)
+    
+    def __len__(self) -> int:
+        return len(self._functions)
+    
+    def fingerprint(self) -> str:
+        """所有已注册函数的实现摘要，任何函数被替换时随之改变"""
+        text = '\0'.join(f'{name}={spec.fingerprint}' for name, spec in sorted(self._functions.items()))
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _describe(value: object, depth: int = 0) -> str:
+    """函数实现的文字描述：Python函数取代码、常量和闭包变量，内置函数和NumPy函数取限定名"""
+    if depth > 4:
+        return type(value).__name__
+    code = getattr(value, '__code__', None)
+    if isinstance(code, types.CodeType):
+        cells = []
+        for cell in getattr(value, '__closure__', None) or ():
+            try:
+                cells.append(_describe(cell.cell_contents, depth + 1))
+            except ValueError:
+                cells.append('<empty>')
+        defaults = [_describe(default, depth + 1) for default in getattr(value, '__defaults__', None) or ()]
+        return f"{value.__module__}.{value.__qualname__}[{_describe_code(code)}|{','.join(cells)}|{','.join(defaults)}]"
+    if callable(value):
+        name = getattr(value, '__qualname__', None) or getattr(value, '__name__', None)
+        if name is not None:
+            return f"{getattr(value, '__module__', None) or type(value).__module__}.{name}"
+    # 其他对象的repr可能含有内存地址，此时只是无法跨进程复用缓存
+    return repr(value)
+
+
+def _describe_code(code: types.CodeType) -> str:
+    constants = ','.join(_describe_code(const) if isinstance(const, types.CodeType) else repr(const)
+                         for const in code.co_consts)
+    return f"{code.co_code.hex()}:{','.join(code.co_names)}:{constants}"
+
+
+def _masked_kernel(func: Callable[[object], object],
+                   domain_mask: Callable[[object], object]) -> Callable[[object], object]:
+    """包装NumPy函数，使定义域之外的输入得到NaN"""
+    def kernel(value):
+        valid = domain_mask(value)
+        # 先把非法输入替换为合法值再计算，避免产生多余的警告
+        return np.where(valid, func(np.where(valid, value, 1.0)), np.nan)
+    return kernel
+
+
+def _nan_extreme(func: Callable[..., float]) -> Callable[..., float]:
+    """标量的max、min，任一参数为NaN时结果为NaN，与np.maximum、np.minimum一致"""
+    def extreme(*values: float) -> float:
+        if any(math.isnan(value) for value in values):
+            return math.nan
+        return func(values)
+    return extreme
+
+
+def _aver(*values):
+    """参数的平均值，标量和数组通用"""
+    return sum(values) / len(values)
+
+
+def _interval_extreme(func: Callable[..., float]) -> Callable[..., Interval]:
+    """max、min对每个参数单调，端点分别取各参数端点的最大（小）值"""
+    def evaluate(*values: Interval) -> Interval:
+        if any(value.is_empty for value in values):
+            return Interval.empty()
+        return Interval(func(value.low for value in values), func(value.high for value in values),
+                        any(value.partial for value in values))
+    return evaluate
+
+
+def _interval_aver(*values: Interval) -> Interval:
+    return functools.reduce(lambda left, right: left + right, values) / Interval.point(len(values))
+
+
+def _unit_domain(value):
+    return np.abs(value) <= 1
+
+
+def _positive_domain(value):
+    return value > 0
+
+
+# 默认的函数注册表，包含所有内置函数
+FUNCTIONS = FunctionRegistry()
+
+for _spec in (
+    FunctionSpec('sin', math.sin, 'sin', masked=lambda x: math.sin(x) if math.isfinite(x) else math.nan,
+                 interval=INTERVAL_FUNCTIONS['sin']),
+    FunctionSpec('cos', math.cos, 'cos', masked=lambda x: math.cos(x) if math.isfinite(x) else math.nan,
+                 interval=INTERVAL_FUNCTIONS['cos']),
+    FunctionSpec('tan', math.tan, 'tan', masked=lambda x: math.tan(x) if math.isfinite(x) else math.nan,
+                 interval=INTERVAL_FUNCTIONS['tan']),
+    FunctionSpec('asin', math.asin, 'arcsin', masked=lambda x: math.asin(x) if -1 <= x <= 1 else math.nan,
+                 interval=INTERVAL_FUNCTIONS['asin'], domain=_unit_domain),
+    FunctionSpec('acos', math.acos, 'arccos', masked=lambda x: math.acos(x) if -1 <= x <= 1 else math.nan,
+                 interval=INTERVAL_FUNCTIONS['acos'], domain=_unit_domain),
+    FunctionSpec('atan', math.atan, 'arctan', interval=INTERVAL_FUNCTIONS['atan']),
+    FunctionSpec('sqrt', math.sqrt, 'sqrt', masked=lambda x: math.sqrt(x) if x >= 0 else math.nan,
+                 interval=INTERVAL_FUNCTIONS['sqrt'], domain=lambda x: x >= 0),
+    FunctionSpec('exp', math.exp, 'exp', masked=lambda x: math.inf if x > EXP_LIMIT else math.exp(x),
+                 interval=INTERVAL_FUNCTIONS['exp']),
+    FunctionSpec('log', math.log, 'log', masked=lambda x: math.log(x) if x > 0 else math.nan,
+                 interval=INTERVAL_FUNCTIONS['log'], domain=_positive_domain),
+    # ln是log的别名
+    FunctionSpec('ln', math.log, 'log', masked=lambda x: math.log(x) if x > 0 else math.nan,
+                 interval=INTERVAL_FUNCTIONS['log'], domain=_positive_domain),
+    FunctionSpec('log10', math.log10, 'log10', masked=lambda x: math.log10(x) if x > 0 else math.nan,
+                 interval=INTERVAL_FUNCTIONS['log10'], domain=_positive_domain),
+    FunctionSpec('abs', abs, 'abs', interval=INTERVAL_FUNCTIONS['abs']),
+    FunctionSpec('max', _nan_extreme(max), lambda *values: functools.reduce(np.maximum, values),
+                 interval=_interval_extreme(max), min_args=2, max_args=None),
+    FunctionSpec('min', _nan_extreme(min), lambda *values: functools.reduce(np.minimum, values),
+                 interval=_interval_extreme(min), min_args=2, max_args=None),
+    FunctionSpec('aver', _aver, _aver, interval=_interval_aver, min_args=1, max_args=None)
+):
+    FUNCTIONS.register(_spec)
+del _spec
+
+
+def register_function(name: str, scalar: Callable[..., float], vector: Union[str, Callable[..., object]],
+                      masked: Optional[Callable[..., float]] = None, interval: Optional[Callable[..., Interval]] = None,
+                      domain: Optional[Callable[[object], object]] = None, min_args: int = 1,
+                      max_args: Optional[int] = 1, replace: bool = False) -> FunctionSpec:
+    """在默认注册表中注册函数，参数的含义见FunctionSpec
+    
+    注册应在语法分析之前完成。多进程计算（--executor process、--shards）的工作进程重新导入模块，
+    只能看到在模块导入时注册的函数。
+    """
+    return FUNCTIONS.register(FunctionSpec(name, scalar, vector, masked, interval, domain, min_args, max_args), replace)
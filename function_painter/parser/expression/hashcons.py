@@ -0,0 +1,58 @@
+from typing import Dict, FrozenSet, Hashable, Tuple
+from .expression_base import Expression
+from .expression_types import ConstantExpression, VariableExpression, FunctionExpression
+
+
+class ExpressionPool:
+    """表达式的哈希合并（hash-consing）池
+    
+    结构相同的子树被合并为同一个规范节点，因此可以直接用节点的id判断两个子树是否相同。
+    池持有所有规范节点的引用，保证id在池的生命周期内不会被复用。
+    """
+    def __init__(self):
+        self.nodes: Dict[Tuple[Hashable, ...], Expression] = {}
+        self.free_variables: Dict[int, FrozenSet[str]] = {}
+    
+    def intern(self, expression: Expression) -> Expression:
+        """返回与表达式结构相同的规范节点，不存在时自底向上登记"""
+        children = tuple(self.intern(child) for child in expression.children())
+        key = (type(expression), self._payload(expression)) + tuple(id(child) for child in children)
+        
+        canonical = self.nodes.get(key)
+        if canonical is None:
+            if any(new is not old for new, old in zip(children, expression.children())):
+                canonical = expression.with_children(children)
+            else:
+                canonical = expression
+            self.nodes[key] = canonical
+            if isinstance(canonical, VariableExpression):
+                self.free_variables[id(canonical)] = frozenset((canonical.name,))
+            else:
+                self.free_variables[id(canonical)] = frozenset().union(
+                    *(self.free_variables[id(child)] for child in children))
+        return canonical
+    
+    def variables_of(self, canonical: Expression) -> FrozenSet[str]:
+        """返回规范节点依赖的变量名集合"""
+        return self.free_variables[id(canonical)]
+    
+    def clear(self):
+        """清空池"""
+        self.nodes.clear()
+        self.free_variables.clear()
+    
+    def __len__(self) -> int:
+        return len(self.nodes)
+    
+    @staticmethod
+    def _payload(expression: Expression) -> Hashable:
+        """节点自身（不含子节点）的结构信息"""
+        if isinstance(expression, ConstantExpression):
+            # 使用十六进制表示区分0.0和-0.0
+            return float(expression.value).hex()
+        if isinstance(expression, FunctionExpression):
+            # 同名函数的不同实现不能合并
+            return (expression.name, expression.spec.fingerprint if expression.spec is not None else None)
+        if isinstance(expression, VariableExpression):
+            return expression.name
+        return None
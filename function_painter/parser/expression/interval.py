@@ -0,0 +1,246 @@
+from __future__ import annotations
+from typing import Callable, Dict, Iterable
+import math
+import sys
+
+
+# exp的参数超过该值时结果溢出
+EXP_LIMIT = math.log(sys.float_info.max)
+_TAU = 2 * math.pi
+# 超越函数的结果向外扩展的ulp数，抵消数学库（以及NumPy的向量化实现）舍入的非单调性
+_WIDEN_ULPS = 4
+# 判断区间是否包含极值点、渐近线时的相对容差，靠近边界时按包含处理
+_PHASE_TOLERANCE = 1e-9
+
+
+class Interval:
+    """闭区间 [low, high]，表示表达式在一段参数范围内所有有定义的点上取值的范围
+    
+    partial为True表示范围内可能有一些点没有定义（取样结果为NaN）；空区间表示每个点都没有定义。
+    区间只会比真实的取值范围大：无法精确估计时返回整个实数轴并把partial置为True。
+    四则运算在端点上使用与取样相同的浮点运算，舍入是单调的，端点本身就是取值的界；
+    操作数的端点为无穷大时，inf - inf、0 * inf 等可能得到NaN，结果的partial也置为True。
+    """
+    __slots__ = ('low', 'high', 'partial')
+    
+    def __init__(self, low: float, high: float, partial: bool = False):
+        self.low = low
+        self.high = high
+        self.partial = partial
+    
+    @classmethod
+    def point(cls, value: float) -> Interval:
+        """只含一个值的区间，NaN对应空区间"""
+        value = float(value)
+        return cls.empty() if math.isnan(value) else cls(value, value)
+    
+    @classmethod
+    def empty(cls) -> Interval:
+        """每个点都没有定义"""
+        return cls(math.inf, -math.inf)
+    
+    @classmethod
+    def entire(cls) -> Interval:
+        """无法估计时使用的整个实数轴，可能含有无定义的点"""
+        return cls(-math.inf, math.inf, True)
+    
+    @property
+    def is_empty(self) -> bool:
+        return self.low > self.high
+    
+    @property
+    def is_bounded(self) -> bool:
+        return math.isfinite(self.low) and math.isfinite(self.high)
+    
+    def _combine(self, other: Interval) -> bool:
+        """二元运算结果的partial"""
+        return self.partial or other.partial or not (self.is_bounded and other.is_bounded)
+    
+    def __add__(self, other: Interval) -> Interval:
+        if self.is_empty or other.is_empty:
+            return Interval.empty()
+        return _bounds((self.low + other.low, self.high + other.high), self._combine(other))
+    
+    def __sub__(self, other: Interval) -> Interval:
+        if self.is_empty or other.is_empty:
+            return Interval.empty()
+        return _bounds((self.low - other.high, self.high - other.low), self._combine(other))
+    
+    def __mul__(self, other: Interval) -> Interval:
+        if self.is_empty or other.is_empty:
+            return Interval.empty()
+        return _bounds((self.low * other.low, self.low * other.high, self.high * other.low, self.high * other.high),
+                       self._combine(other))
+    
+    def __truediv__(self, other: Interval) -> Interval:
+        if self.is_empty or other.is_empty or other.low == other.high == 0:
+            # 除数处处为零时每个点都是NaN，与vector_divide一致
+            return Interval.empty()
+        if other.low <= 0 <= other.high:
+            return Interval.entire()
+        return _bounds((self.low / other.low, self.low / other.high, self.high / other.low, self.high / other.high),
+                       self._combine(other))
+    
+    def __neg__(self) -> Interval:
+        if self.is_empty:
+            return self
+        return Interval(-self.high, -self.low, self.partial)
+    
+    def __repr__(self) -> str:
+        if self.is_empty:
+            return "Interval.empty()"
+        return f"Interval({self.low!r}, {self.high!r}{', partial=True' if self.partial else ''})"
+
+
+def _bounds(values: Iterable[float], partial: bool) -> Interval:
+    """以若干候选值的最小值和最大值为端点，出现NaN时无法估计"""
+    values = tuple(values)
+    if any(math.isnan(value) for value in values):
+        return Interval.entire()
+    return Interval(min(values), max(values), partial)
+
+
+def _widened(low: float, high: float, partial: bool) -> Interval:
+    """超越函数的结果向外扩展几个ulp"""
+    if math.isnan(low) or math.isnan(high):
+        return Interval.entire()
+    if math.isfinite(low):
+        low -= _WIDEN_ULPS * math.ulp(low)
+    if math.isfinite(high):
+        high += _WIDEN_ULPS * math.ulp(high)
+    return Interval(low, high, partial)
+
+
+def _power(base: float, exponent: float) -> float:
+    """端点上的幂运算，溢出时得到带符号的inf"""
+    try:
+        return math.pow(base, exponent)
+    except OverflowError:
+        return -math.inf if base < 0 and exponent % 2 == 1 else math.inf
+
+
+def interval_power(base: Interval, exponent: Interval) -> Interval:
+    """幂运算的区间，与np.power一致：负数的非整数次幂没有定义，零的负数次幂为inf"""
+    if base.is_empty or exponent.is_empty:
+        # NaN的0次幂和1的NaN次幂都是1，空区间不一定传播
+        return Interval.entire()
+    if exponent.low == exponent.high:
+        # 指数为常数时底数为无穷大也不会得到NaN，任何数（包括NaN）的0次幂都是1
+        n = exponent.low
+        partial = base.partial or exponent.partial
+        if n == 0:
+            return Interval(1.0, 1.0)
+        if n.is_integer():
+            if base.low > 0 or base.high < 0 or (n > 0 and n % 2 == 1):
+                # 在区间上单调
+                return _widened(*sorted((_power(base.low, n), _power(base.high, n))), partial)
+            if n > 0:
+                # 偶数次幂，区间包含0
+                return _widened(0.0, max(_power(base.low, n), _power(base.high, n)), partial)
+            return Interval.entire()
+        if base.high < 0:
+            return Interval.empty()
+        low = base.low
+        if low < 0:
+            partial = True
+            low = 0.0
+        if low == 0 and n < 0:
+            return Interval.entire()
+        return _widened(*sorted((_power(low, n), _power(base.high, n))), partial)
+    partial = base._combine(exponent)
+    if base.low > 0:
+        # 正数底数的幂对底数和指数分别单调，极值在四个角上
+        corners = [_power(b, e) for b in (base.low, base.high) for e in (exponent.low, exponent.high)]
+        return _widened(min(corners), max(corners), partial)
+    return Interval.entire()
+
+
+def _contains_phase(low: float, high: float, phase: float, period: float) -> bool:
+    """[low, high] 是否包含 phase + k*period，靠近边界时按包含处理"""
+    slack = _PHASE_TOLERANCE * max(1.0, abs(low), abs(high))
+    k = math.ceil((low - slack - phase) / period)
+    return phase + k * period <= high + slack
+
+
+def _periodic(func: Callable[[float], float], peak: float, trough: float) -> Callable[[Interval], Interval]:
+    """sin、cos的区间：区间包含峰值点或谷值点时取到±1，否则在端点处取到极值"""
+    def evaluate(value: Interval) -> Interval:
+        if value.is_empty:
+            return value
+        if not value.is_bounded:
+            # sin(inf)没有定义
+            return Interval(-1.0, 1.0, True)
+        if value.high - value.low >= _TAU:
+            return Interval(-1.0, 1.0, value.partial)
+        low, high = sorted((func(value.low), func(value.high)))
+        interval = _widened(low, high, value.partial)
+        if _contains_phase(value.low, value.high, peak, _TAU):
+            interval.high = 1.0
+        if _contains_phase(value.low, value.high, trough, _TAU):
+            interval.low = -1.0
+        interval.low = max(interval.low, -1.0)
+        interval.high = min(interval.high, 1.0)
+        return interval
+    return evaluate
+
+
+def _tan(value: Interval) -> Interval:
+    if value.is_empty:
+        return value
+    if not value.is_bounded:
+        return Interval.entire()
+    if value.high - value.low >= math.pi or _contains_phase(value.low, value.high, math.pi / 2, math.pi):
+        # 跨过渐近线，浮点数的tan不会得到inf，取值范围是全部有限值
+        return Interval(-sys.float_info.max, sys.float_info.max, value.partial)
+    return _widened(math.tan(value.low), math.tan(value.high), value.partial)
+
+
+def _monotone(func: Callable[[float], float], domain_low: float = -math.inf, domain_high: float = math.inf,
+              open_low: bool = False, limit_low: float = -math.inf,
+              decreasing: bool = False) -> Callable[[Interval], Interval]:
+    """在定义域上单调的函数的区间
+    
+    定义域为 [domain_low, domain_high]，open_low为True时不含下端点，此时下端点处的极限为limit_low。
+    与定义域没有交集时为空区间，部分相交时partial为True。
+    """
+    def evaluate(value: Interval) -> Interval:
+        if value.is_empty:
+            return value
+        below = value.low <= domain_low if open_low else value.low < domain_low
+        if value.high < domain_low or (open_low and value.high <= domain_low) or value.low > domain_high:
+            return Interval.empty()
+        partial = value.partial or below or value.high > domain_high
+        low = func(value.low) if not below else (limit_low if open_low else func(domain_low))
+        high = func(min(value.high, domain_high))
+        if decreasing:
+            low, high = high, low
+        return _widened(low, high, partial)
+    return evaluate
+
+
+def _exp(value: float) -> float:
+    return math.inf if value > EXP_LIMIT else math.exp(value)
+
+
+def _abs(value: Interval) -> Interval:
+    if value.is_empty or value.low >= 0:
+        return value
+    if value.high <= 0:
+        return -value
+    return Interval(0.0, max(-value.low, value.high), value.partial)
+
+
+# 内置函数的区间计算，由函数注册表中对应的FunctionSpec引用
+INTERVAL_FUNCTIONS: Dict[str, Callable[[Interval], Interval]] = {
+    'sin': _periodic(math.sin, math.pi / 2, -math.pi / 2),
+    'cos': _periodic(math.cos, 0.0, math.pi),
+    'tan': _tan,
+    'asin': _monotone(math.asin, -1.0, 1.0),
+    'acos': _monotone(math.acos, -1.0, 1.0, decreasing=True),
+    'atan': _monotone(math.atan),
+    'sqrt': _monotone(math.sqrt, 0.0),
+    'exp': _monotone(_exp),
+    'log': _monotone(math.log, 0.0, open_low=True),
+    'log10': _monotone(math.log10, 0.0, open_low=True),
+    'abs': _abs
+}
@@ -0,0 +1,81 @@
+from typing import Dict, Mapping, Sequence, Tuple
+from .expression import Expression, FunctionExpression, VariableExpression
+
+
+# 展开后的表达式按树计算的节点数上限，共享的子树每出现一次计数一次
+MAX_INLINED_NODES = 100_000
+
+
+class UserFunction:
+    """用户定义的函数：f(x, y) = 函数体，没有参数的函数直接用函数名引用"""
+    def __init__(self, name: str, params: Sequence[str], body: Expression):
+        self.name = name
+        self.params: Tuple[str, ...] = tuple(params)
+        self.body = body
+    
+    def __reduce__(self):
+        return (UserFunction, (self.name, self.params, self.body))
+    
+    def __str__(self) -> str:
+        return f"{self.name}({', '.join(self.params)}) = {self.body}"
+
+
+class FunctionInliner:
+    """把表达式中对自定义函数的调用展开为函数体，展开后的表达式只含变量、常量和内置函数
+    
+    调用的实参代入函数体中对应的形参；函数体中的其他名字指向全局的变量和常量，
+    不受调用处形参的影响。没有参数的函数可以直接用函数名引用，表达式中任何位置的引用都会展开。
+    同名时形参优先于自定义函数，自定义函数不能与内置函数重名。循环引用和参数个数不符时抛出ValueError。
+    
+    每个实参只展开一次，函数体中形参的每次出现共用同一个节点；但之后的优化、编译和计算都按树处理表达式，
+    嵌套调用（如 g(x) = f(f(f(x)))）展开后的树可能随嵌套层数指数增长，超过max_nodes个节点时抛出ValueError。
+    """
+    def __init__(self, functions: Mapping[str, UserFunction], max_nodes: int = MAX_INLINED_NODES):
+        self.functions = functions
+        self.max_nodes = max_nodes
+        # 节点id -> (节点, 按树计算的节点数)，同时保存节点本身，保证id在展开期间不会被复用
+        self._sizes: Dict[int, Tuple[Expression, int]] = {}
+    
+    def inline(self, expression: Expression) -> Expression:
+        """返回展开后的表达式，没有需要展开的调用时返回原表达式"""
+        return self._inline(expression, {}, ())
+    
+    def _inline(self, expression: Expression, bindings: Dict[str, Expression],
+                expanding: Tuple[str, ...]) -> Expression:
+        if isinstance(expression, VariableExpression):
+            if expression.name in bindings:
+                return bindings[expression.name]
+            function = self.functions.get(expression.name)
+            if function is not None and not function.params:
+                return self._expand(function, (), expanding)
+            return expression
+        
+        children = expression.children()
+        new_children = tuple(self._inline(child, bindings, expanding) for child in children)
+        if isinstance(expression, FunctionExpression) and expression.name in self.functions:
+            return self._expand(self.functions[expression.name], new_children, expanding)
+        if any(new is not old for new, old in zip(new_children, children)):
+            expression = expression.with_children(new_children)
+        return expression
+    
+    def _expand(self, function: UserFunction, args: Tuple[Expression, ...], expanding: Tuple[str, ...]) -> Expression:
+        """展开一次调用，实参已经展开"""
+        if function.name in expanding:
+            raise ValueError(f"函数循环引用: {' -> '.join(expanding + (function.name,))}")
+        if len(args) != len(function.params):
+            raise ValueError(f"函数 {function.name} 需要 {len(function.params)} 个参数，实际为 {len(args)} 个")
+        expanded = self._inline(function.body, dict(zip(function.params, args)), expanding + (function.name,))
+        size = self._tree_size(expanded)
+        if size > self.max_nodes:
+            raise ValueError(f"函数 {function.name} 展开后的表达式有 {size} 个节点，超过上限 {self.max_nodes}，"
+                             f"请减少函数的嵌套调用")
+        return expanded
+    
+    def _tree_size(self, expression: Expression) -> int:
+        """表达式按树计算的节点数，共享的子树只遍历一次"""
+        cached = self._sizes.get(id(expression))
+        if cached is not None and cached[0] is expression:
+            return cached[1]
+        size = 1 + sum(self._tree_size(child) for child in expression.children())
+        self._sizes[id(expression)] = (expression, size)
+        return size
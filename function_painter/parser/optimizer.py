@@ -0,0 +1,162 @@
+from typing import Dict, List, Optional
+import math
+from .expression import (
+    Expression,
+    ConstantExpression,
+    VariableExpression,
+    AddExpression,
+    SubtractExpression,
+    MultiplyExpression,
+    DivideExpression,
+    PowerExpression,
+    NegateExpression
+)
+
+
+def count_nodes(expression: Expression) -> int:
+    """统计表达式树的节点数"""
+    return 1 + sum(count_nodes(child) for child in expression.children())
+
+
+class ExpressionOptimizer:
+    """表达式优化器，在语法分析之后、执行之前对语句中的表达式树做化简
+    
+    - 常量折叠：全部由常量组成的子树（包括pi、e和const定义的常量）直接计算为常量
+    - 幂的化简：0次、1次幂直接化简。2次、3次幂不改写为连乘：标量计算中幂运算溢出会报错而乘法得到inf，
+      改写会改变赋值语句的报错行为；取样时vector_power和masked_power本身就按连乘计算
+    - 代数化简：去掉 x*1、x+0、x-0、x/1 这样的恒等运算，合并双重取负
+    
+    计算会出错或结果不是有限数的常量子树保持原样，保证运行时的报错行为不变。
+    """
+    def __init__(self, constants: Optional[Dict[str, float]] = None):
+        self.initial_constants: Dict[str, float] = dict(constants) if constants is not None else {
+            'pi': math.pi,
+            'e': math.e
+        }
+        self.constants: Dict[str, float] = dict(self.initial_constants)
+        self.eliminated_nodes = 0
+    
+    def optimize_program(self, statements: List[dict]) -> List[dict]:
+        """按程序顺序优化语句列表，返回新的语句列表，原语句不被修改"""
+        self.constants = dict(self.initial_constants)
+        self.eliminated_nodes = 0
+        optimized = []
+        
+        for statement in statements:
+            statement_type = statement.get('type')
+            new_statement = dict(statement)
+            
+            if statement_type == 'function':
+                # 函数体在绘制时才计算，届时常量可能已被重新定义，只做不依赖命名常量的化简
+                new_statement['expression'] = self._optimize_tracked(statement['expression'], {})
+            else:
+                for key in ('expression', 'x_expression', 'y_expression'):
+                    if key in statement:
+                        new_statement[key] = self._optimize_tracked(statement[key], self.constants)
+            
+            if statement_type == 'const':
+                # 记录可以在编译期确定的常量值，供后续语句折叠使用
+                expression = new_statement['expression']
+                if isinstance(expression, ConstantExpression):
+                    self.constants[statement['name']] = float(expression.value)
+                else:
+                    self.constants.pop(statement['name'], None)
+            
+            optimized.append(new_statement)
+        
+        return optimized
+    
+    def optimize(self, expression: Expression) -> Expression:
+        """优化单个表达式"""
+        return self._optimize_tracked(expression, self.constants)
+    
+    def _optimize_tracked(self, expression: Expression, constants: Dict[str, float]) -> Expression:
+        """优化表达式并累计消除的节点数"""
+        result = self._optimize(expression, constants)
+        self.eliminated_nodes += count_nodes(expression) - count_nodes(result)
+        return result
+    
+    def _optimize(self, expression: Expression, constants: Dict[str, float]) -> Expression:
+        """自底向上递归化简"""
+        if isinstance(expression, VariableExpression):
+            # 运行时常量优先于同名变量，因此可以直接替换
+            if expression.name in constants:
+                return ConstantExpression(constants[expression.name])
+            return expression
+        
+        children = expression.children()
+        if not children:
+            return expression
+        
+        new_children = tuple(self._optimize(child, constants) for child in children)
+        if any(new is not old for new, old in zip(new_children, children)):
+            expression = expression.with_children(new_children)
+        
+        folded = self._fold_constant(expression)
+        if folded is not None:
+            return folded
+        return self._simplify(expression)
+    
+    def _fold_constant(self, expression: Expression) -> Optional[Expression]:
+        """所有子节点均为常量时直接计算结果"""
+        if not all(isinstance(child, ConstantExpression) for child in expression.children()):
+            return None
+        try:
+            value = expression.evaluate({})
+        except (ValueError, ZeroDivisionError, OverflowError):
+            return None
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+        return ConstantExpression(float(value))
+    
+    def _simplify(self, expression: Expression) -> Expression:
+        """幂和代数恒等式的化简"""
+        if isinstance(expression, NegateExpression):
+            # --x => x
+            if isinstance(expression.operand, NegateExpression):
+                return expression.operand.operand
+            return expression
+        
+        if isinstance(expression, PowerExpression):
+            return self._reduce_power(expression)
+        
+        if not isinstance(expression, (AddExpression, SubtractExpression, MultiplyExpression, DivideExpression)):
+            return expression
+        
+        left, right = expression.left, expression.right
+        if isinstance(expression, AddExpression):
+            if self._is_constant(right, 0.0):
+                return left
+            if self._is_constant(left, 0.0):
+                return right
+        elif isinstance(expression, SubtractExpression):
+            if self._is_constant(right, 0.0):
+                return left
+            if self._is_constant(left, 0.0):
+                return NegateExpression(right)
+        elif isinstance(expression, MultiplyExpression):
+            if self._is_constant(right, 1.0):
+                return left
+            if self._is_constant(left, 1.0):
+                return right
+        elif isinstance(expression, DivideExpression):
+            if self._is_constant(right, 1.0):
+                return left
+        return expression
+    
+    def _reduce_power(self, expression: PowerExpression) -> Expression:
+        """化简0次和1次幂"""
+        exponent = expression.right
+        if not isinstance(exponent, ConstantExpression):
+            return expression
+        if exponent.value == 1:
+            return expression.left
+        if exponent.value == 0 and isinstance(expression.left, VariableExpression):
+            # math.pow(x, 0) 对任何x（包括NaN）都返回1
+            return ConstantExpression(1.0)
+        return expression
+    
+    @staticmethod
+    def _is_constant(expression: Expression, value: float) -> bool:
+        """判断表达式是否为指定值的常量"""
+        return isinstance(expression, ConstantExpression) and expression.value == value
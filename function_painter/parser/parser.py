@@ -1,4 +1,5 @@
 from typing import Optional, Dict
+import logging
 from ..lexer import Lexer, Token, TokenTypeEnum
 from .expression import (
     Expression,
@@ -10,57 +11,69 @@ from .expression import (
     DivideExpression,
     PowerExpression,
     NegateExpression,
-    FunctionExpression
+    FunctionExpression,
+    FUNCTIONS
 )
+from ..tracing import get_logger
+
+
+logger = get_logger('parser')
 
 
 class Parser:
     """语法分析器"""
     def __init__(self, lexer: Lexer):
         self.lexer = lexer
-        self.current_token: Optional[Token] = self.lexer.fetch_token()
+        # 直接按下标读取词法分析器生成的token数组，从词法分析器当前位置开始
+        self.tokens = lexer.tokens
+        self.position = lexer.index
+        self.current_token: Optional[Token] = self.tokens[self.position]
     
     def parse_program(self) -> list[dict]:
         """解析整个程序"""
         statements = []
-        print(f"调试: 开始解析程序")
+        logger.debug("开始解析程序")
         
         # 检查初始token
         if not self.current_token:
-            print(f"调试: 没有可用的token，重新获取")
-            self.current_token = self.lexer.fetch_token()
+            logger.debug("没有可用的token，重新获取")
+            self.current_token = self.tokens[self.position]
         
-        print(f"调试: 初始token: {self.current_token}")
+        logger.debug("初始token: %s", self.current_token)
         
         statement_count = 0
         
         while self.current_token and self.current_token.token_type != TokenTypeEnum.NONTOKEN:
             statement_count += 1
-            print(f"调试: 解析第 {statement_count} 个语句，当前token: {self.current_token}")
+            logger.debug("解析第 %s 个语句，当前token: %s", statement_count, self.current_token)
             
-            # 解析语句
+            # 解析语句，记录语句起始的源代码行号
+            line = self.tokens.position(self.position)[0]
             statement = self.parse_statement()
             
             if statement:
-                print(f"调试: 第 {statement_count} 个语句解析成功: {statement}")
-                print(f"调试: 语句类型: {statement.get('type')}")
+                statement['line'] = line
+                logger.debug("第 %s 个语句解析成功: %s", statement_count, statement)
+                logger.debug("语句类型: %s", statement.get('type'))
                 statements.append(statement)
             else:
-                print(f"调试: 第 {statement_count} 个语句解析失败，跳过")
+                logger.debug("第 %s 个语句解析失败，跳过", statement_count)
                 # 确保总是有下一个token
                 if not self.current_token:
                     break
         
         # 调试信息
-        print(f"调试: 程序解析完成，共解析 {len(statements)} 个语句")
-        for i, stmt in enumerate(statements):
-            print(f"调试: 最终语句 {i+1} 类型: {stmt.get('type')}")
+        logger.debug("程序解析完成，共解析 %s 个语句", len(statements))
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, stmt in enumerate(statements):
+                logger.debug("最终语句 %s 类型: %s", i+1, stmt.get('type'))
         
         return statements
     
     def parse_statement(self) -> Optional[dict]:
         """解析单个语句"""
-        print(f"调试: 当前解析语句，token类型: {self.current_token.token_type if self.current_token else None}, lexeme: '{self.current_token.lexeme if self.current_token else None}'")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("当前解析语句，token类型: %s, lexeme: '%s'", self.current_token.token_type if self.current_token else None, self.current_token.lexeme if self.current_token else None)
         if not self.current_token:
             return None
         
@@ -68,6 +81,14 @@ class Parser:
         if self.current_token.token_type == TokenTypeEnum.PARAM:
             return self.parse_param_statement()
         
+        # 解析常量定义
+        elif self._at_keyword('const'):
+            return self.parse_const_statement()
+        
+        # 解析保存指令
+        elif self._at_keyword('save'):
+            return self.parse_save_statement()
+        
         # 解析变量赋值
         elif self.current_token.token_type == TokenTypeEnum.VARIABLE:
             return self.parse_assignment_statement()
@@ -96,8 +117,10 @@ class Parser:
         """解析参数声明，支持两种格式：
         1. param x from min_val to max_val step step_val
         2. param x [min_val, max_val, step_val]
+        格式1还可以在末尾加上自适应取样选项（此时step可以省略，作为初始网格的步长）：
+            param x from min_val to max_val [step step_val] adaptive [tol 容差] [depth 最大深度] [budget 点数上限]
         """
-        print(f"调试: 解析param语句，当前token: {self.current_token}")
+        logger.debug("解析param语句，当前token: %s", self.current_token)
         self._eat_token()  # 吃掉PARAM
         
         # 确保是变量名
@@ -109,10 +132,11 @@ class Parser:
         min_val = -1.0
         max_val = 1.0
         step = 0.01
+        adaptive = None
         
         # 检查是否是方括号格式
         if self.current_token and self.current_token.token_type == TokenTypeEnum.LBRACKET:
-            print(f"调试: 检测到方括号格式")
+            logger.debug("检测到方括号格式")
             self._eat_token()  # 吃掉[
             
             # 解析最小值
@@ -204,38 +228,74 @@ class Parser:
             else:
                 raise ValueError("语法错误: 参数声明缺少最大值")
             
-            if not self.current_token or self.current_token.token_type != TokenTypeEnum.STEP:
-                raise ValueError("语法错误: 参数声明缺少STEP关键字")
-            self._eat_token()
-            
-            # 解析步长
-            if self.current_token.token_type == TokenTypeEnum.MINUS:
+            if self.current_token and self.current_token.token_type == TokenTypeEnum.STEP:
                 self._eat_token()
-                if not self.current_token or self.current_token.token_type != TokenTypeEnum.CONSTID:
+                
+                # 解析步长
+                if self.current_token.token_type == TokenTypeEnum.MINUS:
+                    self._eat_token()
+                    if not self.current_token or self.current_token.token_type != TokenTypeEnum.CONSTID:
+                        raise ValueError("语法错误: 参数声明缺少步长")
+                    step = -self.current_token.value
+                    self._eat_token()
+                elif self.current_token.token_type == TokenTypeEnum.CONSTID:
+                    step = self.current_token.value
+                    self._eat_token()
+                else:
                     raise ValueError("语法错误: 参数声明缺少步长")
-                step = -self.current_token.value
-                self._eat_token()
-            elif self.current_token.token_type == TokenTypeEnum.CONSTID:
-                step = self.current_token.value
-                self._eat_token()
+            elif self._at_keyword('adaptive'):
+                # 自适应取样时步长由解释器根据范围确定
+                step = None
             else:
-                raise ValueError("语法错误: 参数声明缺少步长")
+                raise ValueError("语法错误: 参数声明缺少STEP关键字")
+            
+            if self._at_keyword('adaptive'):
+                adaptive = self._parse_adaptive_options()
         
-        print(f"调试: param语句解析完成，参数: {name} [{min_val}, {max_val}, {step}]")
+        logger.debug("param语句解析完成，参数: %s [%s, %s, %s]", name, min_val, max_val, step)
         return {
             'type': 'param',
             'name': name,
             'min': min_val,
             'max': max_val,
-            'step': step
+            'step': step,
+            'adaptive': adaptive
+        }
+    
+    def _parse_adaptive_options(self) -> dict:
+        """解析 adaptive [tol 容差] [depth 最大深度] [budget 点数上限]，未给出的选项为None
+        
+        adaptive和选项名都是上下文关键字，后面跟着等号或左括号时是下一条语句中的变量名或函数名。
+        """
+        self._eat_token()  # 吃掉adaptive
+        options = {'tol': None, 'max_depth': None, 'max_points': None}
+        option_keys = {
+            'tol': 'tol',
+            'depth': 'max_depth',
+            'budget': 'max_points'
         }
+        
+        while self.current_token and self.current_token.lexeme in option_keys \
+                and self._at_keyword(self.current_token.lexeme):
+            lexeme = self.current_token.lexeme
+            key = option_keys[lexeme]
+            self._eat_token()  # 吃掉选项名
+            if not self.current_token or self.current_token.token_type != TokenTypeEnum.CONSTID:
+                raise ValueError(f"语法错误: 自适应取样选项 {lexeme} 缺少数值")
+            options[key] = self.current_token.value
+            self._eat_token()  # 吃掉数值
+        
+        return options
 
     
     def parse_assignment_statement(self) -> dict:
-        """解析赋值语句"""
+        """解析赋值语句，变量名后面是括号时为带参数的函数定义：f(x, y) = expression"""
         name = self.current_token.lexeme
         self._eat_token()  # 吃掉变量名
         
+        if self.current_token and self.current_token.token_type == TokenTypeEnum.LPAREN:
+            return self._parse_parameterized_function(name)
+        
         if self.current_token and self.current_token.token_type == TokenTypeEnum.ASSIGN:
             self._eat_token()  # 吃掉=
             expr = self.parse_expression()
@@ -247,13 +307,71 @@ class Parser:
             }
         
         # 不是有效的赋值语句，返回None而不是错误类型
-        print(f"调试: 无效的赋值语句，缺少等号")
+        logger.debug("无效的赋值语句，缺少等号")
         return None
     
+    def _parse_parameterized_function(self, name: str) -> dict:
+        """解析带参数的函数定义，当前token为函数名后面的左括号"""
+        if name in FUNCTIONS:
+            raise ValueError(f"语法错误: 函数名 {name} 与内置函数重名")
+        self._eat_token()  # 吃掉(
+        
+        params = []
+        if self.current_token and self.current_token.token_type != TokenTypeEnum.RPAREN:
+            while True:
+                if not self.current_token or self.current_token.token_type != TokenTypeEnum.VARIABLE:
+                    raise ValueError(f"语法错误: 函数 {name} 的参数必须是变量名")
+                if self.current_token.lexeme in params:
+                    raise ValueError(f"语法错误: 函数 {name} 的参数 {self.current_token.lexeme} 重复")
+                params.append(self.current_token.lexeme)
+                self._eat_token()  # 吃掉参数名
+                if not self.current_token or self.current_token.token_type != TokenTypeEnum.COMMA:
+                    break
+                self._eat_token()  # 吃掉,
+        
+        if not self.current_token or self.current_token.token_type != TokenTypeEnum.RPAREN:
+            raise ValueError("语法错误: 缺少右括号")
+        self._eat_token()  # 吃掉)
+        if not self.current_token or self.current_token.token_type != TokenTypeEnum.ASSIGN:
+            raise ValueError(f"语法错误: 函数 {name} 的定义缺少等号")
+        self._eat_token()  # 吃掉=
+        expr = self.parse_expression()
+        
+        return {
+            'type': 'function',
+            'name': name,
+            'params': params,
+            'expression': expr
+        }
+    
+    def parse_const_statement(self) -> dict:
+        """解析常量定义语句：const NAME = expression"""
+        self._eat_token()  # 吃掉const
+        
+        if not self.current_token or self.current_token.token_type != TokenTypeEnum.VARIABLE:
+            raise ValueError("语法错误: 常量定义缺少常量名")
+        name = self.current_token.lexeme
+        self._eat_token()  # 吃掉常量名
+        
+        if not self.current_token or self.current_token.token_type != TokenTypeEnum.ASSIGN:
+            raise ValueError("语法错误: 常量定义缺少等号")
+        self._eat_token()  # 吃掉=
+        expr = self.parse_expression()
+        
+        return {
+            'type': 'const',
+            'name': name,
+            'expression': expr
+        }
+    
     def parse_function_definition(self) -> dict:
         """解析函数定义"""
+        func_name = self.current_token.lexeme
         self._eat_token()  # 吃掉FUNC
         
+        if self.current_token and self.current_token.token_type == TokenTypeEnum.LPAREN:
+            raise ValueError(f"语法错误: 函数名 {func_name} 与内置函数重名")
+        
         if self.current_token and self.current_token.token_type == TokenTypeEnum.VARIABLE:
             name = self.current_token.lexeme
             self._eat_token()  # 吃掉函数名
@@ -265,11 +383,12 @@ class Parser:
                 return {
                     'type': 'function',
                     'name': name,
+                    'params': [],
                     'expression': expr
                 }
         
         # 不是有效的函数定义，返回None而不是错误类型
-        print(f"调试: 无效的函数定义")
+        logger.debug("无效的函数定义")
         return None
     
     def parse_draw_statement(self) -> dict:
@@ -319,6 +438,16 @@ class Parser:
         self._eat_token()  # 吃掉CLEAR
         return {'type': 'clear'}
     
+    def parse_save_statement(self) -> dict:
+        """解析保存语句：save "文件名" """
+        self._eat_token()  # 吃掉save
+        
+        if not self.current_token or self.current_token.token_type != TokenTypeEnum.STRING:
+            raise ValueError("语法错误: save语句缺少用引号括起的文件名")
+        path = self.current_token.lexeme
+        self._eat_token()  # 吃掉文件名
+        return {'type': 'save', 'path': path}
+    
     def parse_expression(self) -> Expression:
         """解析表达式"""
         return self._parse_equality()
@@ -411,8 +540,13 @@ class Parser:
             if self.current_token and self.current_token.token_type == TokenTypeEnum.LPAREN:
                 self._eat_token()  # 吃掉(
                 
-                # 解析参数表达式
-                arg_expr = self.parse_expression()
+                # 解析以逗号分隔的参数表达式，参数列表可以为空
+                args = []
+                if self.current_token and self.current_token.token_type != TokenTypeEnum.RPAREN:
+                    args.append(self.parse_expression())
+                    while self.current_token and self.current_token.token_type == TokenTypeEnum.COMMA:
+                        self._eat_token()  # 吃掉,
+                        args.append(self.parse_expression())
                 
                 # 吃掉右括号
                 if self.current_token and self.current_token.token_type == TokenTypeEnum.RPAREN:
@@ -420,7 +554,11 @@ class Parser:
                 else:
                     raise ValueError("语法错误: 缺少右括号")
                 
-                return FunctionExpression(func_name, arg_expr)
+                # 已注册的函数在这里解析并检查参数个数
+                try:
+                    return FunctionExpression(func_name, args)
+                except ValueError as e:
+                    raise ValueError(f"语法错误: {e}") from e
             
             # 否则是普通变量
             return VariableExpression(func_name)
@@ -442,7 +580,22 @@ class Parser:
     
     def _eat_token(self):
         """消费当前token"""
-        self.current_token = self.lexer.fetch_token()
+        self.position += 1
+        self.current_token = self.tokens[self.position]
+    
+    def _at_keyword(self, word: str) -> bool:
+        """当前token是否为按上下文识别的关键字word
+        
+        上下文关键字在词法分析时是普通的变量名，只在语句中对应的位置按关键字处理；
+        后面紧跟等号或左括号时仍是同名的变量或函数，因此已有脚本中的这些名字不受影响。
+        """
+        token = self.current_token
+        return (token is not None and token.token_type == TokenTypeEnum.VARIABLE and token.lexeme == word
+                and self._peek_token().token_type not in (TokenTypeEnum.ASSIGN, TokenTypeEnum.LPAREN))
+    
+    def _peek_token(self, offset: int = 1) -> Token:
+        """前瞻当前token之后第offset个token，不移动位置"""
+        return self.tokens[self.position + offset]
     
     def _expect_token(self, token_type: TokenTypeEnum):
         """期望当前token是指定类型"""
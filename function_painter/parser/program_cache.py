@@ -0,0 +1,100 @@
+from typing import Dict, List, Optional
+import hashlib
+import os
+import pickle
+import tempfile
+from ..tracing import get_logger
+
+
+logger = get_logger('parser')
+
+# 语句或表达式树的结构变化时递增，旧的缓存项自然失效
+PROGRAM_FORMAT_VERSION = 4
+
+
+def cache_root() -> str:
+    """所有缓存的根目录，遵循XDG_CACHE_HOME"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'function_painter')
+
+
+def default_cache_dir() -> str:
+    """语法分析结果的默认缓存目录"""
+    return os.path.join(cache_root(), 'programs')
+
+
+class ProgramCache:
+    """语法分析结果的磁盘缓存
+    
+    Parser.parse_program得到的语句列表（包括其中的表达式树，通常已经过优化）用pickle序列化，
+    按源文件内容、解释器版本和格式版本的哈希保存。源文件没有变化时直接读取，
+    跳过词法分析和语法分析；缓存项损坏或版本不符时返回None，由调用方重新分析。
+    缓存文件只应由本机用户自己写入，不要把缓存目录指向不受信任的位置。
+    """
+    def __init__(self, directory: Optional[str] = None):
+        from .. import __version__
+        self.directory = directory or default_cache_dir()
+        self.version = __version__
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def key_for_file(self, file_path: str, variant: str = '') -> str:
+        """源文件的缓存键，variant区分同一源文件的不同处理方式（如是否经过优化）"""
+        digest = hashlib.sha256(f'{PROGRAM_FORMAT_VERSION}:{self.version}:{variant}:'.encode('utf-8'))
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pickle')
+    
+    def load(self, key: str) -> Optional[List[Dict]]:
+        """读取缓存的语句列表，未命中、损坏或版本不符时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                payload = pickle.load(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            # 文件写了一半、被截断或者类定义已经变化
+            logger.warning("语法分析缓存已损坏，重新分析: %s (%s)", path, e)
+            self._discard(path)
+            self.misses += 1
+            return None
+        
+        if (not isinstance(payload, dict) or payload.get('format') != PROGRAM_FORMAT_VERSION
+                or payload.get('version') != self.version or not isinstance(payload.get('statements'), list)):
+            logger.warning("语法分析缓存版本不符，重新分析: %s", path)
+            self._discard(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.debug("语法分析缓存命中: %s，共 %s 条语句", path, len(payload['statements']))
+        return payload['statements']
+    
+    def store(self, key: str, statements: List[Dict]):
+        """保存语句列表，先写入临时文件再改名"""
+        payload = {
+            'format': PROGRAM_FORMAT_VERSION,
+            'version': self.version,
+            'statements': statements
+        }
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+        except (OSError, pickle.PicklingError, RecursionError) as e:
+            logger.warning("写入语法分析缓存失败: %s", e)
+            self._discard(temp_path)
+    
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,266 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import time
+import tracemalloc
+import unicodedata
+from .tracing import get_logger
+
+
+logger = get_logger('interpreter')
+
+# 结果JSON的格式版本，字段变化时递增
+PROFILE_FORMAT_VERSION = 1
+
+# 报告中语句摘要的最大长度
+SUMMARY_WIDTH = 40
+
+
+class _Frame:
+    """正在计时的一个阶段或语句，记录进入时的时间和已分配内存"""
+    def __init__(self, memory: int):
+        self.started = time.perf_counter()
+        self.memory = memory
+        # 相对进入时已分配内存的峰值增量
+        self.peak = 0
+
+
+class StageProfile:
+    """一个阶段（词法分析、语法分析、计算、绘图等）的累计耗时"""
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.peak_bytes = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'seconds': self.seconds, 'calls': self.calls, 'peak_bytes': self.peak_bytes}
+
+
+class StatementProfile:
+    """一条语句的执行耗时、内存峰值，以及draw语句的取样点数和出错点数"""
+    def __init__(self, index: int, statement: Dict):
+        self.index = index
+        self.line: Optional[int] = statement.get('line')
+        self.type: str = statement.get('type', '?')
+        self.summary = describe_statement(statement)
+        self.seconds = 0.0
+        self.peak_bytes = 0
+        # 语句内各阶段的耗时，如 evaluate、drawer
+        self.stages: Dict[str, float] = {}
+        self.samples = 0
+        self.errors = 0
+        self.cache_hits = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'index': self.index,
+            'line': self.line,
+            'type': self.type,
+            'statement': self.summary,
+            'seconds': self.seconds,
+            'peak_bytes': self.peak_bytes,
+            'stages': dict(self.stages),
+            'samples': self.samples,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits
+        }
+
+
+def describe_statement(statement: Dict) -> str:
+    """语句的单行摘要，用于报告"""
+    statement_type = statement.get('type', '?')
+    if statement_type == 'draw':
+        if 'x_expression' in statement:
+            text = f"draw ({statement['x_expression']}, {statement['y_expression']})"
+        else:
+            text = f"draw {statement.get('expression')}"
+        if statement.get('color'):
+            text += f" with {statement['color']}"
+    elif statement_type == 'param':
+        text = f"param {statement.get('name')} from {statement.get('min')} to {statement.get('max')}"
+    elif statement_type in ('assign', 'const', 'function'):
+        prefix = '' if statement_type == 'assign' else f"{statement_type} "
+        text = f"{prefix}{statement.get('name')} = {statement.get('expression')}"
+    elif statement_type == 'save':
+        text = f"save {statement.get('path')}"
+    else:
+        text = statement_type
+    return text if len(text) <= SUMMARY_WIDTH else text[:SUMMARY_WIDTH - 3] + '...'
+
+
+def format_bytes(size: int) -> str:
+    """把字节数格式化为便于阅读的形式"""
+    value = float(size)
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == 'B' else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}GB"
+
+
+class Profiler:
+    """记录各阶段和每条语句的耗时与内存峰值
+    
+    耗时使用perf_counter；trace_memory为True时用tracemalloc记录内存峰值，
+    峰值是相对于进入该阶段或语句时已分配内存的增量，NumPy数组的分配也被计入。
+    阶段和语句可以嵌套，内层的峰值会并入外层。tracemalloc会明显拖慢纯Python代码，
+    只关心耗时的时候可以关闭。
+    """
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, StageProfile] = {}
+        self.statements: List[StatementProfile] = []
+        self.current: Optional[StatementProfile] = None
+        self._frames: List[_Frame] = []
+        self._started_tracing = False
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+    
+    def _enter(self) -> _Frame:
+        memory = 0
+        if self.trace_memory:
+            memory, peak = tracemalloc.get_traced_memory()
+            if self._frames:
+                # 把外层到目前为止的峰值记下，再重置峰值单独测量内层
+                outer = self._frames[-1]
+                outer.peak = max(outer.peak, peak - outer.memory)
+            tracemalloc.reset_peak()
+        frame = _Frame(memory)
+        self._frames.append(frame)
+        return frame
+    
+    def _exit(self, frame: _Frame) -> float:
+        """结束计时，返回耗时；frame.peak为该阶段的内存峰值增量"""
+        seconds = time.perf_counter() - frame.started
+        self._frames.pop()
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            frame.peak = max(frame.peak, peak - frame.memory)
+            if self._frames:
+                outer = self._frames[-1]
+                outer.peak = max(outer.peak, frame.peak + frame.memory - outer.memory)
+        return seconds
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """对一个阶段计时，同名阶段的耗时累加，内存峰值取最大值"""
+        frame = self._enter()
+        try:
+            yield
+        finally:
+            seconds = self._exit(frame)
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = StageProfile(name)
+            stage.seconds += seconds
+            stage.calls += 1
+            stage.peak_bytes = max(stage.peak_bytes, frame.peak)
+            if self.current is not None:
+                self.current.stages[name] = self.current.stages.get(name, 0.0) + seconds
+    
+    @contextmanager
+    def statement(self, statement: Dict) -> Iterator[StatementProfile]:
+        """对一条语句计时，语句内的阶段耗时和取样统计记在这条语句上"""
+        record = StatementProfile(len(self.statements) + 1, statement)
+        self.statements.append(record)
+        outer = self.current
+        self.current = record
+        frame = self._enter()
+        try:
+            yield record
+        finally:
+            record.seconds = self._exit(frame)
+            record.peak_bytes = frame.peak
+            self.current = outer
+    
+    def count_samples(self, total: int, valid: int):
+        """记录当前语句的取样点数和其中计算出错（定义域之外、非有限值）的点数"""
+        if self.current is not None:
+            self.current.samples += total
+            self.current.errors += total - valid
+    
+    def count_cache_hit(self, points: int, errors: int = 0):
+        """记录当前语句从曲线结果缓存读取的曲线，errors为其中的无效点数"""
+        if self.current is not None:
+            self.current.cache_hits += 1
+            self.current.samples += points
+            self.current.errors += errors
+    
+    def finish(self):
+        """结束记录，停止由本对象开启的tracemalloc"""
+        if self.finished is None:
+            self.finished = time.perf_counter()
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+    
+    @property
+    def total_seconds(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format': PROFILE_FORMAT_VERSION,
+            'total_seconds': self.total_seconds,
+            'trace_memory': self.trace_memory,
+            'stages': [stage.to_dict() for stage in self.stages.values()],
+            'statements': [record.to_dict() for record in self.statements]
+        }
+    
+    def write_json(self, file_path: str):
+        """把结果写入JSON文件"""
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+        logger.debug("性能分析结果已写入 %s", file_path)
+    
+    def report(self) -> str:
+        """生成按阶段和按语句的文本报告"""
+        memory = self.trace_memory
+        lines = [f"性能分析: 总耗时 {self.total_seconds * 1000:.1f}ms", "", "阶段"]
+        columns = [('名称', 14, '<'), ('次数', 6, '>'), ('耗时(ms)', 10, '>')] + ([('内存峰值', 10, '>')] if memory else [])
+        lines.append(_table_row([name for name, _, _ in columns], columns))
+        for stage in sorted(self.stages.values(), key=lambda stage: stage.seconds, reverse=True):
+            cells = [stage.name, str(stage.calls), f"{stage.seconds * 1000:.2f}"]
+            if memory:
+                cells.append(format_bytes(stage.peak_bytes))
+            lines.append(_table_row(cells, columns))
+        
+        lines += ["", "语句"]
+        columns = [('行号', 4, '>'), ('语句', SUMMARY_WIDTH, '<'), ('耗时(ms)', 10, '>'),
+                   ('计算(ms)', 10, '>'), ('绘图(ms)', 10, '>')]
+        if memory:
+            columns.append(('内存峰值', 10, '>'))
+        columns += [('取样点', 10, '>'), ('出错点', 10, '>')]
+        lines.append(_table_row([name for name, _, _ in columns], columns))
+        for record in self.statements:
+            cells = ['-' if record.line is None else str(record.line), record.summary,
+                     f"{record.seconds * 1000:.2f}", f"{record.stages.get('evaluate', 0.0) * 1000:.2f}",
+                     f"{record.stages.get('drawer', 0.0) * 1000:.2f}"]
+            if memory:
+                cells.append(format_bytes(record.peak_bytes))
+            if record.type == 'draw':
+                cells += [str(record.samples), str(record.errors)]
+            line = _table_row(cells, columns)
+            if record.cache_hits:
+                line += f"  （{record.cache_hits} 条曲线来自缓存）"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def _display_width(text: str) -> int:
+    """文本在终端中占用的列数，中文等全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1 for char in text)
+
+
+def _table_row(cells: List[str], columns: List[Tuple[str, int, str]]) -> str:
+    """按列宽和对齐方式拼接一行表格，cells可以比columns少"""
+    parts = []
+    for cell, (_, width, align) in zip(cells, columns):
+        padding = ' ' * max(width - _display_width(cell), 0)
+        parts.append(cell + padding if align == '<' else padding + cell)
+    return '  ' + '  '.join(parts).rstrip()
@@ -0,0 +1,284 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional, Set, Tuple
+import os
+import threading
+from .parser.expression import Expression, free_variables, function_calls
+from .evaluator.result_cache import CurveCache
+from .tracing import get_logger
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+
+logger = get_logger('interpreter')
+
+# 支持的执行器类型
+EXECUTORS = ('thread', 'process')
+
+# 只改变图像、在程序顺序中回放的语句
+RENDER_STATEMENTS = ('show', 'clear', 'save')
+
+# 依赖图中的伪资源：参数集合，以及未知语句充当的屏障
+PARAMS_RESOURCE = '@params'
+BARRIER_RESOURCE = '@barrier'
+
+
+def function_resource(name: str) -> str:
+    """自定义函数定义对应的资源名，与同名变量的取值区分开"""
+    return f'function:{name}'
+
+
+class StatementNode:
+    """依赖图中的一个语句"""
+    def __init__(self, index: int, statement: Dict, reads: FrozenSet[str], writes: FrozenSet[str],
+                 idempotent_writes: FrozenSet[str]):
+        self.index = index
+        self.statement = statement
+        self.reads = reads
+        self.writes = writes
+        # draw语句把参数变量设为最后一个取样值，同一范围上重复写入的值相同，相互之间不必排序
+        self.idempotent_writes = idempotent_writes
+        self.predecessors: Set[int] = set()
+        self.level = 0
+
+
+class DependencyAnalyzer:
+    """按程序顺序分析每个语句读写的变量、常量、参数和函数"""
+    def __init__(self):
+        # 已定义的函数及其函数体（递归展开后）读取的变量
+        self.function_reads: Dict[str, FrozenSet[str]] = {}
+        self.params: Set[str] = set()
+    
+    def _expression_reads(self, expression: Any) -> Set[str]:
+        """表达式计算时读取的资源，对自定义函数的引用展开为函数体的读取"""
+        reads: Set[str] = {BARRIER_RESOURCE}
+        if not isinstance(expression, Expression):
+            return reads
+        for name in free_variables(expression):
+            reads.add(name)
+            reads.add(function_resource(name))
+            reads |= self.function_reads.get(name, frozenset())
+        for name in function_calls(expression):
+            reads.add(function_resource(name))
+            reads |= self.function_reads.get(name, frozenset())
+        return reads
+    
+    def effects(self, statement: Dict) -> Tuple[Set[str], Set[str], Set[str]]:
+        """返回语句的 (读取, 写入, 幂等写入) 资源集合"""
+        statement_type = statement.get('type')
+        if statement_type == 'param':
+            reads: Set[str] = {BARRIER_RESOURCE}
+            for key in ('min', 'max', 'step'):
+                reads |= self._expression_reads(statement.get(key))
+            self.params.add(statement['name'])
+            return reads, {statement['name'], PARAMS_RESOURCE}, set()
+        if statement_type in ('assign', 'const'):
+            return self._expression_reads(statement['expression']), {statement['name']}, set()
+        if statement_type == 'function':
+            body_reads = self._expression_reads(statement['expression'])
+            self.function_reads[statement['name']] = frozenset(body_reads)
+            return {BARRIER_RESOURCE}, {function_resource(statement['name'])}, set()
+        if statement_type == 'draw':
+            reads = {PARAMS_RESOURCE}
+            for key in ('expression', 'x_expression', 'y_expression'):
+                if key in statement:
+                    reads |= self._expression_reads(statement[key])
+            if len(self.params) == 1:
+                # 只有一个参数时，参数变量总是被取样网格代替，不读取它的当前值
+                reads -= self.params
+            return reads, set(), set(self.params)
+        if statement_type in RENDER_STATEMENTS:
+            return set(), set(), set()
+        # 未知语句在执行时报错，让它排在所有语句之间
+        return {BARRIER_RESOURCE}, {BARRIER_RESOURCE}, set()
+
+
+def build_dependency_graph(statements: List[Dict]) -> List[StatementNode]:
+    """按读写关系（写后读、读后写、写后写）建立语句之间的依赖边"""
+    analyzer = DependencyAnalyzer()
+    nodes: List[StatementNode] = []
+    # 每个资源最近的写入者；幂等写入者可以有多个
+    writers: Dict[str, List[int]] = {}
+    idempotent: Dict[str, bool] = {}
+    # 每个资源在最近一次写入之后的读取者
+    readers: Dict[str, List[int]] = {}
+    
+    for index, statement in enumerate(statements):
+        reads, writes, idempotent_writes = analyzer.effects(statement)
+        node = StatementNode(index, statement, frozenset(reads), frozenset(writes), frozenset(idempotent_writes))
+        
+        for resource in reads:
+            node.predecessors.update(writers.get(resource, ()))
+        for resource in writes:
+            node.predecessors.update(readers.get(resource, ()))
+        for resource in writes:
+            node.predecessors.update(writers.get(resource, ()))
+            writers[resource] = [index]
+            idempotent[resource] = False
+            readers[resource] = []
+        for resource in idempotent_writes:
+            if idempotent.get(resource):
+                # 之前的读取者读到的已经是同样的值
+                writers[resource].append(index)
+            else:
+                node.predecessors.update(readers.get(resource, ()))
+                node.predecessors.update(writers.get(resource, ()))
+                writers[resource] = [index]
+                idempotent[resource] = True
+        for resource in reads:
+            readers.setdefault(resource, []).append(index)
+        
+        node.predecessors.discard(index)
+        node.level = max((nodes[i].level + 1 for i in node.predecessors), default=0)
+        nodes.append(node)
+    
+    return nodes
+
+
+def topological_waves(nodes: List[StatementNode]) -> List[List[StatementNode]]:
+    """按依赖深度把语句分组，同一组内的语句互不依赖，组内保持程序顺序"""
+    waves: List[List[StatementNode]] = []
+    for node in nodes:
+        while len(waves) <= node.level:
+            waves.append([])
+        waves[node.level].append(node)
+    return waves
+
+
+# 每个工作线程（或进程）复用一个只用于计算的解释器，编译缓存可以跨任务复用
+_worker_local = threading.local()
+
+
+def _worker_interpreter():
+    interpreter = getattr(_worker_local, 'interpreter', None)
+    if interpreter is None:
+        from .interpreter import Interpreter
+        # 状态在每个任务开始时整体替换，公共子表达式缓存也随之清空
+        interpreter = Interpreter(headless=True)
+        _worker_local.interpreter = interpreter
+    return interpreter
+
+
+def evaluate_draw_task(state: Dict[str, Any], statement: Dict, options: Dict[str, Any]):
+    """在工作线程或进程中计算一条draw语句，返回取样结果、语句结束时各参数变量的值和曲线缓存的命中次数"""
+    interpreter = _worker_interpreter()
+    interpreter.restore_state(state)
+    interpreter.vectorized = options['vectorized']
+    interpreter.streaming = options['streaming']
+    interpreter.chunk_size = options['chunk_size']
+    interpreter.prune = options['prune']
+    interpreter.decimation = options['decimation']
+    interpreter.cse = options['cse']
+    # 不同语句在不同的工作者中计算，只能复用同一条语句内（如参数方程的x和y之间）共用的子表达式
+    interpreter.plan_subexpressions([statement])
+    cache = options['curve_cache']
+    if cache is None:
+        interpreter.curve_cache = None
+    elif interpreter.curve_cache is None or interpreter.curve_cache.directory != cache[0]:
+        interpreter.curve_cache = CurveCache(*cache)
+    hits, misses = (interpreter.curve_cache.hits, interpreter.curve_cache.misses) if cache else (0, 0)
+    
+    curves = interpreter.evaluate_draw_statement(statement)
+    param_values = {name: interpreter.variables[name] for name in state['param_ranges'] if name in interpreter.variables}
+    if cache:
+        # 工作者中的命中统计交回主解释器汇总
+        hits, misses = interpreter.curve_cache.hits - hits, interpreter.curve_cache.misses - misses
+    return curves, param_values, (hits, misses)
+
+
+class StatementScheduler:
+    """按依赖图并发执行语句
+    
+    参数、赋值、常量和函数定义在主线程中按波次执行；同一波次中互不依赖的draw语句
+    提交给线程池或进程池并发计算，每个任务带上提交时解释器状态的快照。
+    计算结果和show、clear、save按程序顺序回放到图像上，因此输出与逐条执行相同。
+    """
+    def __init__(self, interpreter, workers: Optional[int] = None, executor: str = 'thread'):
+        if executor not in EXECUTORS:
+            raise ValueError(f"未知的执行器: {executor}，支持的执行器: {', '.join(EXECUTORS)}")
+        self.interpreter = interpreter
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+    
+    def _create_executor(self) -> Executor:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        if self.executor == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='function_painter')
+    
+    def run(self, statements: List[Dict]):
+        """执行语句列表"""
+        nodes = build_dependency_graph(statements)
+        waves = topological_waves(nodes)
+        logger.debug("依赖图: %s 条语句，%s 个波次，使用 %s 个%s工作者",
+                     len(nodes), len(waves), self.workers, '进程' if self.executor == 'process' else '线程')
+        
+        interpreter = self.interpreter
+        options = {
+            'vectorized': interpreter.vectorized,
+            'streaming': interpreter.streaming,
+            'chunk_size': interpreter.chunk_size,
+            'prune': interpreter.prune,
+            'decimation': interpreter.decimation,
+            'cse': interpreter.cse,
+            'curve_cache': (interpreter.curve_cache.directory, interpreter.curve_cache.max_bytes)
+            if interpreter.curve_cache is not None else None
+        }
+        results: Dict[int, Any] = {}
+        # 出错时，程序顺序中更早的语句照常执行和回放，出错位置之后的都不再执行
+        failed_index = len(statements)
+        failure: Optional[BaseException] = None
+        render_index = 0
+        
+        with self._create_executor() as pool:
+            for wave in waves:
+                futures: List[Tuple[int, Future]] = []
+                for node in wave:
+                    if node.index >= failed_index:
+                        break
+                    statement_type = node.statement.get('type')
+                    if statement_type in RENDER_STATEMENTS:
+                        continue
+                    if statement_type == 'draw':
+                        future = pool.submit(evaluate_draw_task, interpreter.snapshot_state(), node.statement, options)
+                        futures.append((node.index, future))
+                        continue
+                    try:
+                        interpreter.execute_statement(node.statement)
+                    except Exception as e:
+                        failed_index, failure = node.index, e
+                        break
+                
+                for index, future in futures:
+                    try:
+                        curves, param_values, (hits, misses) = future.result()
+                    except Exception as e:
+                        if index < failed_index:
+                            failed_index, failure = index, e
+                        continue
+                    results[index] = curves
+                    interpreter.variables.update(param_values)
+                    if interpreter.curve_cache is not None:
+                        interpreter.curve_cache.hits += hits
+                        interpreter.curve_cache.misses += misses
+                
+                render_index = self._replay(statements, render_index, failed_index, results)
+        
+        self._replay(statements, render_index, failed_index, results)
+        if failure is not None:
+            raise failure
+    
+    def _replay(self, statements: List[Dict], start: int, stop: int, results: Dict[int, Any]) -> int:
+        """按程序顺序把已经完成的draw结果和图像语句回放到图像上，返回下一个待回放的位置"""
+        index = start
+        while index < stop:
+            statement = statements[index]
+            statement_type = statement.get('type')
+            if statement_type == 'draw':
+                if index not in results:
+                    break
+                self.interpreter.render_draw_statement(statement, results.pop(index))
+            elif statement_type in RENDER_STATEMENTS:
+                self.interpreter.execute_statement(statement)
+            index += 1
+        return index
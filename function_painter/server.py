@@ -0,0 +1,410 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from function_painter.drawer.decimation import DECIMATION_METHODS
+from function_painter.tracing import configure_logging, get_logger
+
+
+logger = get_logger('interpreter')
+
+# 默认监听地址，只接受本机连接
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# 每个请求的默认时限（秒）和取样点数预算
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_POINT_BUDGET = 2_000_000
+# 请求中脚本的最大字节数
+DEFAULT_MAX_SCRIPT_BYTES = 1 << 20
+# 等待工作进程启动完成的时限（秒）
+WORKER_START_TIMEOUT = 60.0
+
+# 服务可以返回的图像格式及其Content-Type
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf'
+}
+
+# 工作进程返回的状态及对应的HTTP状态码
+STATUS_CODES = {
+    'ok': 200,
+    'error': 400,
+    'limit': 422
+}
+
+
+class RenderTimeout(Exception):
+    """渲染超过了请求的时限"""
+
+
+class WorkerUnavailable(Exception):
+    """在时限内没有空闲的工作进程，或者工作进程意外退出"""
+
+
+def _worker_main(connection, options: Dict[str, Any]):
+    """工作进程：预先导入依赖并创建绘图器，之后循环处理渲染请求
+    
+    每个请求使用全新的Interpreter，变量等状态互不影响；绘图器在请求之间重置后复用。
+    请求为 (脚本, 格式, 取样点预算)，回复为 (状态, 图像字节或错误信息)，收到None时退出。
+    """
+    from function_painter.drawer import Drawer
+    from function_painter.exception.exception import FunctionPainterException, ResourceLimitError
+    from function_painter.interpreter import Interpreter
+    
+    drawer = Drawer(headless=True, decimation=options.get('decimation'))
+    # 渲染一次空白图像，加载字体和后端，使第一个请求也不必付出这些开销
+    drawer.render('png')
+    drawer.reset()
+    connection.send(('ready', os.getpid()))
+    
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        script, file_format, point_budget = request
+        try:
+            interpreter = Interpreter(drawer=drawer, point_budget=point_budget, allow_save=False, **options)
+            interpreter.interpret(script)
+            reply = ('ok', drawer.render(file_format))
+        except ResourceLimitError as e:
+            reply = ('limit', str(e))
+        except FunctionPainterException as e:
+            reply = ('error', str(e))
+        except Exception as e:
+            reply = ('error', f"执行错误: {e}")
+        finally:
+            drawer.reset()
+        connection.send(reply)
+
+
+def _multiprocessing_context():
+    """工作进程的启动方式
+    
+    服务在多个线程中处理请求，从多线程进程直接fork可能继承其他线程持有的锁，
+    因此优先使用forkserver，并在forkserver中预先导入matplotlib，新的工作进程启动很快；
+    不支持forkserver的平台使用spawn。
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['function_painter.drawer.drawer', 'function_painter.interpreter'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class RenderWorker:
+    """一个常驻的工作进程及与它通信的管道"""
+    def __init__(self, context, options: Dict[str, Any]):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_connection, options), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.ready = False
+    
+    def wait_ready(self, timeout: float) -> bool:
+        """等待工作进程完成预热"""
+        if not self.ready and self.connection.poll(timeout):
+            try:
+                self.ready = self.connection.recv()[0] == 'ready'
+            except (EOFError, OSError):
+                return False
+        return self.ready
+    
+    def render(self, script: str, file_format: str, point_budget: Optional[int], timeout: float) -> Tuple[str, Any]:
+        """把请求交给工作进程并等待回复，超时时抛出RenderTimeout"""
+        try:
+            self.connection.send((script, file_format, point_budget))
+            if not self.connection.poll(timeout):
+                raise RenderTimeout(f"渲染超过时限 {timeout:g} 秒")
+            return self.connection.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerUnavailable(f"工作进程意外退出: {e}") from e
+    
+    def kill(self):
+        """立即结束工作进程"""
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+    
+    def close(self, timeout: float = 1.0):
+        """通知工作进程退出，超时仍未退出时结束它"""
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class WorkerPool:
+    """预热好的工作进程池
+    
+    每个请求独占一个工作进程；请求超时或工作进程崩溃时结束该进程，并立即启动一个新的进程补充到池中，
+    一个失控的脚本不会影响其他请求。
+    """
+    def __init__(self, size: int, options: Optional[Dict[str, Any]] = None):
+        self.size = size
+        self.options = dict(options or {})
+        self.context = _multiprocessing_context()
+        self.idle: 'queue.Queue[RenderWorker]' = queue.Queue()
+        self.workers = [RenderWorker(self.context, self.options) for _ in range(size)]
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.lock = threading.Lock()
+        self.restarts = 0
+    
+    def wait_ready(self, timeout: float = WORKER_START_TIMEOUT) -> int:
+        """等待所有工作进程完成预热，返回已就绪的数量"""
+        deadline = time.monotonic() + timeout
+        return sum(worker.wait_ready(max(deadline - time.monotonic(), 0)) for worker in list(self.workers))
+    
+    def _replace(self, worker: RenderWorker) -> RenderWorker:
+        """结束出问题的工作进程，换成新的"""
+        worker.kill()
+        replacement = RenderWorker(self.context, self.options)
+        with self.lock:
+            self.workers[self.workers.index(worker)] = replacement
+            self.restarts += 1
+        logger.warning("工作进程 %s 已被结束，启动新的工作进程 %s", worker.process.pid, replacement.process.pid)
+        return replacement
+    
+    def render(self, script: str, file_format: str, point_budget: Optional[int], timeout: float) -> Tuple[str, Any]:
+        """取出一个空闲的工作进程渲染脚本，时限包括等待空闲进程的时间"""
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise WorkerUnavailable(f"{timeout:g} 秒内没有空闲的工作进程")
+        try:
+            if not worker.wait_ready(max(deadline - time.monotonic(), 0)):
+                # 刚替换的进程可能还在预热，只有已经退出的进程才需要再次替换
+                if not worker.process.is_alive():
+                    worker = self._replace(worker)
+                raise WorkerUnavailable("工作进程尚未启动完成")
+            try:
+                return worker.render(script, file_format, point_budget, max(deadline - time.monotonic(), 0))
+            except RenderTimeout as e:
+                worker = self._replace(worker)
+                raise RenderTimeout(f"渲染超过时限 {timeout:g} 秒") from e
+            except BaseException:
+                # 请求可能已经发出，管道中还留着没有读取的回复，这个进程不能再交给下一个请求
+                worker = self._replace(worker)
+                raise
+        finally:
+            self.idle.put(worker)
+    
+    def close(self):
+        for worker in list(self.workers):
+            worker.close()
+
+
+class RenderServer(ThreadingHTTPServer):
+    """本机渲染服务
+    
+    POST /render 的请求体为UTF-8编码的脚本，查询参数format（png、svg或pdf，默认png）、
+    timeout（秒）和max_points可以在服务的上限之内进一步收紧；成功时返回图像，
+    脚本有错误时返回400，超出取样点预算时返回422，超时返回504，没有可用的工作进程时返回503，
+    错误信息为纯文本。GET /health 返回工作进程和请求的统计信息。
+    """
+    daemon_threads = True
+    
+    def __init__(self, address: Tuple[str, int], pool: WorkerPool, timeout: float = DEFAULT_TIMEOUT,
+                 point_budget: Optional[int] = DEFAULT_POINT_BUDGET, max_script_bytes: int = DEFAULT_MAX_SCRIPT_BYTES):
+        super().__init__(address, RenderRequestHandler)
+        self.pool = pool
+        self.render_timeout = timeout
+        self.point_budget = point_budget
+        self.max_script_bytes = max_script_bytes
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'succeeded': 0, 'failed': 0, 'timeouts': 0}
+    
+    def count(self, name: str):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """处理渲染请求"""
+    server: RenderServer
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format: str, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+    
+    def _send(self, status: int, body: bytes, content_type: str = 'text/plain; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_error_text(self, status: int, message: str):
+        self._send(status, message.encode('utf-8'))
+    
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self._send_error_text(404, "未知的路径")
+            return
+        pool = self.server.pool
+        with self.server.stats_lock:
+            health = dict(self.server.stats)
+        health.update({'workers': pool.size, 'idle': pool.idle.qsize(), 'restarts': pool.restarts})
+        self._send(200, json.dumps(health).encode('utf-8'), 'application/json')
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/render':
+            self._send_error_text(404, "未知的路径")
+            return
+        server = self.server
+        server.count('requests')
+        try:
+            file_format, timeout, point_budget = self._options(parse_qs(url.query))
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError as e:
+            server.count('failed')
+            self._send_error_text(400, str(e) or "缺少Content-Length")
+            return
+        if length > server.max_script_bytes:
+            server.count('failed')
+            # 不读取过大的请求体，直接关闭连接
+            self.close_connection = True
+            self._send_error_text(413, f"脚本超过 {server.max_script_bytes} 字节")
+            return
+        try:
+            script = self.rfile.read(length).decode('utf-8')
+        except UnicodeDecodeError:
+            server.count('failed')
+            self._send_error_text(400, "脚本必须是UTF-8编码")
+            return
+        
+        started = time.perf_counter()
+        try:
+            status, payload = server.pool.render(script, file_format, point_budget, timeout)
+        except RenderTimeout as e:
+            server.count('timeouts')
+            self._send_error_text(504, str(e))
+            return
+        except WorkerUnavailable as e:
+            server.count('failed')
+            self._send_error_text(503, str(e))
+            return
+        except Exception as e:
+            # 出错的工作进程已经被替换，向客户端报告错误而不是直接断开连接
+            logger.exception("渲染请求处理失败")
+            server.count('failed')
+            self._send_error_text(500, f"服务内部错误: {e}")
+            return
+        logger.debug("渲染完成，状态: %s，用时 %.0fms", status, (time.perf_counter() - started) * 1000)
+        if status == 'ok':
+            server.count('succeeded')
+            self._send(200, payload, CONTENT_TYPES[file_format])
+        else:
+            server.count('failed')
+            self._send_error_text(STATUS_CODES.get(status, 500), payload)
+    
+    def _options(self, query: Dict[str, list]) -> Tuple[str, float, Optional[int]]:
+        """解析查询参数，客户端只能收紧而不能放宽服务的时限和取样点预算"""
+        server = self.server
+        file_format = query.get('format', ['png'])[0].lower()
+        if file_format not in CONTENT_TYPES:
+            raise ValueError(f"不支持的图像格式: {file_format}，支持的格式: {', '.join(CONTENT_TYPES)}")
+        timeout = server.render_timeout
+        if 'timeout' in query:
+            requested = _parse_query_value(query, 'timeout', float)
+            # min(nan, x)返回nan，必须先排除非有限值
+            if not math.isfinite(requested) or requested <= 0:
+                raise ValueError("timeout必须是大于0的有限数")
+            timeout = min(requested, timeout)
+        point_budget = server.point_budget
+        if 'max_points' in query:
+            requested = _parse_query_value(query, 'max_points', int)
+            if requested <= 0:
+                raise ValueError("max_points必须大于0")
+            point_budget = requested if point_budget is None else min(requested, point_budget)
+        return file_format, timeout, point_budget
+
+
+def _parse_query_value(query: Dict[str, list], name: str, value_type: type):
+    """把查询参数转换为数值，无法转换时抛出带参数名的ValueError"""
+    text = query[name][0]
+    try:
+        return value_type(text)
+    except ValueError:
+        raise ValueError(f"{name}的取值无效: {text}") from None
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="python -m function_painter.server",
+        description="Function Painter 本机渲染服务：POST /render 提交脚本，返回PNG/SVG/PDF图像"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help="监听地址（默认: %(default)s，只接受本机连接）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="监听端口（默认: %(default)s）")
+    parser.add_argument("-w", "--workers", type=int, default=max(os.cpu_count() or 1, 1), metavar="N",
+                        help="预热的工作进程数量（默认: CPU核心数）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, metavar="秒",
+                        help="每个请求的时限，超时的工作进程被结束并替换（默认: %(default)g）")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_POINT_BUDGET, metavar="点数",
+                        help="每个请求所有draw语句的取样点数上限，0表示不限制（默认: %(default)s）")
+    parser.add_argument("--max-script-bytes", type=int, default=DEFAULT_MAX_SCRIPT_BYTES, metavar="字节",
+                        help="请求中脚本的最大字节数（默认: %(default)s）")
+    parser.add_argument("--decimate", choices=DECIMATION_METHODS + ("none",), default="minmax",
+                        help="交给matplotlib之前的抽稀方法（默认: %(default)s）")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="输出每个请求的日志")
+    return parser
+
+
+def main():
+    """启动渲染服务，直到按Ctrl+C"""
+    import logging
+    arg_parser = build_argument_parser()
+    args = arg_parser.parse_args()
+    if args.workers <= 0:
+        arg_parser.error("--workers必须大于0")
+    if args.timeout <= 0:
+        arg_parser.error("--timeout必须大于0")
+    if args.max_points < 0:
+        arg_parser.error("--max-points不能为负数")
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING)
+    
+    options = {'decimation': None if args.decimate == "none" else args.decimate}
+    pool = WorkerPool(args.workers, options)
+    try:
+        ready = pool.wait_ready()
+        server = RenderServer((args.host, args.port), pool, timeout=args.timeout,
+                              point_budget=args.max_points or None, max_script_bytes=args.max_script_bytes)
+        print(f"渲染服务已启动: http://{args.host}:{server.server_address[1]}/render，"
+              f"{ready}/{args.workers} 个工作进程就绪，按Ctrl+C退出")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n渲染服务已停止")
+        finally:
+            server.server_close()
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import logging
+from typing import Iterable, Optional
+
+
+# 比DEBUG更详细的级别，用于逐字符、逐点这类高频输出
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+# 所有组件日志记录器的公共父记录器
+ROOT_LOGGER_NAME = 'function_painter'
+
+# 支持单独开启的组件
+COMPONENTS = ('lexer', 'parser', 'interpreter', 'drawer')
+
+# 作为库使用时默认不输出任何内容，由调用方决定如何配置日志
+logging.getLogger(ROOT_LOGGER_NAME).addHandler(logging.NullHandler())
+
+
+def get_logger(component: str) -> logging.Logger:
+    """获取组件的日志记录器，例如get_logger('lexer')"""
+    return logging.getLogger(f'{ROOT_LOGGER_NAME}.{component}')
+
+
+def configure_logging(level: int = logging.WARNING, trace_components: Optional[Iterable[str]] = None):
+    """配置命令行使用时的日志输出
+    
+    level为所有组件的日志级别，trace_components中列出的组件额外开启TRACE级别。
+    """
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    for handler in list(root.handlers):
+        if not isinstance(handler, logging.NullHandler):
+            root.removeHandler(handler)
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(levelname)s [%(name)s] %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(level)
+    
+    for component in COMPONENTS:
+        get_logger(component).setLevel(logging.NOTSET)
+    for component in trace_components or ():
+        get_logger(component).setLevel(TRACE)
@@ -0,0 +1,162 @@
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import os
+import time
+from .tracing import get_logger
+
+
+logger = get_logger('interpreter')
+
+# 默认的文件检查间隔（秒）
+DEFAULT_WATCH_INTERVAL = 0.5
+
+
+class FileWatcher:
+    """按修改时间和大小轮询检查文件是否变化"""
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.stamp = self._stamp()
+    
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def changed(self) -> bool:
+        """自上次检查以来文件是否变化；文件暂时不存在（有的编辑器先删除再写入）时等到它重新出现"""
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        return stamp is not None
+
+
+class DrawRecord:
+    """watch模式中一条draw语句的计算结果和画出的曲线"""
+    def __init__(self, key: Tuple, statement: Dict, curves: List, param_values: Dict[str, float]):
+        self.key = key
+        self.statement = statement
+        self.curves = curves
+        # 语句执行结束时各参数变量的值，复用这条语句时同样写回解释器
+        self.param_values = param_values
+        # 尚未画到图像上时为None
+        self.lines: Optional[List[Any]] = None
+
+
+class WatchSession:
+    """监视源文件，文件变化时增量地重新执行，解释器和图像在整个过程中保持不变
+    
+    每次变化后从执行前的状态重新执行参数、赋值、常量和函数定义，这些语句只计算标量，代价很小；
+    每条draw语句按颜色和它在各参数上的曲线内容签名（表达式、取样范围、读取的变量取值）生成键。
+    键与上一次执行中的某条draw语句相同时直接保留它的曲线，既不重新计算也不重新绘制，
+    因此只有改变了的draw语句，以及读取了被修改的参数、变量、常量或函数的draw语句才会重新计算。
+    新的曲线加入图像，不再存在的曲线从图像中移除，其余曲线原地更新编号、颜色和图例。
+    源文件有错误时报告错误并保留上一次的图像。
+    """
+    def __init__(self, interpreter, file_path: str, output: Optional[str] = None,
+                 interval: float = DEFAULT_WATCH_INTERVAL, report: Optional[Callable[[str], None]] = None):
+        self.interpreter = interpreter
+        self.file_path = file_path
+        self.output = output
+        self.interval = interval
+        self.report = report or logger.warning
+        self.watcher = FileWatcher(file_path)
+        # 执行前的解释器状态，每次重新执行都从这里开始
+        self.initial_state = interpreter.snapshot_state()
+        self.records: List[DrawRecord] = []
+        self.generation = 0
+    
+    def run(self):
+        """执行一次，然后持续监视源文件，直到图像窗口被关闭"""
+        self.update()
+        drawer = self.interpreter.drawer
+        drawer.show_window()
+        self.report(f"正在监视 {self.file_path}，按Ctrl+C退出")
+        while drawer.wait(self.interval):
+            if self.watcher.changed():
+                self.update()
+    
+    def update(self) -> bool:
+        """重新读取并增量执行源文件，成功时返回True，出错时保留上一次的图像并返回False"""
+        started = time.perf_counter()
+        self.generation += 1
+        interpreter = self.interpreter
+        previous: Dict[Tuple, Deque[DrawRecord]] = {}
+        for record in self.records:
+            previous.setdefault(record.key, deque()).append(record)
+        
+        records: List[DrawRecord] = []
+        saves: List[Dict] = []
+        try:
+            statements = interpreter.load_file(self.file_path)
+            interpreter.restore_state(self.initial_state)
+            interpreter.plan_subexpressions(statements)
+            for statement in statements:
+                statement_type = statement.get('type')
+                if statement_type == 'draw':
+                    records.append(self._evaluate_draw(statement, previous))
+                elif statement_type == 'clear':
+                    # clear之前的曲线都不再显示
+                    records = []
+                elif statement_type == 'save':
+                    saves.append(statement)
+                elif statement_type != 'show':
+                    interpreter.execute_statement(statement)
+        except Exception as e:
+            self.report(f"第 {self.generation} 次执行出错，保留上一次的图像: {e}")
+            return False
+        
+        reused, evaluated, removed = self._apply(records)
+        try:
+            for statement in saves:
+                interpreter.execute_save_statement(statement)
+            if self.output:
+                interpreter.drawer.save_figure(self.output)
+        except Exception as e:
+            self.report(f"第 {self.generation} 次执行保存图像失败: {e}")
+        self.report(f"第 {self.generation} 次执行: 重新计算 {evaluated} 条draw语句，保留 {reused} 条，"
+                    f"移除 {removed} 条曲线，用时 {1000 * (time.perf_counter() - started):.0f}ms")
+        return True
+    
+    def _evaluate_draw(self, statement: Dict, previous: Dict[Tuple, Deque[DrawRecord]]) -> DrawRecord:
+        """计算一条draw语句，上一次执行中有相同键的语句时直接复用它的结果"""
+        interpreter = self.interpreter
+        key = (statement.get('color'),) + tuple(interpreter.curve_signature(statement, name)
+                                                for name in interpreter.param_ranges)
+        candidates = previous.get(key)
+        if candidates and interpreter.param_ranges:
+            record = candidates.popleft()
+            interpreter.variables.update(record.param_values)
+            return record
+        curves = interpreter.evaluate_draw_statement(statement)
+        param_values = {name: interpreter.variables[name] for name in interpreter.param_ranges}
+        return DrawRecord(key, statement, curves, param_values)
+    
+    def _apply(self, records: List[DrawRecord]) -> Tuple[int, int, int]:
+        """把新的执行结果应用到图像上，返回 (保留的语句数, 新画的语句数, 移除的曲线数)"""
+        interpreter = self.interpreter
+        drawer = interpreter.drawer
+        kept = {id(record) for record in records}
+        removed = 0
+        for record in self.records:
+            if id(record) not in kept:
+                for line in record.lines:
+                    drawer.remove_curve(line)
+                removed += len(record.lines)
+        
+        evaluated = 0
+        for record in records:
+            if record.lines is None:
+                record.lines = interpreter.render_draw_statement(record.statement, record.curves)
+                evaluated += 1
+        drawer.update_curves([(line, record.statement.get('color')) for record in records for line in record.lines])
+        
+        # 与逐条执行一致，plot_points按程序顺序保存未经流式抽稀的曲线
+        interpreter.plot_points = [(x_values, y_values) for record in records
+                                   for x_values, y_values, valid_points, _ in record.curves if valid_points is None]
+        interpreter.plot_colors = [record.statement.get('color') for record in records
+                                   for _, _, valid_points, _ in record.curves if valid_points is None]
+        self.records = records
+        return len(records) - evaluated, evaluated, removed
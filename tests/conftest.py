@@ -0,0 +1,58 @@
+import os
+import sys
+from typing import Callable, List, Tuple
+import pytest
+
+# 测试在没有图形界面的环境中运行，导入matplotlib之前选择不需要显示的后端
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+from function_painter.interpreter import Interpreter
+
+
+def pytest_configure(config):
+    # 测试环境通常没有中文字体，图例和标题中的中文字符缺少字形不影响测试
+    config.addinivalue_line('filterwarnings', r'ignore:Glyph \d+ .* missing from font:UserWarning')
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    """每个测试结束后关闭创建的图像，避免大量图像占用内存"""
+    yield
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+
+
+@pytest.fixture
+def run_script() -> Callable[..., Interpreter]:
+    """用无界面、不抽稀的解释器执行代码，返回解释器以便检查plot_points和变量"""
+    def run(code: str, **options) -> Interpreter:
+        options.setdefault('headless', True)
+        options.setdefault('decimation', None)
+        interpreter = Interpreter(**options)
+        interpreter.interpret(code)
+        return interpreter
+    return run
+
+
+def _same_points(expected: List[Tuple[np.ndarray, np.ndarray]], actual: List[Tuple[np.ndarray, np.ndarray]],
+                 nan_sign: bool = True):
+    """两组取样结果逐位相同，NaN的位置也必须一致；nan_sign为False时不区分NaN的符号位"""
+    assert len(actual) == len(expected)
+    for expected_values, actual_values in zip(expected, actual):
+        for expected_array, actual_array in zip(expected_values, actual_values):
+            assert actual_array.dtype == expected_array.dtype
+            if not nan_sign:
+                np.testing.assert_array_equal(np.isnan(actual_array), np.isnan(expected_array))
+                expected_array = np.where(np.isnan(expected_array), np.nan, expected_array)
+                actual_array = np.where(np.isnan(actual_array), np.nan, actual_array)
+            assert actual_array.tobytes() == expected_array.tobytes()
+
+
+@pytest.fixture
+def assert_same_points() -> Callable[..., None]:
+    return _same_points
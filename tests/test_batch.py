@@ -0,0 +1,96 @@
+import os
+import numpy as np
+import pytest
+from function_painter.batch import BatchRunner, expand_sources, is_batch, output_paths, summarize
+
+
+SCRIPTS = {
+    'wide.txt': "param t from -50 to 50 step 0.01\ndraw t * t, t with color\ndraw 100 * sin(t)\n",
+    'broken.txt': "param t from 0 to 1 step 0.1\ndraw t\ndraw t * undefined_name\n",
+    'circle.txt': "param t from 0 to 6.3 step 0.01\ndraw cos(t), sin(t)\n",
+    'log.txt': "param x from 0.01 to 5 step 0.01\ndraw log(x)\ndraw sqrt(x)\n",
+}
+
+
+@pytest.fixture
+def scripts(tmp_path):
+    directory = tmp_path / "scripts"
+    directory.mkdir()
+    for name, source in SCRIPTS.items():
+        (directory / name).write_text(source, encoding='utf-8')
+    return directory
+
+
+def read_image(path):
+    from matplotlib.image import imread
+    return imread(str(path))
+
+
+def test_output_paths_add_suffixes_for_duplicate_stems():
+    sources = [os.path.join('a', 'plot.txt'), os.path.join('b', 'plot.txt'), os.path.join('c', 'plot.fp'),
+               os.path.join('d', 'other.txt')]
+    assert output_paths(sources, 'out', 'png') == [
+        os.path.join('out', name) for name in ('plot.png', 'plot_2.png', 'plot_3.png', 'other.png')]
+    # 写在各自源文件旁边时不冲突，不加后缀
+    assert output_paths(sources, None, 'svg') == [
+        os.path.join('a', 'plot.svg'), os.path.join('b', 'plot.svg'), os.path.join('c', 'plot.svg'),
+        os.path.join('d', 'other.svg')]
+
+
+def test_output_paths_skip_names_already_taken():
+    sources = [os.path.join('a', 'plot_2.txt'), os.path.join('b', 'plot.txt'), os.path.join('c', 'plot.txt')]
+    assert output_paths(sources, 'out', 'png') == [
+        os.path.join('out', name) for name in ('plot_2.png', 'plot.png', 'plot_3.png')]
+
+
+def test_expand_sources(scripts):
+    (scripts / "notes.md").write_text("", encoding='utf-8')
+    (scripts / "nested").mkdir()
+    (scripts / "nested" / "inner.txt").write_text("", encoding='utf-8')
+    missing = str(scripts / "missing.txt")
+    sources = expand_sources([str(scripts / "log.txt"), str(scripts), missing])
+    names = [os.path.relpath(source, scripts) for source in sources]
+    # 目录不递归、按文件名排序，重复的文件只保留第一次出现，不存在的文件原样保留
+    assert names == ['log.txt', 'broken.txt', 'circle.txt', 'wide.txt', 'missing.txt']
+    recursive = expand_sources([str(scripts / "**" / "*.txt")])
+    assert os.path.join('nested', 'inner.txt') in [os.path.relpath(source, scripts) for source in recursive]
+
+
+def test_is_batch(scripts):
+    assert not is_batch([str(scripts / "log.txt")])
+    assert is_batch([str(scripts)])
+    assert is_batch([str(scripts / "*.txt")])
+    assert is_batch([str(scripts / "log.txt"), str(scripts / "circle.txt")])
+
+
+def test_failing_script_does_not_stop_batch(scripts, tmp_path):
+    messages = []
+    runner = BatchRunner({'decimation': None}, output_dir=str(tmp_path / "out"), report=messages.append)
+    results = runner.run(expand_sources([str(scripts)]) + [str(scripts / "missing.txt")])
+    assert [result.success for result in results] == [False, True, True, True, False]
+    assert "undefined_name" in results[0].error
+    for result in results:
+        assert os.path.exists(result.output) == result.success
+    assert messages[0].startswith("[1/5]") and "失败" in messages[0]
+    assert messages[1].startswith("[2/5]") and "->" in messages[1]
+    summary = summarize(results, 1.5)
+    assert summary.splitlines()[0] == "批量处理完成: 共 5 个脚本，成功 3 个，失败 2 个，用时 1.50s"
+    assert len(summary.splitlines()) == 3
+    # 所有脚本共用一个绘图器
+    assert runner.pool.created == 1 and runner.pool.reused == 4
+
+
+@pytest.mark.parametrize('decimation', [None, 'minmax'])
+def test_reused_drawer_renders_like_fresh_run(scripts, tmp_path, decimation):
+    order = ['wide.txt', 'broken.txt', 'circle.txt', 'log.txt']
+    batch = BatchRunner({'decimation': decimation}, output_dir=str(tmp_path / "batch"))
+    batch.run([str(scripts / name) for name in order])
+    for name in ('circle.txt', 'log.txt'):
+        fresh = BatchRunner({'decimation': decimation}, output_dir=str(tmp_path / "fresh" / name))
+        result, = fresh.run([str(scripts / name)])
+        assert fresh.pool.reused == 0
+        stem = os.path.splitext(name)[0]
+        expected = read_image(result.output)
+        actual = read_image(tmp_path / "batch" / f"{stem}.png")
+        assert actual.shape == expected.shape
+        assert np.array_equal(actual, expected)
@@ -0,0 +1,118 @@
+import json
+import subprocess
+import sys
+import pytest
+from conftest import ROOT
+from function_painter.checker import ProgramChecker
+from function_painter.exception import InterpreterError
+from function_painter.interpreter import Interpreter
+from function_painter.lexer import Lexer
+from function_painter.parser.parser import Parser
+
+
+# 在子进程中执行命令行入口，输出退出码和已经导入的numpy、matplotlib模块
+RUN_MAIN = """
+import json, runpy, sys
+sys.argv = ['function_painter'] + sys.argv[1:]
+code = 0
+try:
+    runpy.run_module('function_painter.main', run_name='__main__')
+except SystemExit as e:
+    code = e.code or 0
+heavy = sorted(name for name in sys.modules if name.split('.')[0] in ('numpy', 'matplotlib'))
+print(json.dumps({'code': code, 'heavy': heavy}))
+"""
+
+
+def run_main(*args):
+    completed = subprocess.run([sys.executable, '-c', RUN_MAIN, *args], cwd=ROOT, capture_output=True,
+                               text=True, encoding='utf-8', timeout=60)
+    assert completed.returncode == 0, completed.stderr
+    *output, result = completed.stdout.splitlines()
+    return json.loads(result), output
+
+
+def check(code: str):
+    statements = Parser(Lexer(code, is_string=True)).parse_program()
+    # 去掉错误类型和语句位置的前缀
+    return [str(error).split('）: ', 1)[-1] for error in ProgramChecker().check(statements)]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    (tmp_path / "good.txt").write_text("param t from 0 to 1 step 0.1\nf(x) = x * 2\ndraw f(t), sin(t)\n",
+                                       encoding='utf-8')
+    (tmp_path / "bad.txt").write_text("param t from 0 to 1 step 0.1\ndraw t * k + foo(t)\n", encoding='utf-8')
+    return tmp_path
+
+
+def test_check_passes_without_numpy_or_matplotlib(sources):
+    result, output = run_main('--check', str(sources / "good.txt"))
+    assert result == {'code': 0, 'heavy': []}
+    assert output == [f"检查通过: {sources / 'good.txt'}"]
+
+
+def test_check_reports_errors_without_numpy_or_matplotlib(sources):
+    result, output = run_main('--check', str(sources / "bad.txt"))
+    assert result == {'code': 1, 'heavy': []}
+    assert len(output) == 2
+    assert "变量 'k' 未定义" in output[0] and "未知函数名: foo" in output[1]
+
+
+def test_batch_check_without_numpy_or_matplotlib(sources):
+    result, output = run_main('--check', str(sources))
+    assert result == {'code': 1, 'heavy': []}
+    assert output[-1] == "检查完成: 共 2 个脚本，1 个通过，1 个有错误"
+    assert all(line.startswith(str(sources / "bad.txt")) for line in output[:-1])
+
+
+def test_reports_undefined_names_in_program_order():
+    assert check("param t from 0 to 1 step 0.1\ndraw t + b\nb = 1\ndraw t + b\nc = d * 2\n") == [
+        "变量 'b' 未定义", "变量 'd' 未定义"]
+
+
+def test_reports_unknown_functions():
+    assert check("param t from 0 to 1 step 0.1\ndraw foo(t) + bar(sin(t))\ndraw sin(t) + log(t)\n") == [
+        "未知函数名: bar", "未知函数名: foo"]
+
+
+def test_reports_function_cycles():
+    assert check("f(x) = g(x) + 1\ng(x) = f(x) * 2\nparam t from 0 to 1 step 0.1\ndraw f(t)\n") == [
+        "函数循环引用: f -> g -> f"]
+    assert check("h(x) = h(x - 1)\nparam t from 0 to 1 step 0.1\ndraw h(t)\n") == ["函数循环引用: h -> h"]
+
+
+def test_reports_argument_count():
+    assert check("f(x, y) = x + y\nparam t from 0 to 1 step 0.1\ndraw f(t)\n") == ["函数 f 需要 2 个参数，实际为 1 个"]
+
+
+def test_reports_missing_and_invalid_params():
+    assert check("draw 1\nparam t from 1 to 0 step 0.1\nparam s from 0 to 1 step -1\n") == [
+        "没有定义参数范围，请先使用param语句", "参数范围无效: 1.0 to 0.0 with step 0.1", "步长必须大于0: -1.0"]
+
+
+def test_function_bodies_use_names_defined_when_referenced():
+    # 函数体在引用时检查，只有第一次引用时k还没有定义
+    assert check("f(x) = x * k\nparam t from 0 to 1 step 0.1\ndraw f(t)\nk = 2\ndraw f(t)\n") == [
+        "变量 'k' 未定义"]
+    # 函数在定义之前就被引用时同样按未定义处理
+    assert check("param t from 0 to 1 step 0.1\ndraw g(t)\ng(x) = x\n") == ["未知函数名: g"]
+
+
+def test_valid_program_has_no_errors():
+    assert check("const k = pi / 2\nparam t from 0 to 1 step 0.1\ndraw x_coord, y_coord\n"
+                 "draw sin(k * t), cos(t) with color\nclear\nshow\nsave \"a.png\"\n") == []
+
+
+def test_error_locations_name_statements():
+    errors = ProgramChecker().check(Parser(Lexer("a = 1\nb = c\n", is_string=True)).parse_program())
+    assert [str(error) for error in errors] == ["执行错误: 语义错误: 第 2 条语句（assign）: 变量 'c' 未定义"]
+
+
+def test_check_file_raises_on_syntax_errors(tmp_path):
+    path = tmp_path / "broken.txt"
+    path.write_text("draw sin(t\n", encoding='utf-8')
+    with pytest.raises(InterpreterError):
+        Interpreter(optimize=False).check_file(str(path))
+    with pytest.raises(InterpreterError, match="文件未找到"):
+        Interpreter(optimize=False).check_file(str(tmp_path / "missing.txt"))
@@ -0,0 +1,123 @@
+import math
+import numpy as np
+import pytest
+from function_painter.evaluator.compiler import ExpressionCompiler
+from function_painter.lexer import Lexer
+from function_painter.parser.expression import ConstantExpression
+from function_painter.parser.parser import Parser
+
+
+EXPRESSIONS = [
+    "x + y * 2 - 3 / x",
+    "-x ** 2 + x^3 - y^0.5",
+    "sin(x) * cos(y) + tan(x / 3)",
+    "asin(x / 4) + acos(y / 4) + atan(x * y)",
+    "sqrt(abs(x)) + exp(-y * y) + log(y) + ln(y + 1) + log10(y)",
+    "max(x, y, 1) - min(x, -y) + aver(x, y, 3)",
+    "(x - y) * (x + y) / (1 + x * x) ^ 2",
+    "pi * x + e ^ y",
+]
+
+POINTS = [(0.5, 1.5), (-1.25, 2.0), (3.0, 0.25), (1e-8, 3.75)]
+
+
+def parse_expression(text: str):
+    return Parser(Lexer(f"draw {text}\n", is_string=True)).parse_program()[0]['expression']
+
+
+def context(x: float, y: float):
+    return {'x': x, 'y': y, 'pi': math.pi, 'e': math.e}
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_scalar_matches_tree_evaluation(text):
+    expression = parse_expression(text)
+    compiled = ExpressionCompiler().compile(expression)
+    for x, y in POINTS:
+        expected = expression.evaluate(context(x, y))
+        actual = compiled(context(x, y))
+        assert type(actual) is float
+        assert actual == expected or (math.isnan(actual) and math.isnan(expected))
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_masked_and_vectorized_match_scalar(text):
+    expression = parse_expression(text)
+    compiler = ExpressionCompiler()
+    scalar = compiler.compile(expression)
+    masked = compiler.compile(expression, masked=True)
+    vectorized = compiler.compile(expression, vectorized=True)
+    x_values = np.array([x for x, _ in POINTS])
+    y_values = np.array([y for _, y in POINTS])
+    with np.errstate(all='ignore'):
+        vector_result = np.broadcast_to(vectorized({**context(0, 0), 'x': x_values, 'y': y_values}), x_values.shape)
+    for index, (x, y) in enumerate(POINTS):
+        expected = scalar(context(x, y))
+        assert masked(context(x, y)) == expected
+        np.testing.assert_allclose(vector_result[index], expected, rtol=1e-15)
+
+
+@pytest.mark.parametrize('text, x, error', [
+    ("1 / x", 0.0, ZeroDivisionError),
+    ("log(x)", -1.0, ValueError),
+    ("sqrt(x)", -4.0, ValueError),
+    ("asin(x)", 2.0, ValueError),
+    ("exp(x)", 1000.0, OverflowError),
+    ("x ^ 2", 1e200, OverflowError),
+])
+def test_scalar_errors_match_tree_evaluation(text, x, error):
+    expression = parse_expression(text)
+    compiled = ExpressionCompiler().compile(expression)
+    with pytest.raises(error):
+        expression.evaluate({'x': x})
+    with pytest.raises(error):
+        compiled({'x': x})
+    # 逐点取样使用的版本不抛出异常
+    result = ExpressionCompiler().compile(expression, masked=True)({'x': x})
+    assert math.isnan(result) or math.isinf(result)
+
+
+def test_undefined_variable():
+    compiled = ExpressionCompiler().compile(parse_expression("x + y"))
+    with pytest.raises(ValueError, match="变量 'y' 未定义"):
+        compiled({'x': 1.0})
+
+
+def test_non_finite_constants():
+    compiler = ExpressionCompiler()
+    assert compiler.compile(ConstantExpression(math.inf))({}) == math.inf
+    assert math.isnan(compiler.compile(ConstantExpression(math.nan))({}))
+
+
+def test_identical_expressions_share_compiled_function():
+    compiler = ExpressionCompiler()
+    first = compiler.compile(parse_expression("sin(x) * 2 + y"))
+    # 分别解析得到的表达式树，只要文本相同就复用同一个编译结果
+    assert compiler.compile(parse_expression("sin(x)*2+y")) is first
+    assert len(compiler.cache) == 1
+    # 不同的计算模式分别编译
+    assert compiler.compile(parse_expression("sin(x) * 2 + y"), vectorized=True) is not first
+    assert compiler.compile(parse_expression("sin(x) * 2 + y"), masked=True) is not first
+    # 向量化计算总是不抛出异常，masked不再区分
+    assert compiler.compile(parse_expression("sin(x) * 2 + y"), vectorized=True, masked=True) is \
+        compiler.compile(parse_expression("sin(x) * 2 + y"), vectorized=True)
+    assert len(compiler.cache) == 3
+    compiler.clear()
+    assert compiler.compile(parse_expression("sin(x) * 2 + y")) is not first
+
+
+@pytest.mark.parametrize('vectorized', [True, False])
+def test_identical_draws_compile_once(run_script, monkeypatch, vectorized):
+    builds = []
+    build = ExpressionCompiler._build
+    
+    def counting_build(self, expression, *modes):
+        builds.append(str(expression))
+        return build(self, expression, *modes)
+    
+    monkeypatch.setattr(ExpressionCompiler, '_build', counting_build)
+    code = "param t from 0 to 1 step 0.01\ndraw sin(t) * 2\ndraw cos(t)\ndraw sin(t) * 2\n"
+    interpreter = run_script(code + "draw sin(t) * 2\n", vectorized=vectorized, cse=False)
+    assert sorted(builds) == ["(sin(t) * 2.0)", "cos(t)"]
+    first, _, third, fourth = interpreter.plot_points
+    assert first[1].tobytes() == third[1].tobytes() == fourth[1].tobytes()
@@ -0,0 +1,62 @@
+from function_painter.interpreter import Interpreter
+from function_painter.lexer import Lexer
+from function_painter.parser.parser import Parser
+
+
+SHARED = """
+param t from -5 to 5 step 0.001
+a = 0.5
+draw sin(2 * t) + cos(3 * t)
+draw sin(2 * t) * a, cos(3 * t) - exp(-t * t)
+draw exp(-t * t) + sin(2 * t)
+a = 2
+draw sin(2 * t) * a
+param t from 0 to 1 step 0.01
+draw sin(2 * t) - cos(3 * t)
+clear
+draw sqrt(1 - t * t) + sin(2 * t)
+"""
+
+
+def test_same_curves_without_cse(run_script, assert_same_points):
+    cached = run_script(SHARED, cse=True)
+    assert cached.subexpression_cache.hits > 0
+    assert_same_points(run_script(SHARED, cse=False).plot_points, cached.plot_points)
+
+
+def test_releases_entries_after_last_use(run_script):
+    cache = run_script(SHARED).subexpression_cache
+    assert cache.remaining == {}
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_unshared_subtrees_are_not_cached(run_script):
+    code = "param t from 0 to 10 step 0.001\n" + "".join(f"draw sin(t * {i}) + {i}\n" for i in range(1, 20))
+    cache = run_script(code).subexpression_cache
+    # 只有参数t本身被多个表达式共用
+    assert cache.misses == 0 and cache.hits == 0
+    assert len(cache) == 0
+
+
+def test_only_shared_nodes_are_planned():
+    interpreter = Interpreter(headless=True, decimation=None)
+    statements = Parser(Lexer("param t from 0 to 1 step 0.1\ndraw sin(2 * t) + t\ndraw sin(2 * t) - 1\n",
+                              is_string=True)).parse_program()
+    interpreter.plan_subexpressions(statements)
+    cache = interpreter.subexpression_cache
+    shared = {str(node) for node in cache.pool.nodes.values() if id(node) in cache.remaining}
+    assert shared == {"sin((2.0 * t))", "(2.0 * t)", "2.0", "t"}
+    assert all(count == 2 for count in cache.remaining.values())
+
+
+def test_evicts_least_recently_used_entries(assert_same_points):
+    expected = Interpreter(headless=True, decimation=None, cse=False)
+    expected.interpret(SHARED)
+    interpreter = Interpreter(headless=True, decimation=None)
+    # 预算只够保存一个取样网格上的一个数组
+    interpreter.subexpression_cache.max_bytes = 10001 * 8
+    interpreter.interpret(SHARED)
+    cache = interpreter.subexpression_cache
+    assert cache.evictions > 0
+    assert cache.nbytes <= cache.max_bytes
+    assert_same_points(expected.plot_points, interpreter.plot_points)
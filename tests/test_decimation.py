@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from function_painter.drawer.decimation import (DECIMATION_METHODS, POINTS_PER_BUCKET, compress_gaps, decimate,
+                                                lttb_indices, minmax_indices)
+
+
+BUCKETS = 1000
+# 保留的有效点最多为每桶POINTS_PER_BUCKET个加上LTTB额外保留的两个极值点，NaN最多比有效点多一个
+MAX_POINTS = 2 * (BUCKETS * POINTS_PER_BUCKET + 2) + 1
+
+
+def noisy_curve(count: int):
+    x_values = np.linspace(-10, 10, count)
+    y_values = np.sin(x_values * 3) + np.random.default_rng(0).normal(0, 0.1, count)
+    return x_values, y_values
+
+
+def assert_no_bridged_gaps(x_values, y_values, x_result, y_result):
+    """x单调递增时，结果中相邻的两个有效点之间不能有原曲线的无效点"""
+    valid_mask = np.isfinite(x_values) & np.isfinite(y_values)
+    invalid_counts = np.r_[0, np.cumsum(~valid_mask)]
+    for left in range(len(x_result) - 1):
+        if np.isnan(y_result[left]) or np.isnan(y_result[left + 1]):
+            continue
+        start = np.searchsorted(x_values, x_result[left])
+        stop = np.searchsorted(x_values, x_result[left + 1])
+        assert invalid_counts[stop] == invalid_counts[start + 1]
+
+
+@pytest.mark.parametrize('method', DECIMATION_METHODS)
+def test_output_size_is_bounded(method):
+    x_values, y_values = noisy_curve(1_000_000)
+    x_result, y_result = decimate(x_values, y_values, BUCKETS, method)
+    assert len(x_result) == len(y_result) <= BUCKETS * POINTS_PER_BUCKET + 2
+    assert x_result[0] == x_values[0] and x_result[-1] == x_values[-1]
+    assert np.all(np.diff(x_result) > 0)
+
+
+@pytest.mark.parametrize('method', DECIMATION_METHODS)
+def test_keeps_global_extrema(method):
+    x_values, y_values = noisy_curve(200_000)
+    _, y_result = decimate(x_values, y_values, BUCKETS, method)
+    assert y_result.max() == y_values.max()
+    assert y_result.min() == y_values.min()
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    x_values, y_values = noisy_curve(100_000)
+    indices = minmax_indices(x_values, y_values, BUCKETS)
+    bucket_ids = np.minimum(((x_values + 10) * (BUCKETS / 20)).astype(np.int64), BUCKETS - 1)
+    for bucket in np.unique(bucket_ids)[::97]:
+        in_bucket = bucket_ids == bucket
+        kept = y_values[indices[in_bucket[indices]]]
+        assert kept.max() == y_values[in_bucket].max()
+        assert kept.min() == y_values[in_bucket].min()
+
+
+def test_lttb_keeps_endpoints_and_threshold():
+    x_values, y_values = noisy_curve(10_000)
+    indices = lttb_indices(x_values, y_values, 500)
+    assert indices[0] == 0 and indices[-1] == len(x_values) - 1
+    assert len(indices) <= 502
+    assert np.all(np.diff(indices) > 0)
+
+
+@pytest.mark.parametrize('method', DECIMATION_METHODS)
+def test_size_does_not_grow_with_gaps(method):
+    x_values = np.arange(100_000, dtype=float)
+    y_values = np.sin(x_values)
+    y_values[::3] = np.nan
+    x_result, y_result = decimate(x_values, y_values, BUCKETS, method)
+    assert len(x_result) <= MAX_POINTS
+    assert np.array_equal(np.isnan(x_result), np.isnan(y_result))
+    # 每个有效点都夹在两个无效点之间，相邻的两个保留点不能直接相连
+    assert not np.any(np.isfinite(y_result[1:]) & np.isfinite(y_result[:-1]))
+
+
+@pytest.mark.parametrize('method', DECIMATION_METHODS)
+def test_many_gaps_in_smooth_curve(method):
+    x_values = np.linspace(-10, 10, 1_000_000)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y_values = np.log(np.sin(x_values * x_values))
+    x_result, y_result = decimate(x_values, y_values, BUCKETS, method)
+    assert len(x_result) <= MAX_POINTS
+    assert_no_bridged_gaps(x_values, y_values, x_result, y_result)
+    if method == 'minmax':
+        finite = np.isfinite(y_values)
+        assert y_result[np.isfinite(y_result)].max() == y_values[finite].max()
+        assert y_result[np.isfinite(y_result)].min() == y_values[finite].min()
+
+
+@pytest.mark.parametrize('method', DECIMATION_METHODS)
+def test_gaps_at_both_ends_are_preserved(method):
+    x_values, y_values = noisy_curve(50_000)
+    y_values[:100] = np.nan
+    y_values[20_000:20_050] = np.inf
+    y_values[-10:] = -np.inf
+    x_result, y_result = decimate(x_values, y_values, 100, method)
+    assert np.isnan(y_result[0]) and np.isnan(y_result[-1])
+    assert np.count_nonzero(np.isnan(y_result)) == 3
+    assert_no_bridged_gaps(x_values, y_values, x_result, y_result)
+
+
+@pytest.mark.parametrize('method', DECIMATION_METHODS)
+def test_short_curves_only_compress_gaps(method):
+    x_values = np.arange(10, dtype=float)
+    y_values = np.array([np.nan, np.nan, 1, 2, np.inf, np.nan, 3, 4, 5, np.nan])
+    for actual, expected in zip(decimate(x_values, y_values, BUCKETS, method), compress_gaps(x_values, y_values)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_all_invalid_curve_becomes_single_gap():
+    x_values = np.arange(10_000, dtype=float)
+    x_result, y_result = decimate(x_values, np.full(10_000, np.nan), 10)
+    assert len(x_result) == len(y_result) == 1 and np.isnan(y_result[0])
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError, match="未知的抽稀方法"):
+        decimate(np.arange(10.0), np.arange(10.0), 1, 'average')
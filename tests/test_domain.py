@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from function_painter.drawer.decimation import compress_gaps
+from function_painter.evaluator.domain import SampleErrors
+from function_painter.lexer import Lexer
+from function_painter.parser.parser import Parser
+
+
+MODES = [{'vectorized': True}, {'vectorized': False}, {'streaming': True}, {'prune': False}]
+
+
+def evaluate(interpreter, code: str):
+    statement, = Parser(Lexer(code, is_string=True)).parse_program()
+    return interpreter.evaluate_draw_statement(statement)
+
+
+@pytest.mark.parametrize('options', MODES)
+@pytest.mark.parametrize('draw, undefined, overflow', [
+    ("draw log(t)", 3, 0),
+    ("draw sqrt(t)", 2, 0),
+    ("draw t^0.5", 2, 0),
+    ("draw asin(2 * t)", 2, 0),
+    ("draw acos(t - 1)", 2, 0),
+    ("draw 1 / t", 1, 0),
+    ("draw t / 0", 5, 0),
+    ("draw exp(1000 * t)", 0, 1),
+    # x、y任一无效的点都只计一次，同时为NaN和inf时记为定义域之外
+    ("draw sqrt(t), log(t)", 3, 0),
+    ("draw exp(1000 * t), sqrt(t)", 2, 1),
+    ("draw exp(1000 * t), sqrt(-t)", 2, 0),
+])
+def test_counts_errors_per_curve(run_script, options, draw, undefined, overflow):
+    interpreter = run_script("param t from -1 to 1 step 0.5\n", **options)
+    (x_values, y_values, _, errors), = evaluate(interpreter, draw + "\n")
+    assert (errors.total, errors.undefined, errors.overflow) == (5, undefined, overflow)
+    assert errors.valid == 5 - undefined - overflow
+    if 'streaming' not in options:
+        assert len(x_values) == len(y_values) == 5
+        assert int(np.count_nonzero(np.isfinite(x_values) & np.isfinite(y_values))) == errors.valid
+
+
+def test_counts_each_parameter_separately(run_script):
+    interpreter = run_script("param t from -1 to 1 step 0.5\nparam s from 0 to 3 step 1\n")
+    curves = evaluate(interpreter, "draw log(t + s - 1)\n")
+    # 在t上取样时s=0，t - 1处处不大于0；之后t停留在最后一个取样值1，在s上取样时只有s=0无定义
+    assert [(errors.total, errors.undefined) for *_, errors in curves] == [(5, 5), (4, 1)]
+
+
+def test_accumulates_chunks():
+    errors = SampleErrors()
+    errors.add(np.array([0.0, np.nan, 2.0]), np.array([np.inf, 1.0, 2.0]))
+    errors.add(np.array([3.0, np.inf]), np.array([np.nan, 4.0]))
+    assert (errors.total, errors.undefined, errors.overflow, errors.invalid, errors.valid) == (5, 2, 2, 4, 1)
+    assert repr(errors) == "SampleErrors(total=5, undefined=2, overflow=2)"
+
+
+@pytest.mark.parametrize('options', MODES)
+@pytest.mark.parametrize('draw', ["draw log(t)", "draw sqrt(t)", "draw asin(t)", "draw acos(t), t",
+                                  "draw t / 0", "draw 1 / (t + 5)", "draw log(t) / sqrt(t)"])
+def test_invalid_ranges_do_not_raise(run_script, options, draw):
+    interpreter = run_script(f"param t from -5 to -1.5 step 0.25\n{draw}\nsave_me = 1\n", **options)
+    assert interpreter.variables['save_me'] == 1.0
+    assert interpreter.variables['t'] == -1.5
+
+
+def test_assignments_still_raise(run_script):
+    with pytest.raises(Exception, match="除数不能为零"):
+        run_script("a = 1 / 0\n")
+
+
+def test_compress_gaps_keeps_one_nan_per_run():
+    x_values = np.arange(12, dtype=float)
+    y_values = np.array([np.nan, np.nan, 1, 2, np.inf, -np.inf, np.nan, 3, 4, np.nan, 5, np.nan])
+    x_result, y_result = compress_gaps(x_values, y_values)
+    assert np.isnan(y_result).tolist() == [True, False, False, True, False, False, True, False, True]
+    assert y_result[~np.isnan(y_result)].tolist() == [1, 2, 3, 4, 5]
+    assert np.array_equal(np.isnan(x_result), np.isnan(y_result))
+
+
+def test_compress_gaps_returns_valid_curves_unchanged():
+    x_values = np.linspace(0, 1, 5)
+    y_values = x_values ** 2
+    x_result, y_result = compress_gaps(x_values, y_values)
+    assert x_result is x_values and y_result is y_values
+
+
+@pytest.mark.parametrize('decimation', [None, 'minmax', 'lttb'])
+def test_drawn_line_breaks_at_gaps(run_script, decimation):
+    interpreter = run_script("param t from -10 to 10 step 0.001\ndraw sqrt(sin(t))\n", decimation=decimation)
+    line, = [line for line in interpreter.drawer.ax.get_lines() if line.get_label().startswith('曲线')]
+    path = line.get_path().cleaned(remove_nans=True)
+    # sin(t)在[-10, 10]上有4段非负区间，每段画成一条单独的折线
+    assert int(np.count_nonzero(path.codes == path.MOVETO)) == 4
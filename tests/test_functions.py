@@ -0,0 +1,88 @@
+import subprocess
+import sys
+import numpy as np
+import pytest
+from conftest import ROOT
+from function_painter import register_function
+from function_painter.interpreter import Interpreter
+from function_painter.parser.expression.functions import FUNCTIONS
+
+
+@pytest.fixture
+def kernel():
+    """注册名为kern的测试函数，factor为它乘上的系数，测试结束后从注册表中删除"""
+    def register(factor: float):
+        return register_function('kern', lambda x: x * factor, lambda x: x * factor, replace=True)
+    yield register
+    FUNCTIONS._functions.pop('kern', None)
+
+
+def test_n_ary_functions(run_script):
+    interpreter = run_script("param t from 0 to 1 step 0.25\ndraw max(t, 0.5, 1 - t) + min(t, 0.2) + aver(t, 1)\n")
+    (t_values, y_values), = interpreter.plot_points
+    expected = np.maximum(np.maximum(t_values, 0.5), 1 - t_values) + np.minimum(t_values, 0.2) + (t_values + 1) / 2
+    assert y_values.tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize('code', ["draw max(t)", "draw sin(t, t)", "draw aver()"])
+def test_arity_is_checked_when_parsing(run_script, code):
+    with pytest.raises(Exception, match="参数"):
+        run_script(f"param t from 0 to 1 step 0.1\n{code}\n")
+
+
+def test_register_requires_replace(kernel):
+    kernel(2)
+    with pytest.raises(ValueError, match="已经注册"):
+        register_function('kern', abs, np.abs)
+
+
+def test_fingerprint_follows_implementation(kernel):
+    first = kernel(2).fingerprint
+    assert kernel(2).fingerprint == first
+    assert kernel(3).fingerprint != first
+
+
+def test_fingerprint_is_stable_across_processes():
+    code = "from function_painter.parser.expression.functions import FUNCTIONS; print(FUNCTIONS.fingerprint())"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == FUNCTIONS.fingerprint()
+
+
+CODE = "param t from 0 to 1 step 0.25\ndraw kern(t) + 1\n"
+
+
+def test_replaced_kernel_is_not_reused_by_compiler(kernel):
+    interpreter = Interpreter(headless=True, decimation=None)
+    kernel(2)
+    interpreter.interpret(CODE)
+    kernel(3)
+    interpreter.interpret(CODE)
+    (_, first), (_, second) = interpreter.plot_points
+    assert first.tolist() == [1.0, 1.5, 2.0, 2.5, 3.0]
+    assert second.tolist() == [1.0, 1.75, 2.5, 3.25, 4.0]
+
+
+def test_replaced_kernel_invalidates_curve_cache(kernel, run_script, tmp_path):
+    cache_dir = str(tmp_path / "curves")
+    kernel(2)
+    run_script(CODE, cache_dir=cache_dir)
+    kernel(3)
+    interpreter = run_script(CODE, cache_dir=cache_dir)
+    assert interpreter.curve_cache.hits == 0
+    assert interpreter.plot_points[0][1].tolist() == [1.0, 1.75, 2.5, 3.25, 4.0]
+    kernel(2)
+    assert run_script(CODE, cache_dir=cache_dir).curve_cache.hits == 1
+
+
+def test_replaced_kernel_invalidates_program_cache(kernel, tmp_path):
+    # 常量折叠在语法分析缓存中保存了kern(2)的值
+    path = tmp_path / "script.txt"
+    path.write_text("const c = kern(2)\n", encoding='utf-8')
+    values = []
+    for factor in (2, 3):
+        kernel(factor)
+        interpreter = Interpreter(headless=True, program_cache_dir=str(tmp_path / "programs"))
+        interpreter.interpret_file(str(path))
+        assert interpreter.program_cache.hits == 0
+        values.append(interpreter.constants['c'])
+    assert values == [4.0, 6.0]
@@ -0,0 +1,103 @@
+import time
+import numpy as np
+import pytest
+from function_painter.exception import RuntimeError as PainterRuntimeError
+from function_painter.interpreter import Interpreter
+from function_painter.lexer import Lexer
+from function_painter.parser.inliner import FunctionInliner, UserFunction
+from function_painter.parser.parser import Parser
+
+
+def parse_expression(text: str):
+    return Parser(Lexer(f"draw {text}", is_string=True)).parse_program()[0]['expression']
+
+
+def functions(**definitions: str):
+    """由 名字=\"形参,...:函数体\" 构造自定义函数表"""
+    result = {}
+    for name, definition in definitions.items():
+        params, body = definition.split(':')
+        result[name] = UserFunction(name, [param for param in params.split(',') if param], parse_expression(body))
+    return result
+
+
+def test_substitutes_arguments():
+    inliner = FunctionInliner(functions(f="x:x^2 + 1", g="x,y:f(x) * y + k"))
+    assert str(inliner.inline(parse_expression("g(sin(t), 2) + f(cos(t))"))) == \
+        "(((((sin(t) ** 2.0) + 1.0) * 2.0) + k) + ((cos(t) ** 2.0) + 1.0))"
+
+
+def test_parameters_shadow_functions():
+    inliner = FunctionInliner(functions(f="x:x * 2", g="f:f + 1", c=":3"))
+    assert str(inliner.inline(parse_expression("g(t) + c"))) == "((t + 1.0) + 3.0)"
+
+
+def test_returns_expression_without_calls_unchanged():
+    expression = parse_expression("sin(t) + k")
+    assert FunctionInliner(functions(f="x:x")).inline(expression) is expression
+
+
+@pytest.mark.parametrize('definitions, text, cycle', [
+    ({'f': "x:f(x) + 1"}, "f(t)", "f -> f"),
+    ({'f': "x:g(x) + 1", 'g': "x:f(x) * 2"}, "f(t)", "f -> g -> f"),
+    ({'f': "x:g(x)", 'g': "x:h(x)", 'h': "x:g(x) + f(x)"}, "1 + f(t)", "f -> g -> h -> g"),
+    ({'c': ":c + 1"}, "c", "c -> c"),
+])
+def test_detects_cycles(definitions, text, cycle):
+    with pytest.raises(ValueError, match=f"函数循环引用: {cycle}"):
+        FunctionInliner(functions(**definitions)).inline(parse_expression(text))
+
+
+def test_repeated_calls_are_not_cycles():
+    inliner = FunctionInliner(functions(f="x:x + 1", g="x:f(f(x)) * f(x)"))
+    assert str(inliner.inline(parse_expression("g(t)"))) == "(((t + 1.0) + 1.0) * (t + 1.0))"
+
+
+def test_checks_arity():
+    with pytest.raises(ValueError, match="函数 f 需要 2 个参数，实际为 1 个"):
+        FunctionInliner(functions(f="x,y:x * y")).inline(parse_expression("f(t)"))
+
+
+def test_rejects_oversized_expansion():
+    inliner = FunctionInliner(functions(f1="x:x * x + x", f2="x:f1(f1(x))", f3="x:f2(f2(x))"), max_nodes=100)
+    assert inliner.inline(parse_expression("f2(t)"))
+    with pytest.raises(ValueError, match="展开后的表达式有 161 个节点，超过上限 100"):
+        inliner.inline(parse_expression("f3(t)"))
+
+
+NESTED = """
+f1(x) = x * x + x
+f2(x) = f1(f1(x))
+f3(x) = f2(f2(x))
+f4(x) = f3(f3(x))
+f5(x) = f4(f4(x))
+f6(x) = f5(f5(x))
+param t from 0 to 1 step 0.01
+draw f6(t)
+"""
+
+
+def test_interpreter_rejects_nested_expansion_quickly(run_script):
+    begin = time.perf_counter()
+    with pytest.raises(PainterRuntimeError, match="超过上限"):
+        run_script(NESTED)
+    assert time.perf_counter() - begin < 5
+
+
+def test_interpreter_reports_cycles(run_script, tmp_path):
+    code = "f(x) = g(x) + 1\ng(x) = f(x) * 2\nparam t from 0 to 1 step 0.1\ndraw f(t)\n"
+    with pytest.raises(PainterRuntimeError, match="函数循环引用: f -> g -> f"):
+        run_script(code)
+    path = tmp_path / "cycle.txt"
+    path.write_text(code, encoding='utf-8')
+    errors = Interpreter().check_file(str(path))
+    assert len(errors) == 1 and "函数循环引用: f -> g -> f" in str(errors[0])
+
+
+@pytest.mark.parametrize('vectorized', [True, False])
+def test_inlined_curves(run_script, vectorized):
+    code = ("k = 2\nf(x) = x^2 + k\ng(x, y) = f(x) * y\nk = 3\n"
+            "param t from -3 to 3 step 0.01\ndraw g(sin(t), 2) + f(cos(t))\n")
+    (t_values, y_values), = run_script(code, vectorized=vectorized).plot_points
+    expected = (np.sin(t_values) ** 2 + 3) * 2 + np.cos(t_values) ** 2 + 3
+    np.testing.assert_allclose(y_values, expected, rtol=1e-14)
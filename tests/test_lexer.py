@@ -0,0 +1,156 @@
+import glob
+import mmap
+import os
+import random
+import re
+from typing import Dict, List, Optional, Tuple
+import pytest
+from conftest import ROOT
+from function_painter.lexer import Lexer
+from function_painter.lexer.token_manager import Token, TokenTypeEnum, shared_token_match_map
+from function_painter.lexer.tokenizer import tokenize
+
+
+class BaselineLexer:
+    """逐字符扫描的原始词法分析器的转写，去掉了调试输出，注释后的递归改为循环
+    
+    token映射表使用当前的表，因此这里比较的只是扫描过程本身。
+    """
+    def __init__(self, source: str):
+        self.chars = source
+        self.position = 0
+        self.token_match_map: Dict[str, Token] = shared_token_match_map()
+    
+    @property
+    def curr_char(self) -> Optional[str]:
+        return self.chars[self.position] if self.position < len(self.chars) else None
+    
+    def peek_char(self) -> Optional[str]:
+        return self.chars[self.position + 1] if self.position + 1 < len(self.chars) else None
+    
+    def fetch_token(self) -> Optional[Token]:
+        while True:
+            while self.curr_char is not None and self.curr_char.isspace():
+                self.position += 1
+            if self.curr_char is None:
+                return None
+            if self.curr_char == '/' and self.peek_char() == '/':
+                while self.curr_char is not None and self.curr_char != '\n':
+                    self.position += 1
+                self.position += 1
+                continue
+            break
+
+        if self.curr_char.isdigit() or self.curr_char == '.':
+            lexeme = []
+            has_dot = False
+            while self.curr_char is not None and (self.curr_char.isdigit() or self.curr_char == '.'):
+                if self.curr_char == '.':
+                    if has_dot:
+                        break
+                    has_dot = True
+                lexeme.append(self.curr_char)
+                self.position += 1
+            lexeme_str = ''.join(lexeme)
+            try:
+                return Token(TokenTypeEnum.CONSTID, lexeme_str, float(lexeme_str))
+            except ValueError:
+                return Token(TokenTypeEnum.ERRTOKEN, lexeme_str)
+
+        if self.curr_char.isalpha():
+            lexeme = []
+            while self.curr_char is not None and (self.curr_char.isalnum() or self.curr_char == '_'):
+                lexeme.append(self.curr_char.lower())
+                self.position += 1
+            lexeme_str = ''.join(lexeme)
+            if lexeme_str in self.token_match_map:
+                return self.token_match_map[lexeme_str]
+            return Token(TokenTypeEnum.VARIABLE, lexeme_str, 0.0)
+
+        lexeme = self.curr_char
+        if lexeme == '*' and self.peek_char() == '*':
+            self.position += 2
+            return self.token_match_map['**']
+        self.position += 1
+        if lexeme in self.token_match_map:
+            return self.token_match_map[lexeme]
+        return Token(TokenTypeEnum.ERRTOKEN, lexeme)
+
+
+def _describe(token: Token) -> Tuple[TokenTypeEnum, str, float]:
+    return (token.token_type, token.lexeme, token.value)
+
+
+def baseline_tokens(source: str) -> List[Tuple[TokenTypeEnum, str, float]]:
+    lexer = BaselineLexer(source)
+    tokens = []
+    while True:
+        token = lexer.fetch_token()
+        if token is None:
+            return tokens
+        tokens.append(_describe(token))
+
+
+def lexer_tokens(source: str) -> List[Tuple[TokenTypeEnum, str, float]]:
+    lexer = Lexer(source, is_string=True)
+    tokens = []
+    while True:
+        token = lexer.fetch_token()
+        if token.token_type == TokenTypeEnum.NONTOKEN:
+            return tokens
+        tokens.append(_describe(token))
+
+
+# 原始词法分析器不支持的写法：字符串、科学计数法，以及isdigit成立却不是十进制数字的上标数字
+_UNSUPPORTED = re.compile(r'''["']|[\d.][eE][+-]?\d|[²³¹⁰-⁹]''')
+
+_FUZZ_PIECES = (
+    'param', 'draw', 'with', 'color', 'from', 'to', 'step', 'show', 'clear', 'const', 'save', 'adaptive',
+    'sin', 'COS', 'Sqrt', 'x', 't_1', 'Alpha', '变量', 'ß', '_', '0', '12', '3.', '.5', '1.2.3', '..', '.',
+    '+', '-', '*', '**', '***', '/', '//', '^', '(', ')', '[', ']', ',', ';', '=', '#', '@', '$',
+    ' ', '  ', '\t', '\n', '\r\n', '　', '\x0c'
+)
+
+
+def _fuzz_sources(count: int, seed: int = 20240601) -> List[str]:
+    rng = random.Random(seed)
+    sources = []
+    while len(sources) < count:
+        source = ''.join(rng.choice(_FUZZ_PIECES) for _ in range(rng.randint(1, 60)))
+        if not _UNSUPPORTED.search(source):
+            sources.append(source)
+    return sources
+
+
+SAMPLE_SCRIPTS = sorted(glob.glob(os.path.join(ROOT, '*.txt')))
+
+
+@pytest.mark.parametrize('path', SAMPLE_SCRIPTS, ids=os.path.basename)
+def test_sample_scripts_match_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        source = file.read()
+    assert lexer_tokens(source) == baseline_tokens(source)
+
+
+@pytest.mark.parametrize('source', _fuzz_sources(300))
+def test_fuzzed_sources_match_baseline(source):
+    assert lexer_tokens(source) == baseline_tokens(source)
+
+
+def test_trailing_comment_without_newline():
+    source = "draw x // 没有换行的注释"
+    assert lexer_tokens(source) == baseline_tokens(source) == [
+        (TokenTypeEnum.DRAW, 'draw', 0.0), (TokenTypeEnum.VARIABLE, 'x', 0.0)]
+
+
+def test_bytes_and_mmap_match_text(tmp_path):
+    source = ''.join(_fuzz_sources(50, seed=7)) + "\n// 注释 ü\nparam t from 0 to 1 step 0.1\ndraw 变量 * t\r\nß = 1\r"
+    expected = tokenize(source.replace('\r\n', '\n').replace('\r', '\n'), shared_token_match_map())
+    path = tmp_path / 'script.txt'
+    path.write_bytes(source.encode('utf-8'))
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for buffer in (source.encode('utf-8'), mapped):
+            actual = tokenize(buffer, shared_token_match_map())
+            assert [_describe(token) for token in actual.tokens] == [_describe(token) for token in expected.tokens]
+            assert list(actual.lines) == list(expected.lines)
+            assert list(actual.columns) == list(expected.columns)
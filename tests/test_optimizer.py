@@ -0,0 +1,133 @@
+import math
+import numpy as np
+import pytest
+from function_painter.exception import RuntimeError as PainterRuntimeError
+from function_painter.lexer import Lexer
+from function_painter.parser.optimizer import ExpressionOptimizer
+from function_painter.parser.parser import Parser
+from function_painter.parser.expression import ConstantExpression
+
+
+def parse_program(code: str):
+    return Parser(Lexer(code, is_string=True)).parse_program()
+
+
+def parse_expression(text: str):
+    return parse_program(f"draw {text}")[0]['expression']
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("x*1", "x"),
+    ("1*x", "x"),
+    ("x+0", "x"),
+    ("0+x", "x"),
+    ("x-0", "x"),
+    ("0-x", "-(x)"),
+    ("x/1", "x"),
+    ("--x", "x"),
+    ("x^1", "x"),
+    ("x^0", "1.0"),
+    # 2次、3次幂在取样时才按连乘计算，这里保持原样，赋值语句中的溢出照样报错
+    ("x^2", "(x ** 2.0)"),
+    ("x**3", "(x ** 3.0)"),
+    ("x^4", "(x ** 4.0)"),
+    ("(x+1)^2", "((x + 1.0) ** 2.0)"),
+    ("sin(0) + x", "x"),
+    ("2 * 3 + x * (4 - 3)", "(6.0 + x)"),
+])
+def test_identities(text, expected):
+    assert str(ExpressionOptimizer().optimize(parse_expression(text))) == expected
+
+
+def test_folds_builtin_constants():
+    folded = ExpressionOptimizer().optimize(parse_expression("2 * pi + e"))
+    assert isinstance(folded, ConstantExpression)
+    assert folded.value == 2 * math.pi + math.e
+
+
+@pytest.mark.parametrize('text', ["1/0", "sqrt(-1) + x", "log(0) * x", "exp(1000) - x"])
+def test_keeps_failing_constant_subtrees(text):
+    optimized = ExpressionOptimizer().optimize(parse_expression(text))
+    assert not isinstance(optimized, ConstantExpression)
+
+
+def test_const_definitions_fold_into_later_statements():
+    statements = ExpressionOptimizer().optimize_program(parse_program(
+        "const c = 2 * 3\nparam x from 0 to 1 step 0.1\ndraw c * x\nconst c = x\ndraw c + 1\n"))
+    assert str(statements[0]['expression']) == "6.0"
+    assert str(statements[2]['expression']) == "(6.0 * x)"
+    # c被重新定义为不能在编译期确定的值之后不再折叠
+    assert str(statements[4]['expression']) == "(c + 1.0)"
+
+
+def test_function_bodies_ignore_named_constants():
+    statements = ExpressionOptimizer().optimize_program(parse_program("const c = 2\nf(x) = c * x * 1\n"))
+    assert str(statements[1]['expression']) == "(c * x)"
+
+
+def test_does_not_modify_original_statements():
+    statements = parse_program("draw x * 1\n")
+    original = statements[0]['expression']
+    ExpressionOptimizer().optimize_program(statements)
+    assert statements[0]['expression'] is original
+
+
+PROGRAM = """
+const k = 2 * pi
+param t from -2 to 2 step 0.001
+draw t^2 * 1 + 0, --t^3
+draw sqrt(1 - t^2) / 1, k * t - 0
+draw log(t) * (3 - 2), 1 / t
+f(u) = u^2 + 0 * u
+draw f(sin(k * t))
+"""
+
+
+def test_no_optimize_gives_same_curves(run_script):
+    optimized = run_script(PROGRAM, optimize=True).plot_points
+    plain = run_script(PROGRAM, optimize=False).plot_points
+    assert len(optimized) == len(plain)
+    # 幂改写为连乘可能在最后一位上不同，NaN和inf的位置必须一致
+    for (optimized_x, optimized_y), (plain_x, plain_y) in zip(optimized, plain):
+        for actual, expected in ((optimized_x, plain_x), (optimized_y, plain_y)):
+            np.testing.assert_array_equal(np.isfinite(actual), np.isfinite(expected))
+            np.testing.assert_allclose(actual, expected, rtol=1e-15, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('optimize', [True, False])
+def test_runtime_errors_are_preserved(run_script, optimize):
+    with pytest.raises(PainterRuntimeError, match="除数不能为零"):
+        run_script("const c = 1/0\n", optimize=optimize)
+
+
+@pytest.mark.parametrize('optimize', [True, False])
+@pytest.mark.parametrize('code', ["a = 10^200\ny = a^2\n", "const a = -10^200\nconst y = a^3\n",
+                                  "a = 10^200\nf(x) = x^2\ny = f(a)\n"])
+def test_power_overflow_is_preserved(run_script, optimize, code):
+    with pytest.raises(PainterRuntimeError, match="math range error"):
+        run_script(code, optimize=optimize)
+
+
+LARGE_POWERS = """
+a = 10^200
+param t from -2 to 2 step 0.25
+draw (a * t)^2, (a * t)^3
+draw t^2 * a, (t * a)^3 - t^3
+"""
+
+
+@pytest.mark.parametrize('vectorized', [True, False])
+def test_power_overflow_in_draw_matches_no_optimize(run_script, assert_same_points, vectorized):
+    optimized = run_script(LARGE_POWERS, optimize=True, vectorized=vectorized).plot_points
+    assert_same_points(run_script(LARGE_POWERS, optimize=False, vectorized=vectorized).plot_points, optimized)
+    # 溢出的点为inf，负数的3次幂为-inf，与逐点计算和向量化计算一致
+    x_values, y_values = optimized[0]
+    assert np.isposinf(x_values[0]) and np.isneginf(y_values[0])
+    assert_same_points(run_script(LARGE_POWERS, vectorized=not vectorized).plot_points, optimized)
+
+
+def test_const_is_a_keyword_only_at_statement_start():
+    statements = parse_program("const = 1\nconst c = const + 1\n")
+    assert statements[0]['type'] == 'assign' and statements[0]['name'] == 'const'
+    assert statements[1]['type'] == 'const' and statements[1]['name'] == 'c'
+    assert str(statements[1]['expression']) == "(const + 1.0)"
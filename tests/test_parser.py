@@ -0,0 +1,48 @@
+import pytest
+from function_painter.lexer import Lexer
+from function_painter.parser.parser import Parser
+
+
+def parse_program(code: str):
+    return Parser(Lexer(code, is_string=True)).parse_program()
+
+
+def test_save_is_a_keyword_only_at_statement_start():
+    statements = parse_program('save "a.png"\nsave = 1\nsave(x) = x * 2\ndraw save + save(1)\n')
+    assert [statement['type'] for statement in statements] == ['save', 'assign', 'function', 'draw']
+    assert statements[0]['path'] == 'a.png'
+    assert statements[1]['name'] == 'save' and statements[2]['name'] == 'save'
+    assert str(statements[3]['expression']) == "(save + save(1.0))"
+
+
+def test_save_variable_can_be_drawn(run_script):
+    interpreter = run_script("save = 3\nparam t from 0 to 1 step 0.5\ndraw save * t\n")
+    (_, y_values), = interpreter.plot_points
+    assert y_values.tolist() == [0.0, 1.5, 3.0]
+
+
+def test_save_writes_image(run_script, tmp_path):
+    path = tmp_path / "out.png"
+    run_script(f'param t from 0 to 1 step 0.1\ndraw t\nsave "{path.as_posix()}"\n')
+    assert path.read_bytes()[:8] == b'\x89PNG\r\n\x1a\n'
+
+
+def test_adaptive_options():
+    statement, = parse_program("param x from -5 to 5 step 0.5 adaptive tol 1e-4 depth 8 budget 2000\n")
+    assert statement['step'] == 0.5
+    assert statement['adaptive'] == {'tol': 1e-4, 'max_depth': 8, 'max_points': 2000}
+
+
+def test_adaptive_option_names_are_ordinary_names_elsewhere():
+    statements = parse_program("param depth from 0 to 10 step 0.1\ntol = 1\nbudget = depth + adaptive\n"
+                               "param adaptive from 0 to 1 adaptive\ndepth = 3\n")
+    assert [(statement['type'], statement['name']) for statement in statements] == [
+        ('param', 'depth'), ('assign', 'tol'), ('assign', 'budget'), ('param', 'adaptive'), ('assign', 'depth')]
+    assert statements[0]['adaptive'] is None
+    assert statements[3]['adaptive'] == {'tol': None, 'max_depth': None, 'max_points': None}
+    assert str(statements[2]['expression']) == "(depth + adaptive)"
+
+
+def test_adaptive_option_requires_value():
+    with pytest.raises(ValueError, match="tol"):
+        parse_program("param x from 0 to 1 adaptive tol\n")
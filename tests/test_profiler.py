@@ -0,0 +1,150 @@
+import json
+import tracemalloc
+import pytest
+from function_painter.profiler import PROFILE_FORMAT_VERSION, Profiler, format_bytes
+
+
+MB = 1 << 20
+
+PROGRAM = """param t from -2 to 2 step 0.001
+a = 2
+draw log(t) * a
+draw sqrt(1 - t * t), t
+"""
+
+
+@pytest.fixture
+def profiler():
+    profiler = Profiler()
+    yield profiler
+    profiler.finish()
+
+
+def test_nested_stage_peaks(profiler):
+    with profiler.stage('outer'):
+        kept = bytearray(MB)
+        with profiler.stage('inner'):
+            temporary = bytearray(4 * MB)
+            del temporary
+        with profiler.stage('small'):
+            pass
+    del kept
+    stages = profiler.stages
+    assert 4 * MB <= stages['inner'].peak_bytes < 5 * MB
+    assert stages['small'].peak_bytes < MB
+    # 内层的峰值并入外层，外层进入之后分配的1MB也计入
+    assert stages['outer'].peak_bytes >= 5 * MB
+    assert stages['outer'].seconds >= stages['inner'].seconds + stages['small'].seconds
+
+
+def test_repeated_stage_accumulates(profiler):
+    for size in (3 * MB, MB):
+        with profiler.stage('evaluate'):
+            temporary = bytearray(size)
+            del temporary
+    stage = profiler.stages['evaluate']
+    assert stage.calls == 2
+    assert stage.peak_bytes >= 3 * MB
+
+
+def test_statement_peak_includes_its_stages(profiler):
+    with profiler.statement({'type': 'draw', 'expression': 't', 'line': 3}) as record:
+        with profiler.stage('evaluate'):
+            temporary = bytearray(2 * MB)
+            del temporary
+        with profiler.stage('drawer'):
+            pass
+        profiler.count_samples(100, 90)
+        profiler.count_cache_hit(50, 5)
+    profiler.count_samples(1000, 0)
+    assert record.peak_bytes >= 2 * MB
+    assert set(record.stages) == {'evaluate', 'drawer'}
+    assert record.seconds >= sum(record.stages.values())
+    assert (record.samples, record.errors, record.cache_hits) == (150, 15, 1)
+    assert profiler.current is None
+
+
+def test_nested_statements_restore_current(profiler):
+    with profiler.statement({'type': 'assign', 'name': 'a', 'expression': 1}) as outer:
+        with profiler.statement({'type': 'draw', 'expression': 't'}) as inner:
+            assert profiler.current is inner
+        assert profiler.current is outer
+    assert [record.index for record in profiler.statements] == [1, 2]
+
+
+def test_without_memory_tracing():
+    profiler = Profiler(trace_memory=False)
+    with profiler.stage('evaluate'):
+        temporary = bytearray(MB)
+        del temporary
+    profiler.finish()
+    assert profiler.stages['evaluate'].peak_bytes == 0
+    assert '内存峰值' not in profiler.report()
+
+
+def test_finish_only_stops_own_tracing():
+    profiler = Profiler()
+    assert tracemalloc.is_tracing()
+    profiler.finish()
+    assert not tracemalloc.is_tracing()
+    tracemalloc.start()
+    try:
+        Profiler().finish()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_interpreter_records_statements(run_script, profiler):
+    run_script(PROGRAM, profiler=profiler)
+    assert {'lexer', 'parser', 'optimize', 'evaluate', 'drawer'} <= set(profiler.stages)
+    assert [(record.line, record.type) for record in profiler.statements] == [
+        (1, 'param'), (2, 'assign'), (3, 'draw'), (4, 'draw')]
+    log_draw, circle_draw = profiler.statements[2:]
+    # log(t)在t<=0处无定义，sqrt(1 - t*t)在|t|>1处无定义
+    assert (log_draw.samples, log_draw.errors) == (4001, 2001)
+    assert (circle_draw.samples, circle_draw.errors) == (4001, 2000)
+    assert log_draw.stages['evaluate'] > 0 and log_draw.stages['drawer'] > 0
+
+
+def test_report_lists_stages_and_statements(run_script, profiler):
+    run_script(PROGRAM, profiler=profiler)
+    profiler.finish()
+    report = profiler.report()
+    lines = report.splitlines()
+    assert lines[0].startswith("性能分析: 总耗时 ")
+    assert lines[2] == "阶段" and "语句" in lines
+    statement_rows = lines[lines.index("语句") + 2:]
+    assert len(statement_rows) == 4
+    assert statement_rows[1].split()[:2] == ['2', 'a']
+    # draw语句在最后两列给出取样点数和出错点数
+    assert statement_rows[2].split()[0] == '3' and statement_rows[2].split()[-2:] == ['4001', '2001']
+    assert "param t from -2.0 to 2.0" in report
+
+
+def test_write_json_schema(run_script, profiler, tmp_path):
+    run_script(PROGRAM, profiler=profiler)
+    profiler.finish()
+    path = tmp_path / "profile.json"
+    profiler.write_json(str(path))
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['format'] == PROFILE_FORMAT_VERSION
+    assert set(data) == {'format', 'total_seconds', 'trace_memory', 'stages', 'statements'}
+    assert data['trace_memory'] is True and data['total_seconds'] > 0
+    for stage in data['stages']:
+        assert set(stage) == {'name', 'seconds', 'calls', 'peak_bytes'}
+        assert stage['calls'] >= 1 and stage['peak_bytes'] >= 0
+    assert [stage['name'] for stage in data['stages']] == list(profiler.stages)
+    statement = data['statements'][2]
+    assert set(statement) == {'index', 'line', 'type', 'statement', 'seconds', 'peak_bytes', 'stages', 'samples',
+                              'errors', 'cache_hits'}
+    assert (statement['index'], statement['line'], statement['type']) == (3, 3, 'draw')
+    assert statement['statement'] == "draw (log(t) * a)"
+    assert (statement['samples'], statement['errors'], statement['cache_hits']) == (4001, 2001, 0)
+    assert set(statement['stages']) == {'evaluate', 'drawer'}
+
+
+@pytest.mark.parametrize('size, text', [(0, "0B"), (1023, "1023B"), (1536, "1.5KB"), (5 * MB, "5.0MB"),
+                                        (3 << 30, "3.0GB")])
+def test_format_bytes(size, text):
+    assert format_bytes(size) == text
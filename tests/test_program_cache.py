@@ -0,0 +1,64 @@
+import os
+import pytest
+from function_painter.interpreter import Interpreter
+
+
+SOURCE = """
+const k = 2 * pi
+param t from 0 to 5 step 0.01
+f(u) = u * k
+draw sin(t) * k, f(t) ^ 2
+"""
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "script.txt"
+    path.write_text(SOURCE, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def run_file(tmp_path):
+    """用同一个语法分析缓存目录执行源文件，返回解释器"""
+    def run(path, **options):
+        interpreter = Interpreter(headless=True, decimation=None, program_cache_dir=str(tmp_path / "programs"),
+                                  **options)
+        interpreter.interpret_file(str(path))
+        return interpreter
+    return run
+
+
+def test_unchanged_source_reads_cache(run_file, script, assert_same_points):
+    first = run_file(script)
+    assert (first.program_cache.hits, first.program_cache.misses) == (0, 1)
+    second = run_file(script)
+    assert (second.program_cache.hits, second.program_cache.misses) == (1, 0)
+    assert_same_points(first.plot_points, second.plot_points)
+    assert second.variables == first.variables
+
+
+def test_changed_source_is_parsed_again(run_file, script, run_script, assert_same_points):
+    run_file(script)
+    changed = SOURCE.replace("2 * pi", "3 * pi")
+    script.write_text(changed, encoding='utf-8')
+    interpreter = run_file(script)
+    assert interpreter.program_cache.hits == 0
+    assert_same_points(run_script(changed).plot_points, interpreter.plot_points)
+
+
+def test_optimize_setting_has_its_own_entry(run_file, script):
+    run_file(script)
+    assert run_file(script, optimize=False).program_cache.hits == 0
+    assert run_file(script, optimize=False).program_cache.hits == 1
+
+
+def test_corrupted_entry_is_parsed_again(run_file, script, tmp_path, assert_same_points):
+    first = run_file(script)
+    directory = tmp_path / "programs"
+    for name in os.listdir(directory):
+        (directory / name).write_bytes(b"not a pickle")
+    interpreter = run_file(script)
+    assert (interpreter.program_cache.hits, interpreter.program_cache.misses) == (0, 1)
+    assert_same_points(first.plot_points, interpreter.plot_points)
+    assert run_file(script).program_cache.hits == 1
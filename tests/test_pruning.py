@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from function_painter.evaluator.pruning import MIN_PRUNE_POINTS, prune_grid
+from function_painter.lexer import Lexer
+from function_painter.parser.parser import Parser
+
+
+def parse_expression(text: str):
+    return Parser(Lexer(f"draw {text}", is_string=True)).parse_program()[0]['expression']
+
+
+# 网格 start + i*step 恰好经过定义域的边界，如 x = ±1
+GRIDS = [(-2.0, 0.001, 4001), (-1.0, 0.0005, 4001), (-1.5, 0.0003, 10001), (0.0, 1e-4, 20001)]
+
+EXPRESSIONS = [
+    "sqrt(1 - x*x)",
+    "log(x)",
+    "log(1 - x) + sqrt(x + 1)",
+    "asin(x) * acos(x)",
+    "1 / sqrt(x - 1)",
+    "sqrt(-x * x)",
+    "log(x * x)",
+    "sqrt(x) ^ 2.5",
+    "sqrt(1 - x*x) / (x - 0.5)",
+]
+
+
+@pytest.mark.parametrize('start, step, count', GRIDS)
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_pruned_points_are_undefined(text, start, step, count):
+    expression = parse_expression(text)
+    pruned = prune_grid([expression], 'x', start, step, count, {})
+    grid = start + step * np.arange(count, dtype=np.float64)
+    with np.errstate(all='ignore'):
+        values = np.asarray(expression.evaluate_vector({'x': grid}), dtype=np.float64) * np.ones(count)
+    assert np.all(np.isnan(values[~pruned.mask()]))
+
+
+def test_keeps_domain_edges():
+    pruned = prune_grid([parse_expression("sqrt(1 - x*x)")], 'x', -2.0, 0.001, 4001, {})
+    keep = pruned.mask()
+    # x = -1 和 x = 1 处的值为0，必须保留
+    assert keep[1000] and keep[3000]
+    assert pruned.pruned > 0
+    assert not keep[:1000 - 256].any() and not keep[3000 + 256:].any()
+
+
+PROGRAM = """
+param x from -2 to 2 step 0.0005
+draw sqrt(1 - x*x), -sqrt(1 - x*x)
+draw log(x) + asin(x)
+draw acos(x) + 1 / (x - 1)
+a = 1
+draw sqrt(a - x*x) * x, sqrt(x*x - a)
+draw log(x) * sqrt(-x)
+"""
+
+
+@pytest.mark.parametrize('options', [{'vectorized': True}, {'vectorized': False}, {'streaming': True}])
+def test_pruning_does_not_change_curves(run_script, assert_same_points, tmp_path, options):
+    if options.get('streaming'):
+        pruned_dir, plain_dir = tmp_path / "pruned", tmp_path / "plain"
+        run_script(PROGRAM, export_dir=str(pruned_dir), prune=True)
+        run_script(PROGRAM, export_dir=str(plain_dir), prune=False)
+        names = sorted(path.name for path in plain_dir.iterdir())
+        assert names == sorted(path.name for path in pruned_dir.iterdir())
+        assert_same_points([np.load(plain_dir / name).T for name in names],
+                           [np.load(pruned_dir / name).T for name in names], nan_sign=False)
+        return
+    pruned = run_script(PROGRAM, prune=True, **options)
+    plain = run_script(PROGRAM, prune=False, **options)
+    assert len(plain.plot_points[0][0]) >= MIN_PRUNE_POINTS
+    # 剪除的点记为np.nan，逐点计算出的NaN可能带有符号位，除此之外逐位相同
+    assert_same_points(plain.plot_points, pruned.plot_points, nan_sign=False)
+    assert pruned.variables == plain.variables
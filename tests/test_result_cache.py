@@ -0,0 +1,48 @@
+import pytest
+
+
+SOURCE = """
+param t from 0 to 5 step 0.001
+a = 2
+draw sin(t * a)
+draw t * t, sqrt(t)
+"""
+
+
+@pytest.fixture
+def cached_run(run_script, tmp_path):
+    """在同一缓存目录上执行代码，返回解释器"""
+    def run(code: str, **options):
+        return run_script(code, cache_dir=str(tmp_path / "curves"), **options)
+    return run
+
+
+def test_repeated_run_reads_cache(cached_run, run_script, assert_same_points):
+    first = cached_run(SOURCE)
+    assert (first.curve_cache.hits, first.curve_cache.misses) == (0, 2)
+    second = cached_run(SOURCE)
+    assert (second.curve_cache.hits, second.curve_cache.misses) == (2, 0)
+    assert_same_points(run_script(SOURCE).plot_points, second.plot_points)
+    assert second.variables == first.variables
+
+
+@pytest.mark.parametrize('old, new, hits', [
+    ("a = 2", "a = 3", 1),
+    ("step 0.001", "step 0.002", 0),
+    ("draw t * t, sqrt(t)", "draw t * t + 1, sqrt(t)", 1),
+    ("sin(t * a)", "cos(t * a)", 1),
+    ("from 0 to 5", "from 1 to 5", 0),
+])
+def test_source_change_invalidates_changed_curves(cached_run, run_script, assert_same_points, old, new, hits):
+    cached_run(SOURCE)
+    changed = SOURCE.replace(old, new)
+    interpreter = cached_run(changed)
+    assert (interpreter.curve_cache.hits, interpreter.curve_cache.misses) == (hits, 2 - hits)
+    assert_same_points(run_script(changed).plot_points, interpreter.plot_points)
+
+
+def test_equivalent_source_reuses_cache(cached_run):
+    cached_run(SOURCE)
+    # 优化之后与原来的表达式相同
+    interpreter = cached_run(SOURCE.replace("draw t * t", "draw (t * t) * 1 + 0"))
+    assert interpreter.curve_cache.hits == 2
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from function_painter.evaluator import sampling
+
+
+def sqrt_curve(t_values: np.ndarray):
+    with np.errstate(invalid='ignore'):
+        return t_values, np.sqrt(1 - t_values * t_values)
+
+
+def test_refines_where_curve_bends():
+    t, x, y = sampling.adaptive_sample(lambda t: (t, np.sin(t) * np.exp(-t * t)), -5, 5, 0.5)
+    assert np.all(np.diff(t) > 0)
+    assert t[0] == -5 and t[-1] == 5
+    np.testing.assert_array_equal(y, np.sin(t) * np.exp(-t * t))
+    # 中间弯曲的部分比两侧平坦的部分密得多
+    assert np.count_nonzero(np.abs(t) < 1) > 4 * np.count_nonzero(np.abs(t) > 4)
+
+
+def test_approaches_domain_edges():
+    t, x, y = sampling.adaptive_sample(sqrt_curve, -2, 2, 0.3, max_depth=20)
+    defined = t[np.isfinite(y)]
+    assert defined.min() + 1 < 1e-4
+    assert 1 - defined.max() < 1e-4
+
+
+@pytest.mark.parametrize('max_depth, max_points', [(0, 10000), (12, 200), (30, 50)])
+def test_respects_point_limit(max_depth, max_points):
+    t, _, _ = sampling.adaptive_sample(lambda t: (t, np.tan(t)), -6, 6, 0.1, max_depth=max_depth,
+                                       max_points=max_points)
+    assert len(t) <= min(max_points, sampling.adaptive_point_limit(-6, 6, 0.1, max_depth, max_points))
+
+
+def test_interpreter_uses_adaptive_settings(run_script):
+    interpreter = run_script("param x from 0 to 6.3 adaptive budget 300\ndraw sin(x * x)\n")
+    (x_values, y_values), = interpreter.plot_points
+    assert 64 < len(x_values) <= 300
+    np.testing.assert_allclose(y_values, np.sin(x_values * x_values), rtol=1e-15)
@@ -0,0 +1,63 @@
+import pytest
+from function_painter.scheduler import (_worker_interpreter, build_dependency_graph, evaluate_draw_task,
+                                        topological_waves)
+from function_painter.lexer import Lexer
+from function_painter.parser.parser import Parser
+
+
+PROGRAM = """
+param t from -3 to 3 step 0.001
+a = 2
+f(u) = u * a
+draw sin(t * a) with red
+draw cos(t) + f(t) with blue
+a = 3
+draw sin(t * a), f(t)
+const k = a + 1
+param s from 0 to 1 step 0.01
+draw s * k, sqrt(1 - s * s)
+clear
+draw exp(-t * t) + f(t) with green
+param t from 0 to 2 step 0.0005
+draw log(t) * a
+"""
+
+
+@pytest.mark.parametrize('workers, executor', [(4, 'thread'), (0, 'thread'), (2, 'process')])
+def test_concurrent_execution_matches_sequential(run_script, assert_same_points, workers, executor):
+    sequential = run_script(PROGRAM, workers=1)
+    concurrent = run_script(PROGRAM, workers=workers, executor=executor)
+    assert_same_points(sequential.plot_points, concurrent.plot_points)
+    assert concurrent.plot_colors == sequential.plot_colors
+    assert concurrent.variables == sequential.variables
+    assert concurrent.drawer.plot_count == sequential.drawer.plot_count
+
+
+def test_independent_draws_share_a_wave():
+    statements = Parser(Lexer("param t from 0 to 1 step 0.1\na = 1\ndraw t\ndraw t * a\na = 2\ndraw t * a\n",
+                              is_string=True)).parse_program()
+    waves = [[node.index for node in wave] for wave in topological_waves(build_dependency_graph(statements))]
+    position = {index: number for number, wave in enumerate(waves) for index in wave}
+    assert position[2] == position[3]
+    # 第二次赋值要等读取旧值的draw完成，之后的draw读取新值
+    assert position[4] > position[3]
+    assert position[5] > position[4]
+
+
+@pytest.mark.parametrize('cse', [True, False])
+def test_workers_follow_cse_option(run_script, assert_same_points, cse):
+    setup = "param t from -3 to 3 step 0.001\n"
+    draw = "draw sin(2 * t) * exp(-t), sin(2 * t) + exp(-t)\n"
+    sequential = run_script(setup + draw, cse=cse)
+    assert_same_points(sequential.plot_points, run_script(setup + draw, cse=cse, workers=2).plot_points)
+    
+    # 工作解释器是线程局部的，在当前线程中直接执行任务，检查同一条语句内的公共子表达式是否被复用
+    interpreter = run_script(setup)
+    statement, = Parser(Lexer(draw, is_string=True)).parse_program()
+    options = {'vectorized': True, 'streaming': False, 'chunk_size': interpreter.chunk_size, 'prune': True,
+               'decimation': None, 'cse': cse, 'curve_cache': None}
+    cache = _worker_interpreter().subexpression_cache
+    hits = cache.hits
+    (curve,), _, _ = evaluate_draw_task(interpreter.snapshot_state(), statement, options)
+    assert (cache.hits > hits) == cse
+    assert_same_points(sequential.plot_points, [curve[:2]])
@@ -0,0 +1,103 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import pytest
+from function_painter.client import RenderError, render
+from function_painter.server import RenderServer, RenderWorker, WorkerPool
+
+
+SCRIPT = "param t from 0 to 6.28 step 0.01\ndraw sin(t), cos(t)\n"
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+@pytest.fixture(scope='module')
+def server():
+    """只有一个工作进程的渲染服务，前一个请求留下的状态会直接影响下一个请求"""
+    pool = WorkerPool(1, {'decimation': None})
+    assert pool.wait_ready() == 1
+    server = RenderServer(('127.0.0.1', 0), pool, timeout=30, point_budget=100_000)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    pool.close()
+
+
+@pytest.fixture
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def health(url: str) -> dict:
+    with urlopen(f"{url}/health") as response:
+        return json.loads(response.read())
+
+
+@pytest.mark.parametrize('file_format, prefix', [('png', PNG_SIGNATURE), ('svg', b'<?xml'), ('pdf', b'%PDF')])
+def test_renders_formats(url, file_format, prefix):
+    assert render(SCRIPT, url, file_format).startswith(prefix)
+
+
+@pytest.mark.parametrize('max_points', [None, 500])
+def test_point_budget_returns_422(url, max_points):
+    with pytest.raises(RenderError) as error:
+        render("param t from 0 to 1 step 0.000001\ndraw t\n" if max_points is None else SCRIPT, url,
+               max_points=max_points)
+    assert error.value.status == 422
+
+
+def test_save_is_rejected(url, tmp_path):
+    path = tmp_path / "out.png"
+    with pytest.raises(RenderError) as error:
+        render(f'{SCRIPT}save "{path.as_posix()}"\n', url)
+    assert error.value.status == 400
+    assert not path.exists()
+
+
+def test_script_error_returns_400(url):
+    with pytest.raises(RenderError) as error:
+        render("draw t\n", url)
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize('query', [
+    "format=gif", "timeout=nan", "timeout=inf", "timeout=-inf", "timeout=0", "timeout=-1", "timeout=abc",
+    "max_points=abc", "max_points=1.5", "max_points=0", "max_points=-5",
+])
+def test_invalid_query_returns_400(url, query):
+    request = Request(f"{url}/render?{query}", data=SCRIPT.encode('utf-8'), method='POST')
+    with pytest.raises(HTTPError) as error:
+        urlopen(request)
+    assert error.value.code == 400
+    # 工作进程没有收到请求，下一个请求得到的是它自己的结果
+    assert render(SCRIPT, url, 'png').startswith(PNG_SIGNATURE)
+
+
+def test_timeout_replaces_worker(url):
+    restarts = health(url)['restarts']
+    with pytest.raises(RenderError) as error:
+        render("param t from 0 to 1 step 0.00001\ndraw sin(t) * exp(t)\n", url, 'svg', timeout=0.001)
+    assert error.value.status == 504
+    assert health(url)['restarts'] == restarts + 1
+    # 新的工作进程预热完成后正常处理请求，不会收到被超时请求的回复
+    assert render(SCRIPT, url, 'png').startswith(PNG_SIGNATURE)
+
+
+def test_failure_after_send_replaces_worker(server, url, monkeypatch):
+    pool = server.pool
+    restarts = pool.restarts
+
+    def render_then_fail(self, script, file_format, point_budget, timeout):
+        self.connection.send((script, file_format, point_budget))
+        raise ValueError("发送之后出错")
+
+    monkeypatch.setattr(RenderWorker, 'render', render_then_fail)
+    with pytest.raises(ValueError):
+        pool.render(SCRIPT, 'svg', None, 30)
+    monkeypatch.undo()
+    assert pool.restarts == restarts + 1
+    # 留在旧管道中的SVG回复不会交给下一个请求
+    status, payload = pool.render(SCRIPT, 'png', None, 30)
+    assert status == 'ok' and payload.startswith(PNG_SIGNATURE)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from function_painter.evaluator.sharding import SHARD_ALIGNMENT, shard_bounds
+
+
+PROGRAM = """
+param t from -7 to 7 step 0.0003
+a = 1.5
+f(u) = u^3 - a * u
+draw sin(t * a) * exp(-t * t / 8)
+draw f(t), sqrt(1 - t * t) + log(t)
+draw tan(t) / t, cos(3 * t) ^ 2
+"""
+
+
+@pytest.mark.parametrize('shard_size', [4096, 5000, 1])
+def test_shard_bounds_are_aligned(shard_size):
+    bounds = shard_bounds(46_667, shard_size)
+    assert bounds[0].start == 0 and bounds[-1].stop == 46_667
+    for previous, current in zip(bounds, bounds[1:]):
+        assert previous.stop == current.start
+        assert len(previous) % SHARD_ALIGNMENT == 0
+
+
+def test_sharded_grid_is_bit_identical(run_script, assert_same_points):
+    single = run_script(PROGRAM, shards=1)
+    sharded = run_script(PROGRAM, shards=3, shard_size=4096)
+    assert_same_points(single.plot_points, sharded.plot_points)
+    assert sharded.variables == single.variables
+
+
+def test_sharded_streaming_is_bit_identical(run_script, tmp_path):
+    single_dir = tmp_path / "single"
+    sharded_dir = tmp_path / "sharded"
+    run_script(PROGRAM, export_dir=str(single_dir), memory_budget=1 << 20)
+    run_script(PROGRAM, export_dir=str(sharded_dir), memory_budget=1 << 20, shards=2, shard_size=4096)
+    files = sorted(path.name for path in single_dir.iterdir())
+    assert files == sorted(path.name for path in sharded_dir.iterdir()) and len(files) == 3
+    for name in files:
+        expected = np.load(single_dir / name)
+        actual = np.load(sharded_dir / name)
+        assert actual.shape == expected.shape
+        assert actual.tobytes() == expected.tobytes()
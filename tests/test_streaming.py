@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from function_painter.drawer.decimation import POINTS_PER_BUCKET
+from function_painter.evaluator.streaming import (NpyCurveExporter, chunk_size_for_budget, grid_size,
+                                                  iter_param_chunks)
+
+
+PROGRAM = """
+param t from -3 to 3 step 0.0001
+draw log(t) + sqrt(1 - t^2)
+draw sin(7 * t), 1 / t
+"""
+
+
+@pytest.mark.parametrize('start, end, step, expected', [
+    (0, 1, 0.1, 11),
+    (0, 0.3, 0.1, 4),
+    (0, 0.7, 0.1, 8),
+    (-1, 1, 0.001, 2001),
+    (-3, 3, 0.0001, 60001),
+    (0, 0, 1, 1),
+    (0, 0.99, 1, 1),
+    (1, 0, 0.1, 0),
+])
+def test_grid_size_includes_end_within_rounding(start, end, step, expected):
+    assert grid_size(start, end, step) == expected
+    if expected:
+        # 最后一个取样点不超过终点（允许浮点误差）
+        assert start + step * (expected - 1) <= end + abs(step) * 1e-9
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024, 60001, 100000])
+def test_chunks_match_one_shot_grid(chunk_size):
+    start, end, step = -3.0, 3.0, 0.0001
+    count = grid_size(start, end, step)
+    grid = start + step * np.arange(count, dtype=np.float64)
+    chunks = list(iter_param_chunks(start, end, step, chunk_size))
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    assert np.concatenate(chunks).tobytes() == grid.tobytes()
+
+
+def test_chunk_size_is_aligned():
+    assert chunk_size_for_budget(1) == 1024
+    assert chunk_size_for_budget(64 << 20) % 1024 == 0
+
+
+def test_exporter_writes_full_curve(tmp_path):
+    exporter = NpyCurveExporter(str(tmp_path / "out"))
+    x_values = np.arange(10, dtype=float)
+    y_values = np.where(x_values % 4 == 1, np.nan, x_values * 2)
+    y_values[-1] = np.inf
+    writer = exporter.begin(len(x_values))
+    for offset in range(0, len(x_values), 3):
+        writer.append(x_values[offset:offset + 3], y_values[offset:offset + 3])
+    writer.finish()
+    exporter.begin(0).finish()
+
+    data = np.load(tmp_path / "out" / "curve_0001.npy")
+    assert data.shape == (10, 2) and data.dtype == np.float64
+    # 导出保存整个网格，无效点保持原位，不合并也不抽稀
+    assert data[:, 0].tobytes() == x_values.tobytes()
+    assert data[:, 1].tobytes() == y_values.tobytes()
+    assert np.load(tmp_path / "out" / "curve_0002.npy").shape == (0, 2)
+
+
+def test_streamed_export_matches_one_shot(run_script, assert_same_points, tmp_path):
+    expected = run_script(PROGRAM).plot_points
+    # 1MB的预算每块16384个点，网格在块的边界上被切开
+    run_script(PROGRAM, export_dir=str(tmp_path), memory_budget=1 << 20)
+    files = sorted(tmp_path.iterdir())
+    assert [path.name for path in files] == ["curve_0001.npy", "curve_0002.npy"]
+    actual = []
+    for path in files:
+        data = np.load(path)
+        assert data.shape == (60001, 2)
+        actual.append((np.ascontiguousarray(data[:, 0]), np.ascontiguousarray(data[:, 1])))
+    # 剪除的点直接记为NaN，符号位可能与计算得到的NaN不同
+    assert_same_points(expected, actual, nan_sign=False)
+
+
+def test_streamed_parameter_keeps_last_sample(run_script):
+    one_shot = run_script(PROGRAM)
+    streamed = run_script(PROGRAM, streaming=True, memory_budget=1 << 20)
+    assert streamed.variables['t'] == one_shot.variables['t']
+    assert streamed.plot_points == []
+
+
+def test_decimated_stream_size_depends_on_pixels(run_script):
+    interpreter = run_script(PROGRAM, streaming=True, memory_budget=1 << 20, decimation='minmax')
+    drawer = interpreter.drawer
+    columns = drawer.pixel_columns()
+    for original_points, kept_points in drawer.decimation_stats:
+        assert kept_points < original_points
+        assert kept_points <= 2 * (columns * POINTS_PER_BUCKET + 2) + 1
+
+
+def test_undecimated_stream_keeps_every_valid_point(run_script):
+    interpreter = run_script("param t from 0 to 1 step 0.0001\ndraw log(t - 0.5)\n",
+                             streaming=True, memory_budget=1 << 20)
+    (original_points, kept_points), = interpreter.drawer.decimation_stats
+    # 只有t<=0.5的无效点被合并为一个NaN
+    assert original_points == 5000
+    assert kept_points == 5001
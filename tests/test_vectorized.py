@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+
+EXPRESSIONS = (
+    "sin(x) * x",
+    "x^3 - 2*x + 1",
+    "sqrt(1 - x*x)",
+    "log(x) + 1/x",
+    "max(sin(x), cos(x)) - aver(x, 1)",
+    "exp(x) * tan(x)",
+)
+
+
+def _assert_close(expected: np.ndarray, actual: np.ndarray):
+    """逐点计算与NumPy内核可能在最后一位上不同，NaN和inf的位置必须一致"""
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-300, equal_nan=True)
+
+
+@pytest.mark.parametrize('expression', EXPRESSIONS)
+def test_vector_matches_scalar(run_script, expression):
+    code = f"param x from -3 to 3 step 0.01\ndraw {expression}\n"
+    vector = run_script(code, vectorized=True)
+    scalar = run_script(code, vectorized=False)
+    (vector_x, vector_y), = vector.plot_points
+    (scalar_x, scalar_y), = scalar.plot_points
+    assert vector_x.tobytes() == scalar_x.tobytes()
+    _assert_close(scalar_y, vector_y)
+
+
+def test_parametric_vector_matches_scalar(run_script):
+    code = "param t from 0 to 6.3 step 0.001\ndraw t * cos(t), sqrt(t) * sin(3 * t)\n"
+    (vector_x, vector_y), = run_script(code, vectorized=True).plot_points
+    (scalar_x, scalar_y), = run_script(code, vectorized=False).plot_points
+    _assert_close(scalar_x, vector_x)
+    _assert_close(scalar_y, vector_y)
+
+
+@pytest.mark.parametrize('options', [
+    {'vectorized': True}, {'vectorized': False}, {'streaming': True}])
+@pytest.mark.parametrize('draw', ["draw x_coord, y_coord", "draw t * cos(t), t * sin(t)", "draw sqrt(-t)"])
+def test_param_keeps_last_sample(run_script, options, draw):
+    interpreter = run_script(f"param t from 0 to 6.28 step 0.01\n{draw}\n", **options)
+    assert interpreter.variables['t'] == 0 + 0.01 * 628
@@ -0,0 +1,164 @@
+import re
+import pytest
+from function_painter.interpreter import Interpreter
+from function_painter.watch import FileWatcher, WatchSession
+
+
+BASE = """param t from -2 to 2 step 0.01
+a = 2
+draw sin(t * a)
+draw cos(t)
+draw t * t + a
+"""
+
+
+class Session:
+    """在临时文件上无界面地驱动WatchSession，每次update之前改写文件内容"""
+    def __init__(self, path):
+        self.path = path
+        self.messages = []
+        self.interpreter = Interpreter(headless=True, decimation=None)
+        path.write_text(BASE, encoding='utf-8')
+        self.session = WatchSession(self.interpreter, str(path), report=self.messages.append)
+    
+    def update(self, source=None):
+        if source is not None:
+            self.path.write_text(source, encoding='utf-8')
+        return self.session.update()
+    
+    def counts(self):
+        """最后一次成功执行报告的 (重新计算, 保留, 移除) 条数"""
+        match = re.search(r"重新计算 (\d+) 条draw语句，保留 (\d+) 条，移除 (\d+) 条曲线", self.messages[-1])
+        return tuple(int(group) for group in match.groups())
+    
+    def lines(self):
+        """按程序顺序排列的曲线，新画的曲线在图像中排在最后，只有编号反映程序顺序"""
+        return [line for record in self.session.records for line in record.lines]
+
+
+@pytest.fixture
+def session(tmp_path):
+    return Session(tmp_path / "plot.fp")
+
+
+def assert_matches_fresh_run(session, run_script, assert_same_points):
+    """增量执行的结果与从头执行同一份源文件相同"""
+    fresh = run_script(session.path.read_text(encoding='utf-8'))
+    assert_same_points(fresh.plot_points, session.interpreter.plot_points)
+    assert session.interpreter.plot_colors == fresh.plot_colors
+    assert session.interpreter.variables == fresh.variables
+    lines = session.lines()
+    assert [line.get_label() for line in lines] == [f'曲线 {index + 1}' for index in range(len(lines))]
+    drawn = [line for line in session.interpreter.drawer.ax.get_lines() if line.get_label().startswith('曲线')]
+    assert set(drawn) == set(lines)
+    assert session.interpreter.drawer.plot_count == len(lines) == len(fresh.plot_points)
+
+
+def test_first_update_draws_everything(session, run_script, assert_same_points):
+    assert session.update()
+    assert session.counts() == (3, 0, 0)
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+def test_unchanged_source_reuses_every_curve(session):
+    session.update()
+    lines = session.lines()
+    assert session.update()
+    assert session.counts() == (0, 3, 0)
+    assert session.lines() == lines
+
+
+def test_changed_expression_is_the_only_redraw(session, run_script, assert_same_points):
+    session.update()
+    first, second, third = session.lines()
+    session.update(BASE.replace("draw cos(t)", "draw cos(2 * t)"))
+    assert session.counts() == (1, 2, 1)
+    lines = session.lines()
+    assert lines[0] is first and lines[2] is third and lines[1] is not second
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+def test_changed_variable_redraws_its_readers(session, run_script, assert_same_points):
+    session.update()
+    _, cos_line, _ = session.lines()
+    # 签名包含读取的变量取值，只有读取a的两条曲线需要重新计算
+    session.update(BASE.replace("a = 2", "a = 3"))
+    assert session.counts() == (2, 1, 2)
+    assert session.lines()[1] is cos_line
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+def test_changed_param_range_redraws_everything(session, run_script, assert_same_points):
+    session.update()
+    session.update(BASE.replace("step 0.01", "step 0.02"))
+    assert session.counts() == (3, 0, 3)
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+def test_renumbers_after_removal(session, run_script, assert_same_points):
+    session.update()
+    _, cos_line, last_line = session.lines()
+    session.update(BASE.replace("draw sin(t * a)\n", ""))
+    assert session.counts() == (0, 2, 1)
+    assert session.lines() == [cos_line, last_line]
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+def test_clear_drops_earlier_curves(session, run_script, assert_same_points):
+    session.update()
+    last_line = session.lines()[2]
+    session.update(BASE.replace("draw t * t", "clear\ndraw t * t"))
+    assert session.counts() == (0, 1, 2)
+    assert session.lines() == [last_line]
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+    # 去掉clear后，之前移除的曲线需要重新计算
+    session.update(BASE)
+    assert session.counts() == (2, 1, 0)
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+def test_duplicate_draws_are_reused_once_each(session, run_script, assert_same_points):
+    source = BASE + "draw sin(t * a)\n"
+    session.update(source)
+    assert session.counts() == (4, 0, 0)
+    session.update(source + "draw sin(t * a)\n")
+    assert session.counts() == (1, 4, 0)
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+@pytest.mark.parametrize('broken', ["draw sin(t * \n", "draw undefined_name * t\n", "draw f(t)\n"])
+def test_error_keeps_previous_image(session, run_script, assert_same_points, broken):
+    session.update()
+    lines = session.lines()
+    points = session.interpreter.plot_points
+    assert not session.update(BASE + broken)
+    assert "第 2 次执行出错，保留上一次的图像" in session.messages[-1]
+    assert session.lines() == lines
+    assert session.interpreter.plot_points is points
+    # 修正之后从出错前的曲线继续增量执行
+    assert session.update(BASE.replace("a = 2", "a = 2.5"))
+    assert session.counts() == (2, 1, 2)
+    assert_matches_fresh_run(session, run_script, assert_same_points)
+
+
+def test_saves_output_after_each_update(tmp_path):
+    session = Session(tmp_path / "plot.fp")
+    output = tmp_path / "out.png"
+    session.session.output = str(output)
+    session.update()
+    assert output.read_bytes()[:8] == b'\x89PNG\r\n\x1a\n'
+
+
+def test_file_watcher_detects_rewrites(tmp_path):
+    path = tmp_path / "plot.fp"
+    path.write_text("draw t\n", encoding='utf-8')
+    watcher = FileWatcher(str(path))
+    assert not watcher.changed()
+    path.write_text("draw t * 2\n", encoding='utf-8')
+    assert watcher.changed()
+    assert not watcher.changed()
+    # 文件暂时不存在时不算变化，重新出现时才算
+    path.unlink()
+    assert not watcher.changed()
+    path.write_text("draw t\n", encoding='utf-8')
+    assert watcher.changed()